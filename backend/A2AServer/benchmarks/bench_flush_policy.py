@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/18 21:10
+# @File  : bench_flush_policy.py
+# @Desc  : 不同flush_policy下流式文本的帧率、平均帧大小和首字节时间
+
+"""
+Usage:
+    python benchmarks/bench_flush_policy.py
+    python benchmarks/bench_flush_policy.py --interval 20 --policy "sentence+time:100" --policy tokens:16
+
+Replays a simulated model token stream (Chinese and English text, one token
+every --interval ms) through BasicAgent's TextBatcher with each flush policy
+and reports:
+
+- frames/s:    normal text items yielded per second of streaming
+- avg bytes:   average UTF-8 size of a frame
+- ttfb ms:     time from the first token to the first frame
+- avg wait ms: average time a token waits in the batch before it is sent
+"""
+
+import argparse
+import asyncio
+import time
+
+from A2AServer.flush_policy import DEFAULT_FLUSH_POLICY, TextBatcher
+
+TEXT_ZH = ("A2A协议定义了智能体之间通信的标准方式，客户端通过tasks/sendSubscribe订阅任务的流式输出。"
+           "服务端把模型生成的文本按批次发送给客户端，批次太小会产生大量的SSE帧，批次太大则会增加延迟。\n")
+TEXT_EN = ("The agent streams its answer token by token. Small batches cost one SSE frame per token, "
+           "large batches make the user wait for the first words of the answer.\n")
+
+POLICIES = [DEFAULT_FLUSH_POLICY, "tokens:1", "tokens:8", "bytes:64", "time:50", "time:200", "sentence",
+            "sentence+time:200"]
+
+
+def tokenize(text):
+    """Rough model tokens: single CJK characters and punctuation, English words with their leading space."""
+    tokens = []
+    for ch in text:
+        if ch.isascii() and ch.isalnum() and tokens and tokens[-1][-1:].isascii() and tokens[-1][-1:].isalnum():
+            tokens[-1] += ch
+        elif ch.isascii() and ch.isalnum() and tokens and tokens[-1] == " ":
+            tokens[-1] += ch
+        else:
+            tokens.append(ch)
+    return tokens
+
+
+async def run(policy, tokens, interval):
+    batcher = TextBatcher(policy)
+    frames = []
+    pending_since = []
+    started = time.perf_counter()
+    first_frame = None
+    waits = []
+
+    def emit(text):
+        nonlocal first_frame
+        now = time.perf_counter()
+        if first_frame is None:
+            first_frame = now - started
+        frames.append(text)
+        waits.extend(now - t for t in pending_since)
+        pending_since.clear()
+
+    for token in tokens:
+        await asyncio.sleep(interval)
+        pending_since.append(time.perf_counter())
+        text = batcher.add(token)
+        if text:
+            emit(text)
+    text = batcher.flush()
+    if text:
+        emit(text)
+    elapsed = time.perf_counter() - started
+    return {
+        "frames": len(frames),
+        "frames_per_s": len(frames) / elapsed,
+        "avg_bytes": sum(len(f.encode("utf-8")) for f in frames) / len(frames),
+        # 第一个token在interval之后才到达
+        "ttfb_ms": (first_frame - interval) * 1000,
+        "avg_wait_ms": sum(waits) / len(waits) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interval", type=float, default=10, help="milliseconds between model tokens")
+    parser.add_argument("--policy", action="append", help="flush policy spec, can be repeated")
+    args = parser.parse_args()
+    interval = args.interval / 1000
+    for name, text in (("zh", TEXT_ZH), ("en", TEXT_EN)):
+        tokens = tokenize(text)
+        print(f"\n{name}: {len(tokens)} tokens, one every {args.interval:g} ms")
+        print(f"{'policy':<20}{'frames':>8}{'frames/s':>10}{'avg bytes':>11}{'ttfb ms':>9}{'avg wait ms':>13}")
+        for policy in args.policy or POLICIES:
+            r = await run(policy, tokens, interval)
+            print(f"{policy:<20}{r['frames']:>8}{r['frames_per_s']:>10.1f}{r['avg_bytes']:>11.1f}"
+                  f"{r['ttfb_ms']:>9.1f}{r['avg_wait_ms']:>13.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/18 22:30
+# @File  : bench_sse_encoding.py
+# @Desc  : 流式事件编码为SSE帧的吞吐量，对比model_dump_json和sse_encoder的快速路径
+
+"""
+Usage:
+    python benchmarks/bench_sse_encoding.py
+    python benchmarks/bench_sse_encoding.py --events 200000 --delta-chars 64
+
+Encodes a stream of SendTaskStreamingResponse events as the server sends them
+for tasks/sendSubscribe: mostly text deltas with their seq, and one tool status
+event every 20 events. Reports events per second of CPU time on one core:
+
+- model_dump_json: the previous path, model_dump_json and sse_starlette's
+  ServerSentEvent encoding for every event
+- encode_event:    sse_encoder.encode_event with orjson
+- encode_event/json: the same without orjson (stdlib json for escaping)
+"""
+
+import argparse
+import time
+
+from sse_starlette.sse import ensure_bytes
+
+from A2AServer.common.A2Atypes import (
+    Artifact,
+    DataPart,
+    Message,
+    SendTaskStreamingResponse,
+    TaskArtifactUpdateEvent,
+    TaskState,
+    TaskStatus,
+    TaskStatusUpdateEvent,
+    TextPart,
+)
+from A2AServer.common.server import sse_encoder
+
+SAMPLE = "服务端把模型生成的文本按批次发送给客户端，The agent streams its answer token by token. "
+
+
+def make_events(count, delta_chars):
+    events = []
+    for seq in range(count):
+        if seq % 20 == 19:
+            message = Message(role="agent", parts=[DataPart(data={"tool_calls": [{"name": "search", "arguments": {"q": "a2a"}}]})])
+            result = TaskStatusUpdateEvent(id="task-1", status=TaskStatus(state=TaskState.WORKING, message=message), final=False)
+        else:
+            start = seq % len(SAMPLE)
+            text = (SAMPLE * 4)[start:start + delta_chars]
+            artifact = Artifact(parts=[TextPart(text=text)], index=0, append=seq > 0, lastChunk=False)
+            result = TaskArtifactUpdateEvent(id="task-1", artifact=artifact)
+        result.metadata = {"seq": seq}
+        events.append(SendTaskStreamingResponse(id="request-1", result=result))
+    return events
+
+
+def legacy(item):
+    return ensure_bytes({"data": item.model_dump_json(exclude_none=True)}, sse_encoder.SSE_SEP)
+
+
+def run(encode, events):
+    started = time.process_time()
+    size = 0
+    for item in events:
+        size += len(encode(item))
+    elapsed = time.process_time() - started
+    return len(events) / elapsed, size / len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--delta-chars", type=int, default=8, help="characters per text delta")
+    args = parser.parse_args()
+    events = make_events(args.events, args.delta_chars)
+    orjson = sse_encoder.orjson
+
+    print(f"{args.events} events, {args.delta_chars} characters per text delta, orjson {'installed' if orjson else 'missing'}")
+    print(f"{'path':<20}{'events/s/core':>15}{'us/event':>10}{'bytes/event':>13}")
+    results = [("model_dump_json", legacy)]
+    if orjson is not None:
+        results.append(("encode_event", sse_encoder.encode_event))
+    results.append(("encode_event/json", sse_encoder.encode_event))
+    for name, encode in results:
+        sse_encoder.orjson = None if name == "encode_event/json" else orjson
+        rate, size = run(encode, events)
+        print(f"{name:<20}{rate:>15,.0f}{1e6 / rate:>10.2f}{size:>13.1f}")
+    sse_encoder.orjson = orjson
+
+
+if __name__ == "__main__":
+    main()
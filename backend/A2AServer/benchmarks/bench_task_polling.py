@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/18 17:40
+# @File  : bench_task_polling.py
+# @Desc  : 轮询tasks/get的开销和任务历史长度的关系，对比每次读取都复制任务和按版本共享的快照视图
+
+"""
+Usage:
+    python benchmarks/bench_task_polling.py
+
+For tasks with a growing history (and an artifact every 10 updates), measures
+the time and the bytes allocated per tasks/get read:
+
+- copy:     the previous read path, model_copy and history slice on every poll
+- snapshot: InMemoryTaskStore.get_task_view, one view per task version
+
+"updating" polls a task that changes once every 10 polls, like a streaming
+task that is polled faster than it produces updates.
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from A2AServer.common.A2Atypes import Artifact, Message, TaskSendParams, TaskState, TaskStatus, TextPart
+from A2AServer.common.server.task_store import InMemoryTaskStore
+
+
+def copy_on_read(task, history_length):
+    """The read path before snapshot views."""
+    new_task = task.model_copy()
+    if history_length is not None and history_length > 0:
+        new_task.history = new_task.history[-history_length:]
+    else:
+        new_task.history = []
+    return new_task
+
+
+async def make_store(history_size):
+    store = InMemoryTaskStore()
+    await store.upsert_task(TaskSendParams(id="t", message=Message(role="user", parts=[TextPart(text="hello")])))
+    for i in range(history_size):
+        message = Message(role="agent", parts=[TextPart(text="x" * 50)])
+        artifacts = [Artifact(parts=[TextPart(text="y" * 20)], index=0)] if i % 10 == 0 else None
+        await store.update_task("t", TaskStatus(state=TaskState.WORKING, message=message), artifacts)
+    return store
+
+
+async def _poll(store, read, polls, update_every):
+    status = TaskStatus(state=TaskState.WORKING)
+    # 保留所有读到的结果，统计的是每次读取新分配并且被持有的内存
+    views = []
+    for i in range(polls):
+        if update_every and i % update_every == 0:
+            await store.update_task("t", status, None)
+        views.append(await read())
+    return views
+
+
+async def measure(store, read, polls, update_every=0):
+    """Microseconds and bytes allocated per poll, the time measured without tracemalloc."""
+    started = time.perf_counter()
+    await _poll(store, read, polls, update_every)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    views = await _poll(store, read, polls, update_every)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del views
+    return elapsed / polls * 1e6, (after - before) / polls
+
+
+async def main(polls):
+    print(f"{'history':>8} {'historyLength':>13} {'mode':>9} {'idle us':>8} {'idle B':>7} {'updating us':>12} {'updating B':>11}")
+    for history_size in (10, 100, 1000, 10000):
+        store = await make_store(history_size)
+        for history_length in (None, 10):
+            modes = {
+                "copy": lambda: _copy(store, history_length),
+                "snapshot": lambda: store.get_task_view("t", history_length),
+            }
+            for mode, read in modes.items():
+                idle_us, idle_bytes = await measure(store, read, polls)
+                updating_us, updating_bytes = await measure(store, read, polls, update_every=10)
+                print(f"{history_size:>8} {str(history_length):>13} {mode:>9} {idle_us:>8.2f} {idle_bytes:>7.0f} "
+                      f"{updating_us:>12.2f} {updating_bytes:>11.0f}")
+
+
+async def _copy(store, history_length):
+    return copy_on_read(await store.get_task("t"), history_length)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--polls", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.polls))
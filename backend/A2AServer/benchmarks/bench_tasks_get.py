@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/18 17:10
+# @File  : bench_tasks_get.py
+# @Desc  : tasks/get 在大量并发流式任务下的吞吐量，对比单个全局锁和按任务分片的锁
+
+"""
+Usage:
+    python benchmarks/bench_tasks_get.py --tasks 1000 --seconds 5
+
+Every streaming task keeps updating its status (as the agent does for tool
+calls and tokens) and publishing SSE events, while pollers call tasks/get on
+random tasks. "global" reproduces the old store, where every read and write
+went through one asyncio.Lock; "sharded" is the current InMemoryTaskStore.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from A2AServer.common.A2Atypes import (
+    GetTaskRequest,
+    Message,
+    TaskArtifactUpdateEvent,
+    Artifact,
+    TaskQueryParams,
+    TaskSendParams,
+    TaskState,
+    TaskStatus,
+    TextPart,
+)
+from A2AServer.common.server.task_manager import InMemoryTaskManager
+from A2AServer.common.server.task_store import InMemoryTaskStore
+
+
+class GlobalLockTaskStore(InMemoryTaskStore):
+    """The previous behaviour: one lock for every task, also for reads."""
+
+    def __init__(self):
+        super().__init__(lock_shards=1)
+
+    async def get_task(self, task_id):
+        async with self._locks[0]:
+            return self.tasks.get(task_id)
+
+    async def get_push_notification_info(self, task_id):
+        async with self._locks[0]:
+            return self.push_notification_infos.get(task_id)
+
+
+class BenchTaskManager(InMemoryTaskManager):
+    async def on_send_task(self, request):
+        pass
+
+    async def on_send_task_subscribe(self, request):
+        pass
+
+
+async def streaming_task(manager, task_id, stop):
+    message = Message(role="agent", parts=[TextPart(text="token")])
+    while not stop.is_set():
+        await manager.update_store(task_id, TaskStatus(state=TaskState.WORKING, message=message), None)
+        event = TaskArtifactUpdateEvent(id=task_id, artifact=Artifact(parts=[TextPart(text="token")], index=0))
+        await manager.enqueue_events_for_sse(task_id, event)
+        await asyncio.sleep(0)
+
+
+async def poller(manager, task_ids, stop, counter, latencies):
+    request_id = 0
+    while not stop.is_set():
+        request_id += 1
+        request = GetTaskRequest(id=request_id, params=TaskQueryParams(id=random.choice(task_ids), historyLength=10))
+        started = time.perf_counter()
+        response = await manager.on_get_task(request)
+        latencies.append(time.perf_counter() - started)
+        assert response.error is None
+        counter[0] += 1
+        await asyncio.sleep(0)
+
+
+async def run(store, tasks, pollers, seconds):
+    manager = BenchTaskManager(store)
+    task_ids = [f"task-{i}" for i in range(tasks)]
+    for task_id in task_ids:
+        message = Message(role="user", parts=[TextPart(text="hello")])
+        await manager.upsert_task(TaskSendParams(id=task_id, message=message))
+
+    stop = asyncio.Event()
+    counter, latencies = [0], []
+    producers = [asyncio.ensure_future(streaming_task(manager, task_id, stop)) for task_id in task_ids]
+    readers = [asyncio.ensure_future(poller(manager, task_ids, stop, counter, latencies)) for _ in range(pollers)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*producers, *readers)
+
+    latencies.sort()
+    return {
+        "gets_per_second": counter[0] / seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000, help="concurrent streaming tasks")
+    parser.add_argument("--pollers", type=int, default=50, help="concurrent tasks/get callers")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.tasks} streaming tasks, {args.pollers} pollers, {args.seconds}s per store")
+    for name, store in (("global", GlobalLockTaskStore()), ("sharded", InMemoryTaskStore())):
+        result = asyncio.run(run(store, args.tasks, args.pollers, args.seconds))
+        print(f"{name:>8}: {result['gets_per_second']:10.0f} tasks/get per second, "
+              f"p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
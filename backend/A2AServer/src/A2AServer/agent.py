@@ -1,7 +1,10 @@
+import asyncio
 import collections
+import contextlib
 import copy
 import logging
 import os
+import time
 import traceback
 import json
 import base64
@@ -11,6 +14,11 @@ from pydantic import BaseModel
 from datetime import datetime
 
 from A2AServer.mcp_client.client import *
+from A2AServer.mcp_client.providers.client_pool import close_all_clients
+from A2AServer.session_store import SessionStore
+from A2AServer.context_manager import ContextManager
+from A2AServer.flush_policy import DEFAULT_FLUSH_POLICY, TextBatcher, create_flush_policy
+from A2AServer.artifact_coalescer import FLUSH_TICK, with_flush_ticks
 
 logger = logging.getLogger(__name__)
 
@@ -32,11 +40,26 @@ class BasicAgent:
     SUPPORTED_CONTENT_TYPES = ["text", "text/plain"]
 
     def __init__(self, config_path="mcp_config.json", model_name="deepseek-chat",prompt_file="prompt.txt", provider="deepseek",
-                 quiet_mode=False, log_messages_path=None):
+                 quiet_mode=False, log_messages_path=None, tool_concurrency=1, server_startup_timeout=30,
+                 max_sessions=1000, session_idle_ttl=3600, max_session_bytes=None,
+                 context_policy="none", max_context_tokens=32000, keep_recent_turns=1,
+                 speculative_tool_dispatch=False, flush_policy=DEFAULT_FLUSH_POLICY):
         """
         Synchronous initialization.
         Loads config and sets up basic attributes.
         Asynchronous setup (starting servers, listing tools) is done in the 'setup' method.
+        tool_concurrency: 同一轮中模型返回多个工具调用时，最多同时执行的工具数量，默认1逐个执行，工具可以并发时再调大
+        server_startup_timeout: 每个MCP server的默认启动期限(秒)，可以在mcp_config.json中用startupTimeout单独设置
+        max_sessions / session_idle_ttl / max_session_bytes: 会话存储的上限，超过会话数量时淘汰最久未使用的会话，
+            空闲超过session_idle_ttl秒的会话被淘汰，设置max_session_bytes后单个会话超过这个字节数时丢弃最早的几轮对话，默认None不裁剪
+        context_policy: 会话超过模型上下文时的处理策略，none/sliding_window/drop_tool_results/summarize，
+            默认none不裁剪，需要时按模型的上下文窗口设置max_context_tokens后开启
+        max_context_tokens: 开启context_policy时每次调用模型的prompt token上限(包括工具定义)，None表示不限制
+        keep_recent_turns: 最近的几轮对话始终完整保留，不会被裁剪或总结
+        speculative_tool_dispatch: 流式输出时，工具调用的参数一完整就开始执行，不等模型输出结束，
+            工具的结果仍然按tool_calls的原始顺序写入会话。只适合没有副作用的工具
+        flush_policy: 流式输出普通文本时何时发送累积的文本，例如"tokens:8"、"bytes:64"、"time:100"、
+            "sentence"，用"+"组合，默认"chars:5+punct"，见flush_policy.py
         """
         self.config_path = config_path
         self.model_name = model_name
@@ -50,13 +73,39 @@ class BasicAgent:
         assert os.path.exists(prompt_file), f"Agent prompt file 必须存在，请检查: {prompt_file}"
         # Choose a model (synchronous)
         self.chosen_model = {"model": model_name, "provider": provider, "prompt_file": prompt_file}
+        # (mtime, prompt内容)，prompt文件只在修改后才重新读取
+        self._prompt_cache = None
         self.is_ready = True
 
         # Initialize attributes that will be populated asynchronously in setup()
         self.servers = {}
         self.all_functions = []
-        self.session_conversations = collections.defaultdict(list) # Initial conversation might be built later in run() or here
+        # 函数名 -> (server, tool, 参数校验)，在setup_tools中构建
+        self.tool_registry = ToolRegistry()
+        self.server_startup_timeout = server_startup_timeout
+        # 每个MCP server的启动状态(starting/ready/degraded/failed)和启动耗时(秒)
+        self.server_startup_report = {}
+        self._setup_task = None
+        # mcp_config.json中声明了cache的工具，调用结果按参数缓存
+        self.tool_cache = ToolResultCache.from_servers_cfg(self.servers_cfg)
+        # 每次调用模型前把会话裁剪到上下文窗口以内，保存的会话本身不变
+        self.context_manager = ContextManager(policy=context_policy, max_tokens=max_context_tokens,
+                                              keep_recent_turns=keep_recent_turns, summarizer=self._summarize)
+        # 有上限的会话存储，用法和defaultdict(list)一样
+        self.session_conversations = SessionStore(max_sessions=max_sessions, idle_ttl=session_idle_ttl,
+                                                  max_session_bytes=max_session_bytes,
+                                                  on_evict=self.context_manager.forget)
         self.tool_ready = False
+        # 工具并发控制，Agent级别的总并发上限，以及每个MCP server的并发上限(mcp_config.json中的maxConcurrency)
+        self.tool_concurrency = max(1, int(tool_concurrency))
+        self.speculative_tool_dispatch = speculative_tool_dispatch
+        self.flush_policy = create_flush_policy(flush_policy)
+        self._tool_semaphore = asyncio.Semaphore(self.tool_concurrency)
+        self._server_semaphores = {
+            server_name: asyncio.Semaphore(int(conf["maxConcurrency"]))
+            for server_name, conf in self.servers_cfg.items()
+            if conf.get("maxConcurrency")
+        }
         # 只能做同步的事情，不能直接“等”异步的初始化完成，不能在这里初始化
         # loop = asyncio.get_event_loop()
         # try:
@@ -69,6 +118,8 @@ class BasicAgent:
         """
         Asynchronous setup method.
         Starts servers and gathers tools.
+        所有MCP server并发启动并获取工具列表，每个server有自己的启动期限(startupTimeout，默认server_startup_timeout秒)，
+        超过期限的server标记为degraded，不阻塞Agent，等它启动完成后再把它的工具加进来。
         Returns True if setup was successful, False otherwise.
         """
         if not self.is_ready:
@@ -76,82 +127,140 @@ class BasicAgent:
              return False
 
         print("Starting MCP servers...")
-        successful_servers = {}
-        all_functions = []
+        self.servers = {}
+        self.all_functions = []
+        self.tool_registry = ToolRegistry()
+        self.server_startup_report = {}
+        startup_waits = []
         # 初始化MCP的server
         for server_name, conf in self.servers_cfg.items():
             client = None
+            # warm session数量和后台健康检查的间隔，见session_pool.py
+            pool_kwargs = {
+                "pool_size": conf.get("poolSize", 1),
+                "health_check_interval": conf.get("healthCheckInterval", 30),
+                "health_check_timeout": conf.get("healthCheckTimeout", 5),
+                "reconnect_timeout": conf.get("reconnectTimeout", 10),
+            }
             if "url" in conf:  # SSE server
-                client = SSEMCPClient(server_name, conf["url"])
+                client = SSEMCPClient(server_name, conf["url"], **pool_kwargs)
             elif "command" in conf:  # Local process-based server
                  client = MCPClient(
                      server_name=server_name,
                      command=conf.get("command"),
                      args=conf.get("args", []),
-                     env=conf.get("env", {})
+                     env=conf.get("env", {}),
+                     **pool_kwargs
                  )
             else:
                  if not self.quiet_mode:
                      print(f"[WARN] Skipping server {server_name}: No 'url' or 'command' specified.")
                  continue
+            self.server_startup_report[server_name] = {"status": "starting", "elapsed": None}
+            startup_task = asyncio.ensure_future(self._start_server(server_name, client))
+            timeout = conf.get("startupTimeout", self.server_startup_timeout)
+            startup_waits.append(self._wait_server_startup(server_name, startup_task, timeout))
 
-            try:
-                ok = await client.start() # <-- AWAIT is valid here (inside async def)
-                if not ok:
-                    if not self.quiet_mode:
-                        print(f"[WARN] Could not start server {server_name}")
-                    # Ensure client is stopped even if start failed
-                    if client: await client.stop()
-                    continue
-                else:
-                    print(f"[MCP Tool OK] {server_name}")
-                    successful_servers[server_name] = client
-
-                    # gather tools
-                    try:
-                         tools = await client.list_tools() # <-- AWAIT is valid here
-                         for t in tools:
-                             input_schema = t.input_schema or {"type": "object", "properties": {}}
-                             fn_def = {
-                                 "name": f"{server_name}_{t.name}",
-                                 "description": t.description,
-                                 "parameters": input_schema
-                             }
-                             all_functions.append(fn_def)
-                    except Exception as e:
-                        if not self.quiet_mode:
-                            print(f"[WARN] Error listing tools for {server_name}: {e}")
-                        # Consider if failing to list tools should stop processing for this server
-
-
-            except Exception as e: # Catch potential errors during client creation or start
-                if not self.quiet_mode:
-                    print(f"[WARN] Exception starting server {server_name}: {e}")
-                # Ensure client is stopped if created before exception
-                if 'client' in locals() and client:
-                    await client.stop()
-
-
-        self.servers = successful_servers
-        self.all_functions = all_functions
+        await asyncio.gather(*startup_waits)
+        degraded = [name for name, report in self.server_startup_report.items() if report["status"] == "degraded"]
 
-        if not self.servers:
+        if not self.servers and not degraded:
             error_msg = "No MCP servers could be started."
             print(f"[ERROR] {error_msg}")
             self.tool_ready = False # Cannot run without servers
             return False
 
+        print(f"MCP server startup report: {json.dumps(self.server_startup_report, ensure_ascii=False)}")
         print(f"Found {len(self.all_functions)} tools: {json.dumps(self.all_functions, ensure_ascii=False)}")
         self.tool_ready = True # Setup was successful
         return True
 
-    async def run_inference(self, user_query, sessionId, stream=True):
+    async def ensure_tools(self):
+        """
+        单飞(single-flight)方式初始化工具，并发的多个调用只会触发一次setup_tools，
+        都等待同一个初始化任务，避免重复启动MCP server进程。初始化失败后，下次调用会重新尝试。
+        Returns True if tools are ready, False otherwise.
+        """
+        if self.tool_ready:
+            return True
+        if self._setup_task is None:
+            self._setup_task = asyncio.ensure_future(self.setup_tools())
+        setup_task = self._setup_task
+        try:
+            # shield: 某个请求被取消时，不要取消其它请求也在等待的初始化任务
+            ok = await asyncio.shield(setup_task)
+        except Exception:
+            ok = False
+        if not ok and self._setup_task is setup_task:
+            self._setup_task = None
+        return ok
+
+    async def _start_server(self, server_name, client):
+        """
+        启动单个MCP server并获取它的工具列表
+        Returns:
+            client，启动失败时返回None
+        """
+        start_time = time.monotonic()
+        try:
+            ok = await client.start() # <-- AWAIT is valid here (inside async def)
+            if not ok:
+                if not self.quiet_mode:
+                    print(f"[WARN] Could not start server {server_name}")
+                # Ensure client is stopped even if start failed
+                await client.stop()
+                return None
+        except Exception as e: # Catch potential errors during client creation or start
+            if not self.quiet_mode:
+                print(f"[WARN] Exception starting server {server_name}: {e}")
+            # Ensure client is stopped if created before exception
+            await client.stop()
+            return None
+        finally:
+            self.server_startup_report[server_name]["elapsed"] = round(time.monotonic() - start_time, 3)
+
+        # gather tools
+        try:
+            await client.list_tools() # <-- AWAIT is valid here
+        except Exception as e:
+            if not self.quiet_mode:
+                print(f"[WARN] Error listing tools for {server_name}: {e}")
+            # Consider if failing to list tools should stop processing for this server
+        # 启动时间包括获取工具列表的时间
+        self.server_startup_report[server_name]["elapsed"] = round(time.monotonic() - start_time, 3)
+        return client
+
+    async def _wait_server_startup(self, server_name, startup_task, timeout):
+        """等待单个server在期限内启动完成，超时的server标记为degraded，启动完成后再注册"""
+        done, _ = await asyncio.wait({startup_task}, timeout=timeout)
+        if done:
+            self._register_server(server_name, startup_task)
+            return
+        logger.warning(f"MCP server {server_name} did not start within {timeout}s, marking it degraded")
+        self.server_startup_report[server_name]["status"] = "degraded"
+        startup_task.add_done_callback(lambda task: self._register_server(server_name, task))
+
+    def _register_server(self, server_name, startup_task):
+        """把启动完成的server和它的工具加入Agent"""
+        result = None if startup_task.cancelled() or startup_task.exception() else startup_task.result()
+        elapsed = self.server_startup_report[server_name]["elapsed"]
+        if result is None:
+            self.server_startup_report[server_name]["status"] = "failed"
+            return
+        client = result
+        self.servers[server_name] = client
+        self.all_functions.extend(self.tool_registry.register(server_name, client.tools))
+        self.server_startup_report[server_name]["status"] = "ready"
+        print(f"[MCP Tool OK] {server_name} ({elapsed}s)")
+
+    async def run_inference(self, user_query, sessionId, stream=True, use_tool_cache=True):
         """
         推理和工具的设置
+        use_tool_cache: False时本次请求跳过工具结果缓存，直接调用MCP工具
         """
         if not self.tool_ready:
-            #  如果没设置过相关的MCP工具
-            await self.setup_tools()
+            #  如果没设置过相关的MCP工具，或者启动时的预热还没完成，等待同一个初始化任务
+            await self.ensure_tools()
         if not self.is_ready:
              print("Agent is not ready. Setup failed or model not found.")
              # Depending on requirements, you might return an error or raise an exception
@@ -167,99 +276,137 @@ class BasicAgent:
 
         # try:
         if stream:
-            return self._stream_response_generator(sessionId) # Returns an async generator
+            return self._stream_response_generator(sessionId, use_tool_cache) # Returns an async generator
         else:
-            return await self._non_stream_response(sessionId) # Returns the final text
+            return await self._non_stream_response(sessionId, use_tool_cache) # Returns the final text
         # finally:
         #     # Ensure cleanup is called when run() finishes or an exception occurs
         #     await self.cleanup() # <-- AWAIT is valid here
 
-    def _build_initial_conversation(self, sessionId, user_query):
-         # Helper method to build the initial conversation list (synchronous)
-         self.conversation = []
-         # 默认的prompt
-         agent_prompt = "You are a helpful assistant."
+    def _load_agent_prompt(self):
+         """
+         读取Agent的prompt文件，按文件的mtime缓存，只有文件被修改后才重新读取
+         """
+         prompt_file = self.chosen_model["prompt_file"]
          try:
-             with open(self.chosen_model["prompt_file"], "r", encoding="utf-8") as f:
-                 agent_prompt = f.read()
-             self.session_conversations[sessionId].append({"role": "system", "content": agent_prompt})
+             mtime = os.stat(prompt_file).st_mtime_ns
+             if self._prompt_cache is None or self._prompt_cache[0] != mtime:
+                 with open(prompt_file, "r", encoding="utf-8") as f:
+                     self._prompt_cache = (mtime, f.read())
+             return self._prompt_cache[1]
          except Exception as e:
              logger.warning(f"Failed to read Agent prompt file: {e}")
-             self.session_conversations[sessionId].append({"role": "system", "content": agent_prompt})
-        # 加上当前的时间
-         self.session_conversations[sessionId][0]['content'] = f"当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}。" + self.session_conversations[sessionId][0]['content']
-         self.session_conversations[sessionId].append({"role": "user", "content": user_query})
-         print(f"发起的conversation: {self.session_conversations[sessionId]}")
+             # 读取失败时优先用上一次缓存的prompt，其次是默认的prompt
+             if self._prompt_cache is not None:
+                 return self._prompt_cache[1]
+             return "You are a helpful assistant."
 
-    async def _stream_response_generator(self, sessionId):
+    def _build_initial_conversation(self, sessionId, user_query):
+         # Helper method to build the initial conversation list (synchronous)
+         conversation = self.session_conversations[sessionId]
+         # 加上当前的时间，每个会话只保留一条system消息，后续轮次原地刷新时间
+         system_message = {"role": "system", "content": f"当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}。" + self._load_agent_prompt()}
+         if conversation and conversation[0].get("role") == "system":
+             conversation[0] = system_message
+         else:
+             conversation.insert(0, system_message)
+         conversation.append({"role": "user", "content": user_query})
+         self.session_conversations.enforce_budget(sessionId)
+         print(f"发起的conversation: {conversation}")
+
+    async def _stream_response_generator(self, sessionId, use_tool_cache=True):
          """Handles the streaming response logic (async generator)."""
          #分5种返回类型，1. reasoning, 2. normal,  4. tool_call, 5. tool_result
-         while True:
-             generator = await generate_text(self.session_conversations[sessionId], self.chosen_model, self.all_functions, stream=True)
-             accumulated_text = ""
-             accumulated_normal_text = ""  # 累积普通文本
-             tool_calls_processed = False
-
-             async for chunk in generator: # AWAIT is used to iterate over the async generator
-                 if chunk.get("is_chunk", False):
-                     if chunk.get("token", False):
-                         if chunk.get("is_reasoning"):
-                             yield {"text": chunk["assistant_text"], "type": "reasoning"}
-                         else:
-                            # 累积普通文本，每5个字符或遇到标点符号时发送
-                            accumulated_normal_text += chunk["assistant_text"]
-                            if (len(accumulated_normal_text) >= 5 or
-                                chunk["assistant_text"] in "。！？，；：\n" or
-                                chunk["assistant_text"].strip() == ""):
-                                if accumulated_normal_text.strip():  # 只发送非空文本
-                                    yield {"text": accumulated_normal_text, "type": "normal"}
-                                accumulated_normal_text = ""
-                     if not chunk.get("is_reasoning"):
-                        accumulated_text += chunk["assistant_text"]
-                 else:
-                     remaining = chunk["assistant_text"][len(accumulated_text):]
-                     if remaining:
-                         yield {"text": remaining, "type": "reasoning"} # YIELD here as well 剩余文本
-
-                     tool_calls = chunk.get("tool_calls", [])
-                     if tool_calls:
-                         for tc in tool_calls:
-                             tc["type"] = "function"
-                         assistant_message = {
-                             "role": "assistant",
-                             "content": chunk["assistant_text"],
-                             "tool_calls": tool_calls
-                         }
-                         self.session_conversations[sessionId].append(assistant_message)
-                         yield {"text": f"{json.dumps(tool_calls, ensure_ascii=False)}", "type": "tool_call"}
-
-                         for tc in tool_calls:
-                             if tc.get("function", {}).get("name"):
-                                 # 对工具进行参数的修改
-                                 result = await process_tool_call(tc, self.servers, self.quiet_mode) # AWAIT valid here
-                                 if result:
-                                     # 这里是工具的调用结果，那么只需要部分数据添加到LLM的会话中
-                                     new_res = copy.deepcopy(result)
-                                     if "data" in result:
-                                         result.pop("data")
-                                     self.session_conversations[sessionId].append(result)
-                                     tool_calls_processed = True
-                                     yield {"text": f"{json.dumps(new_res)}", "type": "tool_result"}
-
-             # 发送剩余的累积文本
-             if accumulated_normal_text.strip():
-                 yield {"text": accumulated_normal_text, "type": "normal"}
-
-             if not tool_calls_processed:
-                 break
-
-
-    async def _non_stream_response(self, sessionId):
+         # 持有会话列表的引用，运行过程中即使会话被淘汰，本轮推理也不会丢失上下文
+         conversation = self.session_conversations[sessionId]
+         # tool_call id -> 提前开始执行的工具调用(speculative_tool_dispatch)
+         speculative = {}
+         try:
+             while True:
+                 # 上一轮没有出现在最终tool_calls中的提前执行的调用
+                 for future in speculative.values():
+                     future.cancel()
+                 speculative.clear()
+                 messages = await self.context_manager.prepare(sessionId, conversation, self.chosen_model, self.all_functions)
+                 generator = await generate_text(messages, self.chosen_model, self.all_functions, stream=True)
+                 accumulated_text = ""
+                 # 按flush_policy累积普通文本
+                 batcher = TextBatcher(self.flush_policy)
+                 tool_calls_processed = False
+                 # 有time策略时，模型暂时没有输出也按时发送累积的文本
+                 chunks = with_flush_ticks(generator, batcher) if batcher.timed else generator
+
+                 async for chunk in chunks: # AWAIT is used to iterate over the async generator
+                     if chunk is FLUSH_TICK:
+                         text = batcher.flush()
+                         if text and text.strip():
+                             yield {"text": text, "type": "normal"}
+                         continue
+                     if chunk.get("is_chunk", False):
+                         if chunk.get("token", False):
+                             if chunk.get("is_reasoning"):
+                                 yield {"text": chunk["assistant_text"], "type": "reasoning"}
+                             else:
+                                text = batcher.add(chunk["assistant_text"])
+                                if text and text.strip():  # 只发送非空文本
+                                    yield {"text": text, "type": "normal"}
+                         if chunk.get("tool_call_complete") and self.speculative_tool_dispatch:
+                             # 参数已经完整的工具调用先开始执行，不等模型输出结束
+                             for tc in chunk["tool_calls"]:
+                                 if tc["id"] not in speculative and tc.get("function", {}).get("name"):
+                                     speculative[tc["id"]] = asyncio.ensure_future(self._run_tool_call(tc, use_tool_cache))
+                         if not chunk.get("is_reasoning"):
+                            accumulated_text += chunk["assistant_text"]
+                     else:
+                         remaining = chunk["assistant_text"][len(accumulated_text):]
+                         if remaining:
+                             yield {"text": remaining, "type": "reasoning"} # YIELD here as well 剩余文本
+
+                         tool_calls = chunk.get("tool_calls", [])
+                         if tool_calls:
+                             # 工具调用之前先发送累积的文本，保持输出顺序
+                             text = batcher.flush()
+                             if text and text.strip():
+                                 yield {"text": text, "type": "normal"}
+                             for tc in tool_calls:
+                                 tc["type"] = "function"
+                             assistant_message = {
+                                 "role": "assistant",
+                                 "content": chunk["assistant_text"],
+                                 "tool_calls": tool_calls
+                             }
+                             conversation.append(assistant_message)
+                             yield {"text": f"{json.dumps(tool_calls, ensure_ascii=False)}", "type": "tool_call"}
+
+                             # 工具按完成的先后顺序返回给前端，但是按tool_calls的原始顺序写入会话
+                             async with contextlib.aclosing(self._execute_and_record(
+                                     conversation, tool_calls, use_tool_cache, speculative)) as results:
+                                 async for index, result in results:
+                                     if result:
+                                         yield {"text": f"{json.dumps(result)}", "type": "tool_result"}
+                                         tool_calls_processed = True
+
+                 # 发送剩余的累积文本
+                 text = batcher.flush()
+                 if text and text.strip():
+                     yield {"text": text, "type": "normal"}
+
+                 if not tool_calls_processed:
+                     break
+
+         finally:
+             # 模型输出出错或者调用方提前退出时，取消没有用到的提前执行的工具调用
+             for future in speculative.values():
+                 future.cancel()
+
+    async def _non_stream_response(self, sessionId, use_tool_cache=True):
          """Handles the non-streaming response logic."""
          # Move the non-stream logic from original init here
+         conversation = self.session_conversations[sessionId]
          final_text = ""
          while True:
-             gen_result = await generate_text(self.session_conversations[sessionId], self.chosen_model, self.all_functions, stream=False) # AWAIT valid here
+             messages = await self.context_manager.prepare(sessionId, conversation, self.chosen_model, self.all_functions)
+             gen_result = await generate_text(messages, self.chosen_model, self.all_functions, stream=False) # AWAIT valid here
 
              assistant_text = gen_result["assistant_text"]
              final_text = assistant_text
@@ -270,28 +417,116 @@ class BasicAgent:
                  for tc in tool_calls:
                      tc["type"] = "function"
                  assistant_message["tool_calls"] = tool_calls
-             self.session_conversations[sessionId].append(assistant_message)
+             conversation.append(assistant_message)
              logger.info(f"Added assistant message: {json.dumps(assistant_message, indent=2)}")
 
              if not tool_calls:
                  break
 
-             for tc in tool_calls:
-                 result = await process_tool_call(tc, self.servers, self.quiet_mode) # AWAIT valid here
-                 if result:
-                     self.session_conversations[sessionId].append(result)
+             async with contextlib.aclosing(self._execute_and_record(conversation, tool_calls, use_tool_cache)) as results:
+                 async for index, result in results:
                      logger.info(f"Added tool result: {json.dumps(result, indent=2)}")
 
          return final_text
 
 
+    async def _summarize(self, prompt):
+        """summarize上下文策略使用的总结函数，用当前模型生成，不带工具"""
+        result = await generate_text([{"role": "user", "content": prompt}], self.chosen_model, [], stream=False)
+        return result["assistant_text"]
+
+    async def _run_tool_call(self, tc, use_tool_cache=True):
+        """在Agent级别和server级别的并发上限内执行单个工具调用"""
+        entry = self.tool_registry.get(tc["function"]["name"])
+        server_semaphore = self._server_semaphores.get(entry.server_name) if entry else None
+        async with self._tool_semaphore:
+            if server_semaphore is None:
+                return await process_tool_call(tc, self.servers, self.quiet_mode, self.tool_cache, use_tool_cache,
+                                               self.tool_registry)
+            async with server_semaphore:
+                return await process_tool_call(tc, self.servers, self.quiet_mode, self.tool_cache, use_tool_cache,
+                                                   self.tool_registry)
+
+    async def _execute_tool_calls(self, tool_calls, use_tool_cache=True, started=None):
+        """
+        并发执行同一轮中的多个工具调用，哪个先完成就先返回哪个
+        started: tool_call id -> 模型输出过程中已经提前开始执行的工具调用，直接等待它的结果
+        Yields:
+            (index, result)，index是工具在tool_calls中的位置，方便调用方按原始顺序写入会话
+        """
+        pending = {}
+        for index, tc in enumerate(tool_calls):
+            if started and tc.get("id") in started:
+                pending[started.pop(tc["id"])] = index
+            elif tc.get("function", {}).get("name"):
+                pending[asyncio.ensure_future(self._run_tool_call(tc, use_tool_cache))] = index
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    yield index, future.result()
+        finally:
+            # 出错或者调用方提前退出时，取消还没有完成的工具调用
+            for future in pending:
+                future.cancel()
+
+    async def _execute_and_record(self, conversation, tool_calls, use_tool_cache=True, started=None):
+        """
+        执行工具调用，并把结果按tool_calls的原始顺序写入会话，前面的结果都到了就立即写入。
+        中途出错或者被取消时，没有结果的调用写入一条错误消息，保证每个tool_call都有对应的tool消息，
+        否则OpenAI兼容的接口会拒绝这个会话后续的所有请求
+        Yields:
+            (index, result)，按完成的先后顺序
+        """
+        results = {}
+        next_index = 0
+        try:
+            async with contextlib.aclosing(self._execute_tool_calls(tool_calls, use_tool_cache, started)) as calls:
+                async for index, result in calls:
+                    results[index] = result
+                    while next_index in results:
+                        self._append_tool_result(conversation, tool_calls[next_index], results[next_index])
+                        next_index += 1
+                    yield index, result
+        finally:
+            for index in range(next_index, len(tool_calls)):
+                self._append_tool_result(conversation, tool_calls[index], results.get(index))
+
+    @staticmethod
+    def _append_tool_result(conversation, tc, result):
+        """写入一个工具结果，原始数据data只返回给前端，不加入LLM的会话"""
+        if result:
+            conversation.append({key: value for key, value in result.items() if key != "data"})
+            return
+        func_name = tc.get("function", {}).get("name")
+        conversation.append({
+            "role": "tool",
+            "tool_call_id": tc.get("id"),
+            "name": func_name,
+            "content": json.dumps({"error": f"Tool call {func_name} did not complete"}),
+        })
+
     async def cleanup(self):
         """Clean up servers and log messages."""
         print("Cleaning up servers...")
+        if self._setup_task is not None and not self._setup_task.done():
+            self._setup_task.cancel()
         for cli in self.servers.values():
             await cli.stop() # AWAIT valid here
+        # 关闭共享的LLM provider连接池
+        await close_all_clients()
         print("Cleanup complete.")
 
+    def metrics(self) -> dict[str, Any]:
+        """Agent运行指标，包括会话存储、上下文裁剪和每个MCP server的session池"""
+        return {
+            "sessions": self.session_conversations.metrics(),
+            "context": self.context_manager.metrics(),
+            "mcp_servers": {name: client.metrics() for name, client in self.servers.items()},
+            "tool_cache": self.tool_cache.metrics(),
+        }
+
     def get_agent_response(self, response: str) -> dict[str, Any]:
         """Format agent response in a consistent structure."""
         try:
@@ -312,7 +547,7 @@ class BasicAgent:
                 "content": response
             }
 
-    async def stream(self, query: str, sessionId: str) -> AsyncIterable[dict[str, Any]]:
+    async def stream(self, query: str, sessionId: str, use_tool_cache: bool = True) -> AsyncIterable[dict[str, Any]]:
         """Stream updates from the MCP agent.
         """
         print(f"问题: {query}的sessionId为： {sessionId}")
@@ -332,6 +567,7 @@ class BasicAgent:
                     user_query=query,
                     sessionId=sessionId,
                     stream=True,
+                    use_tool_cache=use_tool_cache,
                 )
                 # Iterate through the chunks yielded by the response_generator
                 async for chunk in response_generator:
@@ -0,0 +1,143 @@
+"""
+把流式输出的文本增量合并成更少的artifact帧。
+BasicAgent.stream以很小的文本增量输出回答，每个增量一个TaskArtifactUpdateEvent会产生大量SSE帧和很多很小的artifact。
+ArtifactCoalescer合并连续的增量，直到待发送的文本达到max_bytes或者最早的增量已经等待window秒；
+with_flush_ticks在agent没有输出时(例如调用工具期间)按时间窗口唤醒消费者，文本不会被延迟超过window。
+consolidate_artifacts把流式发送的片段合并为每个index一个artifact，保存到task store
+"""
+
+import asyncio
+import time
+from contextlib import suppress
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Union
+
+from A2AServer.common.A2Atypes import Artifact, TextPart
+from A2AServer.flush_policy import TextBatcher
+
+DEFAULT_COALESCE_WINDOW = 0.05
+DEFAULT_COALESCE_MAX_BYTES = 512
+
+# with_flush_ticks产生的时间窗口到期信号
+FLUSH_TICK = object()
+
+
+class ArtifactCoalescer:
+    """Merge consecutive text deltas by time window and byte threshold.
+
+    Args:
+        window: Seconds the oldest pending delta may wait, 0 sends every delta at once
+        max_bytes: Pending UTF-8 bytes that trigger a flush
+    """
+
+    def __init__(self, window: float = DEFAULT_COALESCE_WINDOW, max_bytes: int = DEFAULT_COALESCE_MAX_BYTES):
+        self.window = window
+        self.max_bytes = max_bytes
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._first_at: Optional[float] = None
+        self.deltas = 0
+        self.frames = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def add(self, text: str) -> Optional[str]:
+        """Add a delta, return the merged text if it is time to send it."""
+        self.deltas += 1
+        if not self.enabled:
+            self.frames += 1
+            return text
+        if self._first_at is None:
+            self._first_at = time.monotonic()
+        self._pending.append(text)
+        self._pending_bytes += len(text.encode("utf-8"))
+        if self._pending_bytes >= self.max_bytes or time.monotonic() - self._first_at >= self.window:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """The pending text, None if there is none."""
+        if not self._pending:
+            return None
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._pending_bytes = 0
+        self._first_at = None
+        self.frames += 1
+        return text
+
+    def time_to_flush(self) -> Optional[float]:
+        """Seconds until the pending text must be sent, None if nothing is pending."""
+        if self._first_at is None:
+            return None
+        return max(0.0, self.window - (time.monotonic() - self._first_at))
+
+
+async def with_flush_ticks(items: AsyncIterable[Any],
+                           coalescer: Union[ArtifactCoalescer, TextBatcher]) -> AsyncIterator[Any]:
+    """
+    Iterate over items, yielding FLUSH_TICK whenever the coalescer's (or the
+    text batcher's) window expires before the next item arrives. The pending __anext__ is kept, not
+    cancelled, so no item is lost.
+    """
+    iterator = items.__aiter__()
+    next_item = None
+    try:
+        while True:
+            if next_item is None:
+                next_item = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({next_item}, timeout=coalescer.time_to_flush())
+            if not done:
+                yield FLUSH_TICK
+                continue
+            future, next_item = next_item, None
+            try:
+                item = future.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        if next_item is not None:
+            next_item.cancel()
+            with suppress(asyncio.CancelledError, StopAsyncIteration):
+                await next_item
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def _merge_text_parts(parts: List[Any]) -> List[Any]:
+    merged: List[Any] = []
+    texts: List[str] = []
+    for part in parts:
+        if isinstance(part, TextPart) and part.metadata is None:
+            texts.append(part.text)
+            continue
+        if texts:
+            merged.append(TextPart(text="".join(texts)))
+            texts = []
+        merged.append(part)
+    if texts:
+        merged.append(TextPart(text="".join(texts)))
+    # 流结束时的空文本块不保留
+    return [part for part in merged if not (isinstance(part, TextPart) and not part.text)] or merged[:1]
+
+
+def consolidate_artifacts(artifacts: List[Artifact]) -> List[Artifact]:
+    """
+    One artifact per index, with the parts of all its chunks in order and
+    consecutive text parts joined into one.
+    """
+    by_index: Dict[int, Artifact] = {}
+    parts: Dict[int, List[Any]] = {}
+    for artifact in artifacts:
+        if artifact.index not in by_index:
+            by_index[artifact.index] = artifact
+            parts[artifact.index] = []
+        parts[artifact.index].extend(artifact.parts)
+    return [
+        Artifact(name=first.name, description=first.description, metadata=first.metadata, index=index,
+                 parts=_merge_text_parts(parts[index]), lastChunk=True)
+        for index, first in sorted(by_index.items())
+    ]
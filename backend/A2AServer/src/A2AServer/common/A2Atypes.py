@@ -126,6 +126,11 @@ class TaskQueryParams(TaskIdParams):
     historyLength: int | None = None
 
 
+class TaskResubscriptionParams(TaskIdParams):
+    # 从第offset个事件(事件metadata中的seq)开始重放，None表示重放缓冲区中的所有事件
+    offset: int | None = None
+
+
 class TaskSendParams(BaseModel):
     id: str
     sessionId: str = Field(default_factory=lambda: uuid4().hex)
@@ -221,7 +226,7 @@ class GetTaskPushNotificationResponse(JSONRPCResponse):
 
 class TaskResubscriptionRequest(JSONRPCRequest):
     method: Literal["tasks/resubscribe",] = "tasks/resubscribe"
-    params: TaskIdParams
+    params: TaskResubscriptionParams
 
 
 A2ARequest = TypeAdapter(
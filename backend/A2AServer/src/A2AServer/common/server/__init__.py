@@ -1,4 +1,18 @@
 from .server import A2AServer
 from .task_manager import TaskManager, InMemoryTaskManager
+from .event_buffer import TaskEventBuffer
+from .task_archive import SQLiteTaskArchive
+from .task_store import TaskStore, InMemoryTaskStore, SQLiteTaskStore, RedisTaskStore, create_task_store
 
-__all__ = ["A2AServer", "TaskManager", "InMemoryTaskManager"]
+__all__ = [
+    "A2AServer",
+    "TaskManager",
+    "InMemoryTaskManager",
+    "TaskStore",
+    "InMemoryTaskStore",
+    "SQLiteTaskStore",
+    "RedisTaskStore",
+    "create_task_store",
+    "SQLiteTaskArchive",
+    "TaskEventBuffer",
+]
@@ -0,0 +1,49 @@
+"""
+任务SSE事件的有界重放缓冲区。
+任务发布的每个事件都有一个序号，从0开始，在任务的整个生命周期内递增(包括input-required之后的多次tasks/sendSubscribe)，
+通过事件的metadata["seq"]提供给客户端。缓冲区保留最近maxlen个事件，连接断开后tasks/resubscribe从客户端给出的offset开始重放，
+之后继续接收实时事件
+"""
+
+from collections import deque
+from typing import Any, Deque, List, Optional, Tuple
+
+DEFAULT_EVENT_BUFFER_SIZE = 1024
+
+
+class TaskEventBuffer:
+    """Ring buffer of the last events of one task."""
+
+    def __init__(self, maxlen: int = DEFAULT_EVENT_BUFFER_SIZE):
+        self.events: Deque[Any] = deque(maxlen=maxlen)
+        self.next_seq = 0
+        # 任务的事件流已经结束(最终事件、错误或生产者退出)
+        self.closed = False
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest event still in the buffer."""
+        return self.next_seq - len(self.events)
+
+    def append(self, event: Any) -> int:
+        """Add an event and return its sequence number."""
+        seq = self.next_seq
+        self.events.append(event)
+        self.next_seq += 1
+        return seq
+
+    def since(self, offset: Optional[int] = None) -> Tuple[List[Any], int]:
+        """
+        Events from sequence number offset on.
+
+        Returns:
+            (events, number of requested events that were already dropped from the buffer)
+        """
+        first_seq = self.first_seq
+        if offset is None or offset <= first_seq:
+            missed = 0 if offset is None else first_seq - max(offset, 0)
+            return list(self.events), missed
+        if offset >= self.next_seq:
+            return [], 0
+        events = list(self.events)
+        return events[offset - first_seq:], 0
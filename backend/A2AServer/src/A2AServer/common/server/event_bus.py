@@ -0,0 +1,280 @@
+"""
+任务的事件总线：agent在后台任务中运行，把事件发布到总线，每个SSE连接是总线的一个订阅者，有自己的有界队列，
+客户端断开不会中断任务，一个读取慢的客户端也不会让内存无限增长或者拖慢其他客户端。
+队列满时按事件类型的溢出策略处理：drop_oldest(非最终状态事件的默认值)、drop_newest、
+block(artifact的默认值，生产者等待，最多block_timeout秒，超时后断开订阅者)、
+disconnect(断开订阅者，客户端从最后收到的seq重新订阅)。
+最终状态事件、错误和流结束标记总是会送达。
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from A2AServer.common.A2Atypes import JSONRPCError, TaskArtifactUpdateEvent, TaskStatusUpdateEvent
+from A2AServer.common.server.event_buffer import TaskEventBuffer, DEFAULT_EVENT_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUBSCRIBER_QUEUE_SIZE = 256
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+DISCONNECT = "disconnect"
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK, DISCONNECT)
+
+DEFAULT_STATUS_OVERFLOW_POLICY = DROP_OLDEST
+DEFAULT_ARTIFACT_OVERFLOW_POLICY = BLOCK
+# block策略下生产者最多等待一个订阅者的秒数，不读取的订阅者不会一直卡住任务
+DEFAULT_BLOCK_TIMEOUT = 5.0
+
+
+def is_final(event: Any) -> bool:
+    """The end of a stream: a final status event, an error or the end marker None."""
+    return event is None or isinstance(event, JSONRPCError) or (
+        isinstance(event, TaskStatusUpdateEvent) and event.final
+    )
+
+
+def event_seq(event: Any) -> Optional[int]:
+    metadata = getattr(event, "metadata", None)
+    return metadata.get("seq") if metadata else None
+
+
+def _check_policy(policy: str) -> str:
+    if policy not in OVERFLOW_POLICIES:
+        raise ValueError(f"Unknown overflow policy {policy}, expected one of {OVERFLOW_POLICIES}")
+    return policy
+
+
+class SubscriberQueue:
+    """Bounded queue of one SSE subscriber, None marks the end of the stream.
+
+    Args:
+        maxsize: Number of queued events at which the overflow policies apply, <=0 is unbounded
+        status_policy: Overflow policy of non-final status events
+        artifact_policy: Overflow policy of artifact events
+        block_timeout: Seconds the producer waits for space before the subscriber
+            is disconnected, None to wait as long as it takes
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_SUBSCRIBER_QUEUE_SIZE,
+                 status_policy: str = DEFAULT_STATUS_OVERFLOW_POLICY,
+                 artifact_policy: str = DEFAULT_ARTIFACT_OVERFLOW_POLICY,
+                 block_timeout: Optional[float] = DEFAULT_BLOCK_TIMEOUT):
+        self.maxsize = maxsize
+        self.status_policy = _check_policy(status_policy)
+        self.artifact_policy = _check_policy(artifact_policy)
+        self.block_timeout = block_timeout
+        self._events: Deque[Any] = deque()
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.closed = False
+        # 延迟指标
+        self.created_at = time.monotonic()
+        self.last_seq: Optional[int] = None
+        self.delivered = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.blocked_seconds = 0.0
+        self.disconnected = False
+
+    def qsize(self) -> int:
+        return len(self._events)
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= len(self._events)
+
+    def policy_for(self, event: Any) -> str:
+        if is_final(event):
+            return BLOCK
+        if isinstance(event, TaskArtifactUpdateEvent):
+            return self.artifact_policy
+        return self.status_policy
+
+    def put_nowait(self, event: Any) -> None:
+        """Queue an event regardless of the bound (replayed events and the end of the stream)."""
+        self._events.append(event)
+        if len(self._events) > self.max_depth:
+            self.max_depth = len(self._events)
+        self._readable.set()
+
+    def offer(self, event: Any) -> bool:
+        """
+        Queue the event without waiting, applying the overflow policy when full.
+
+        Returns:
+            False when the producer has to wait for space (policy block), True otherwise
+        """
+        if self.closed:
+            return True
+        if not self.full():
+            self.put_nowait(event)
+            return True
+        policy = self.policy_for(event)
+        if policy == BLOCK:
+            return False
+        if policy == DROP_OLDEST and self._drop_oldest_like(event):
+            self.put_nowait(event)
+        elif policy == DISCONNECT:
+            logger.warning(f"SSE subscriber fell {self.qsize()} events behind, disconnecting it")
+            self._disconnect()
+        else:
+            self.dropped += 1
+        return True
+
+    def _disconnect(self) -> None:
+        self.disconnected = True
+        self.close()
+        # 让读取方结束流，客户端可以按最后收到的seq重新订阅
+        self.put_nowait(None)
+
+    async def put(self, event: Any) -> None:
+        """
+        Queue an event, waiting for space if its overflow policy is block. A
+        subscriber that makes no space within block_timeout is disconnected.
+        """
+        if self.offer(event):
+            return
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._wait_writable(), self.block_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"SSE subscriber read nothing for {self.block_timeout}s, disconnecting it")
+            self._disconnect()
+        self.blocked_seconds += time.monotonic() - started
+        if not self.closed:
+            self.put_nowait(event)
+
+    async def _wait_writable(self) -> None:
+        while self.full() and not self.closed:
+            self._writable.clear()
+            await self._writable.wait()
+
+    def _drop_oldest_like(self, event: Any) -> bool:
+        kind = type(event)
+        for i, queued in enumerate(self._events):
+            if type(queued) is kind and not is_final(queued):
+                del self._events[i]
+                self.dropped += 1
+                return True
+        self.dropped += 1
+        return False
+
+    async def get(self) -> Any:
+        while not self._events:
+            self._readable.clear()
+            await self._readable.wait()
+        event = self._events.popleft()
+        if not self.full():
+            self._writable.set()
+        seq = event_seq(event)
+        if seq is not None:
+            self.last_seq = seq
+        self.delivered += 1
+        return event
+
+    def close(self) -> None:
+        """The subscriber left or was disconnected, release a producer waiting for space."""
+        self.closed = True
+        self._events.clear()
+        self._writable.set()
+
+    def metrics(self, next_seq: int) -> Dict[str, Any]:
+        """Lag of this subscriber behind the newest published event."""
+        read_up_to = -1 if self.last_seq is None else self.last_seq
+        return {
+            "lag": max(0, next_seq - 1 - read_up_to),
+            "depth": self.qsize(),
+            "max_depth": self.max_depth,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "age_seconds": round(time.monotonic() - self.created_at, 3),
+        }
+
+
+class TaskEventBus:
+    """Replay buffer and subscribers of one task."""
+
+    def __init__(self, task_id: str, buffer_size: int = DEFAULT_EVENT_BUFFER_SIZE,
+                 queue_size: int = DEFAULT_SUBSCRIBER_QUEUE_SIZE,
+                 status_policy: str = DEFAULT_STATUS_OVERFLOW_POLICY,
+                 artifact_policy: str = DEFAULT_ARTIFACT_OVERFLOW_POLICY,
+                 block_timeout: Optional[float] = DEFAULT_BLOCK_TIMEOUT):
+        self.task_id = task_id
+        self.buffer = TaskEventBuffer(buffer_size)
+        self.queue_size = queue_size
+        self.status_policy = _check_policy(status_policy)
+        self.artifact_policy = _check_policy(artifact_policy)
+        self.block_timeout = block_timeout
+        # 发布时复制一份列表快照遍历，订阅和退出只替换列表，不需要加锁
+        self.subscribers: List[SubscriberQueue] = []
+        self.disconnected = 0
+
+    @property
+    def closed(self) -> bool:
+        return self.buffer.closed
+
+    def reopen(self) -> None:
+        """Start a new stream of the task, e.g. after input-required, keeping the sequence numbers."""
+        self.buffer.closed = False
+
+    def subscribe(self, replay: bool = False, offset: Optional[int] = None) -> SubscriberQueue:
+        """
+        Add a subscriber. With replay its queue starts with the buffered events
+        from offset on. Subscribing has no await point, so no event published
+        concurrently is missed or delivered twice.
+        """
+        queue = SubscriberQueue(self.queue_size, self.status_policy, self.artifact_policy, self.block_timeout)
+        if replay:
+            events, missed = self.buffer.since(offset)
+            if missed:
+                logger.warning(f"{missed} events of task {self.task_id} before offset {offset} were dropped from the replay buffer")
+            for event in events:
+                queue.put_nowait(event)
+            if self.closed:
+                queue.put_nowait(None)
+        self.subscribers = self.subscribers + [queue]
+        return queue
+
+    def unsubscribe(self, queue: SubscriberQueue) -> None:
+        queue.close()
+        if queue.disconnected:
+            self.disconnected += 1
+        self.subscribers = [q for q in self.subscribers if q is not queue]
+
+    async def publish(self, event: Any) -> int:
+        """Buffer the event, deliver it to the current subscribers and return its sequence number."""
+        seq = self.buffer.next_seq
+        if not isinstance(event, JSONRPCError):
+            event.metadata = {**(event.metadata or {}), "seq": seq}
+        self.buffer.append(event)
+        if is_final(event):
+            self.buffer.closed = True
+        blocked = [queue for queue in self.subscribers if not queue.offer(event)]
+        if blocked:
+            # 只等待队列满且策略为block的订阅者，并发等待，其他订阅者已经收到事件
+            await asyncio.gather(*[queue.put(event) for queue in blocked])
+        return seq
+
+    def close(self) -> None:
+        """End the stream of every subscriber."""
+        if self.closed:
+            return
+        self.buffer.closed = True
+        for queue in self.subscribers:
+            queue.put_nowait(None)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "next_seq": self.buffer.next_seq,
+            "buffered": len(self.buffer.events),
+            "closed": self.closed,
+            "disconnected": self.disconnected,
+            "subscribers": [queue.metrics(self.buffer.next_seq) for queue in self.subscribers],
+        }
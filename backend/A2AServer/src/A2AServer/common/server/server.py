@@ -19,9 +19,13 @@ from A2AServer.common.A2Atypes import (
     SendTaskStreamingRequest,
 )
 from pydantic import ValidationError
+from contextlib import asynccontextmanager
 import json
+import os
+import signal
 from typing import AsyncIterable, Any
 from A2AServer.common.server.task_manager import TaskManager
+from A2AServer.common.server.sse_encoder import encode_event, SSE_SEP
 
 import logging
 
@@ -36,13 +40,19 @@ class A2AServer:
         endpoint="/",
         agent_card: AgentCard = None,
         task_manager: TaskManager = None,
+        workers: int = 1,
     ):
+        """
+        workers: 服务器进程数，大于1时多个进程共享同一个监听socket，
+            task_manager需要使用共享的TaskStore(SQLite或Redis)，任意进程都能查询任务
+        """
         self.host = host
         self.port = port
+        self.workers = max(1, int(workers))
         self.endpoint = endpoint
         self.task_manager = task_manager
         self.agent_card = agent_card
-        self.app = Starlette()
+        self.app = Starlette(lifespan=self._lifespan)
         # 添加 CORS 中间件
         self.app.add_middleware(
             CORSMiddleware,
@@ -54,6 +64,8 @@ class A2AServer:
         self.app.add_route(
             "/.well-known/agent.json", self._get_agent_card, methods=["GET"]
         )
+        self.app.add_route("/ready", self._get_readiness, methods=["GET"])
+        self.app.add_route("/metrics", self._get_metrics, methods=["GET"])
 
     def start(self):
         if self.agent_card is None:
@@ -64,11 +76,78 @@ class A2AServer:
 
         import uvicorn
 
-        uvicorn.run(self.app, host=self.host, port=self.port)
+        if self.workers == 1:
+            uvicorn.run(self.app, host=self.host, port=self.port)
+        else:
+            self._run_workers()
+
+    def _run_workers(self):
+        """绑定一次socket，然后fork出多个worker进程，每个worker在同一个socket上运行uvicorn"""
+        import uvicorn
+
+        if not hasattr(os, "fork"):
+            logger.warning("workers > 1 requires os.fork, starting a single worker")
+            uvicorn.run(self.app, host=self.host, port=self.port)
+            return
+        task_store = getattr(self.task_manager, "task_store", None)
+        if task_store is not None and not task_store.shared:
+            logger.warning(f"workers={self.workers} with a {type(task_store).__name__}, tasks are not shared "
+                           f"between workers, use a SQLite or Redis task store")
+
+        config = uvicorn.Config(self.app, host=self.host, port=self.port)
+        sock = config.bind_socket()
+        children = []
+        for _ in range(self.workers):
+            pid = os.fork()
+            if pid == 0:
+                # worker进程: 恢复默认的信号处理，由uvicorn处理退出
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                try:
+                    uvicorn.Server(config).run(sockets=[sock])
+                finally:
+                    os._exit(0)
+            children.append(pid)
+        logger.info(f"Started {self.workers} workers on {self.host}:{self.port}: {children}")
+
+        def forward(signum, frame):
+            for child in children:
+                try:
+                    os.kill(child, signum)
+                except ProcessLookupError:
+                    pass
+
+        signal.signal(signal.SIGINT, forward)
+        signal.signal(signal.SIGTERM, forward)
+        for child in children:
+            while True:
+                try:
+                    os.waitpid(child, 0)
+                    break
+                except InterruptedError:
+                    continue
+                except ChildProcessError:
+                    break
+        sock.close()
+
+    @asynccontextmanager
+    async def _lifespan(self, app: Starlette):
+        await self.task_manager.on_startup()
+        try:
+            yield
+        finally:
+            await self.task_manager.on_shutdown()
 
     def _get_agent_card(self, request: Request) -> JSONResponse:
         return JSONResponse(self.agent_card.model_dump(exclude_none=True))
 
+    def _get_readiness(self, request: Request) -> JSONResponse:
+        readiness = self.task_manager.readiness()
+        return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+    def _get_metrics(self, request: Request) -> JSONResponse:
+        return JSONResponse(self.task_manager.metrics())
+
     async def _process_request(self, request: Request):
         try:
             body = await request.json()
@@ -116,11 +195,12 @@ class A2AServer:
     def _create_response(self, result: Any) -> JSONResponse | EventSourceResponse:
         if isinstance(result, AsyncIterable):
 
-            async def event_generator(result) -> AsyncIterable[dict[str, str]]:
+            async def event_generator(result) -> AsyncIterable[bytes]:
                 async for item in result:
-                    yield {"data": item.model_dump_json(exclude_none=True)}
+                    # 直接生成SSE帧，文本片段使用JSON模板，见sse_encoder.py
+                    yield encode_event(item)
 
-            return EventSourceResponse(event_generator(result))
+            return EventSourceResponse(event_generator(result), sep=SSE_SEP)
         elif isinstance(result, JSONRPCResponse):
             return JSONResponse(result.model_dump(exclude_none=True))
         else:
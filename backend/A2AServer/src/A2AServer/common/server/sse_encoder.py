@@ -0,0 +1,76 @@
+"""
+把流式JSON-RPC响应编码为SSE帧，tasks/sendSubscribe和tasks/resubscribe的每个事件是一个data帧。
+文本增量(artifact中只有一个TextPart)直接填入JSON模板，只转义字符串；其他响应按result的模型序列化后包上JSON-RPC信封，
+避免model_dump_json通过union类型序列化和sse_starlette再按行拆分的开销。
+输出与model_dump_json(exclude_none=True)相同，JSON中没有换行，所以总是一行data；安装了orjson时用它转义。
+"""
+
+import json
+from json.encoder import encode_basestring
+from typing import Any, Optional
+
+from sse_starlette.sse import ServerSentEvent
+
+from A2AServer.common.A2Atypes import SendTaskStreamingResponse, TaskArtifactUpdateEvent, TextPart
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SSE_SEP = "\r\n"
+
+_TEXT_DELTA = b'{"id":%b,"artifact":{"parts":[{"type":"text","text":%b}],"index":%d'
+_BOOL = {True: b"true", False: b"false"}
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    if type(value) is str:
+        return encode_basestring(value).encode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _text_delta_json(event: TaskArtifactUpdateEvent) -> Optional[bytes]:
+    """The event as JSON from the template, None if it is not a plain text delta."""
+    artifact = event.artifact
+    if (artifact.name is not None or artifact.description is not None or artifact.metadata is not None
+            or len(artifact.parts) != 1):
+        return None
+    part = artifact.parts[0]
+    if type(part) is not TextPart or part.metadata is not None:
+        return None
+    data = _TEXT_DELTA % (_dumps(event.id), _dumps(part.text), artifact.index)
+    if artifact.append is not None:
+        data += b',"append":' + _BOOL[artifact.append]
+    if artifact.lastChunk is not None:
+        data += b',"lastChunk":' + _BOOL[artifact.lastChunk]
+    data += b"}"
+    if event.metadata is not None:
+        data += b',"metadata":' + _dumps(event.metadata)
+    return data + b"}"
+
+
+def _response_json(item: SendTaskStreamingResponse) -> bytes:
+    if item.error is not None or item.result is None:
+        return item.model_dump_json(exclude_none=True).encode("utf-8")
+    result = None
+    if type(item.result) is TaskArtifactUpdateEvent:
+        try:
+            result = _text_delta_json(item.result)
+        except (TypeError, ValueError):
+            # orjson不支持的值，例如非字符串的dict键，交给pydantic处理
+            result = None
+    if result is None:
+        result = item.result.model_dump_json(exclude_none=True).encode("utf-8")
+    if item.id is None:
+        return b'{"jsonrpc":"2.0","result":%b}' % result
+    return b'{"jsonrpc":"2.0","id":%b,"result":%b}' % (_dumps(item.id), result)
+
+
+def encode_event(item: Any, sep: str = SSE_SEP) -> bytes:
+    """One SSE frame with the JSON of a streamed response."""
+    if type(item) is SendTaskStreamingResponse:
+        return b"data: " + _response_json(item) + sep.encode() * 2
+    return ServerSentEvent(data=item.model_dump_json(exclude_none=True), sep=sep).encode()
@@ -0,0 +1,108 @@
+"""
+InMemoryTaskStore淘汰的任务的磁盘归档，已结束任务的完整历史和artifacts不再占用内存，tasks/get仍然能查到。
+每个任务是SQLite表中的一行，JSON(包括推送通知配置)用zlib压缩
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from A2AServer.common.A2Atypes import PushNotificationConfig, Task
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteTaskArchive:
+    """Compressed archive of tasks in a SQLite database."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # 所有线程打开的连接，close时一起关闭
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS archived_tasks "
+                         "(id TEXT PRIMARY KEY, data BLOB NOT NULL, archived_at REAL NOT NULL)")
+        finally:
+            conn.close()
+        self.archived = 0
+        self.restored = 0
+        self.hits = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False只是为了close时可以在其它线程关闭，使用时仍然每个线程一个连接
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _encode(task: Task, push_notification_config: Optional[PushNotificationConfig]) -> bytes:
+        record = {
+            "task": task.model_dump(mode="json", exclude_none=True),
+            "push": push_notification_config.model_dump(mode="json", exclude_none=True) if push_notification_config else None,
+        }
+        return zlib.compress(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    @staticmethod
+    def _decode(data: bytes) -> Tuple[Task, Optional[PushNotificationConfig]]:
+        record = json.loads(zlib.decompress(data))
+        push = record.get("push")
+        return Task.model_validate(record["task"]), PushNotificationConfig.model_validate(push) if push else None
+
+    async def put(self, task: Task, push_notification_config: Optional[PushNotificationConfig] = None) -> None:
+        data = self._encode(task, push_notification_config)
+
+        def write():
+            self._connect().execute("INSERT OR REPLACE INTO archived_tasks (id, data, archived_at) VALUES (?, ?, ?)",
+                                    (task.id, data, time.time()))
+        await asyncio.to_thread(write)
+        self.archived += 1
+
+    async def get(self, task_id: str) -> Optional[Tuple[Task, Optional[PushNotificationConfig]]]:
+        """The archived task and its push notification config, None if the task is not archived."""
+        def read():
+            return self._connect().execute("SELECT data FROM archived_tasks WHERE id = ?", (task_id,)).fetchone()
+        row = await asyncio.to_thread(read)
+        if row is None:
+            return None
+        self.hits += 1
+        return self._decode(row[0])
+
+    async def delete(self, task_id: str) -> None:
+        """Remove a task that was restored to memory."""
+        def delete():
+            self._connect().execute("DELETE FROM archived_tasks WHERE id = ?", (task_id,))
+        await asyncio.to_thread(delete)
+        self.restored += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        return {
+            "path": self.path,
+            "archived": self.archived,
+            "restored": self.restored,
+            "hits": self.hits,
+            "file_bytes": size,
+        }
+
+    async def close(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
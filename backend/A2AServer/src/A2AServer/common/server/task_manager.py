@@ -27,16 +27,33 @@ from A2AServer.common.A2Atypes import (
     Artifact,
     PushNotificationConfig,
     TaskStatusUpdateEvent,
+    TaskArtifactUpdateEvent,
     JSONRPCError,
     TaskPushNotificationConfig,
     InternalError,
 )
 from A2AServer.common.server.utils import new_not_implemented_error
+from A2AServer.common.server.task_store import InMemoryTaskStore, TaskStore, create_task_store, task_view
+from A2AServer.common.server.event_buffer import DEFAULT_EVENT_BUFFER_SIZE
+from A2AServer.common.server.event_bus import (
+    TaskEventBus,
+    SubscriberQueue,
+    DEFAULT_SUBSCRIBER_QUEUE_SIZE,
+    DEFAULT_STATUS_OVERFLOW_POLICY,
+    DEFAULT_ARTIFACT_OVERFLOW_POLICY,
+    DEFAULT_BLOCK_TIMEOUT,
+)
+from collections import OrderedDict
 import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_CLOSED_EVENT_BUFFERS = 1000
+DEFAULT_RELAY_POLL_INTERVAL = 0.5
+# 这些状态之后任务不会再有新的事件，订阅的事件流结束
+FINAL_STATES = (TaskState.COMPLETED, TaskState.CANCELED, TaskState.FAILED, TaskState.INPUT_REQUIRED)
+
 class TaskManager(ABC):
     @abstractmethod
     async def on_get_task(self, request: GetTaskRequest) -> GetTaskResponse:
@@ -74,27 +91,112 @@ class TaskManager(ABC):
     ) -> Union[AsyncIterable[SendTaskResponse], JSONRPCResponse]:
         pass
 
+    async def on_startup(self) -> None:
+        """Called once when the server starts, before any request is served."""
+        pass
+
+    async def on_shutdown(self) -> None:
+        """Called once when the server shuts down."""
+        pass
+
+    def readiness(self) -> dict:
+        """Readiness report for load balancers, must contain a boolean 'ready' key."""
+        return {"ready": True}
+
+    def metrics(self) -> dict:
+        """Runtime metrics exposed on /metrics."""
+        return {}
+
 
 class InMemoryTaskManager(TaskManager):
-    def __init__(self):
-        self.tasks: dict[str, Task] = {}
-        self.push_notification_infos: dict[str, PushNotificationConfig] = {}
-        self.lock = asyncio.Lock()
-        self.task_sse_subscribers: dict[str, List[asyncio.Queue]] = {}
-        self.subscriber_lock = asyncio.Lock()
+    """
+    Task manager whose event buses and SSE subscribers live in process memory. Tasks and push
+    notification configs are kept in a TaskStore, in memory by default, or in a
+    shared SQLite/Redis store so several server workers see the same tasks.
+    """
+
+    def __init__(self, task_store: TaskStore | None = None, event_buffer_size: int = DEFAULT_EVENT_BUFFER_SIZE,
+                 max_closed_event_buffers: int = DEFAULT_MAX_CLOSED_EVENT_BUFFERS,
+                 subscriber_queue_size: int = DEFAULT_SUBSCRIBER_QUEUE_SIZE,
+                 status_overflow_policy: str = DEFAULT_STATUS_OVERFLOW_POLICY,
+                 artifact_overflow_policy: str = DEFAULT_ARTIFACT_OVERFLOW_POLICY,
+                 block_timeout: float | None = DEFAULT_BLOCK_TIMEOUT,
+                 relay_poll_interval: float = DEFAULT_RELAY_POLL_INTERVAL):
+        """
+        event_buffer_size: 每个任务保留的最近事件数，用于tasks/resubscribe重放
+        max_closed_event_buffers: 事件流已结束的任务最多保留多少个事件缓冲区
+        subscriber_queue_size: 每个SSE订阅者的队列长度，满了之后按溢出策略处理
+        status_overflow_policy / artifact_overflow_policy: 状态事件和artifact事件的溢出策略，
+            drop_oldest, drop_newest, block 或 disconnect
+        block_timeout: block策略下等待一个订阅者读取的秒数，超时后断开该订阅者，None表示一直等待
+        relay_poll_interval: 任务由其他worker执行时，tasks/resubscribe轮询共享task store的间隔(秒)
+        """
+        # 默认由环境变量A2A_TASK_STORE决定，没有设置时使用内存store
+        self.task_store = task_store or create_task_store()
+        self.event_buffer_size = event_buffer_size
+        self.max_closed_event_buffers = max_closed_event_buffers
+        self.subscriber_queue_size = subscriber_queue_size
+        self.status_overflow_policy = status_overflow_policy
+        self.artifact_overflow_policy = artifact_overflow_policy
+        self.block_timeout = block_timeout
+        self.relay_poll_interval = relay_poll_interval
+        # 事件总线的增删都是同步操作，在事件循环里不需要加锁
+        self.task_event_buses: dict[str, TaskEventBus] = {}
+        # 事件流已经结束的任务，按结束顺序
+        self._closed_event_buses: OrderedDict[str, None] = OrderedDict()
+        # 只为兼容以前直接使用self.lock / self.subscriber_lock的子类保留，管理器自己不再使用
+        self._lock = asyncio.Lock()
+        self._subscriber_lock = asyncio.Lock()
+
+    # -------------------------------------------------------------
+    # 以前的公开属性，只读，新代码使用task_store和task_event_buses
+    # -------------------------------------------------------------
+
+    def _memory_store(self, name: str) -> InMemoryTaskStore:
+        if not isinstance(self.task_store, InMemoryTaskStore):
+            raise AttributeError(f"{name} is only available with the in-memory task store, "
+                                 f"use task_store with {type(self.task_store).__name__}")
+        return self.task_store
+
+    @property
+    def tasks(self) -> dict[str, Task]:
+        """Tasks in memory, only with the in-memory task store. Deprecated, use task_store.get_task."""
+        return self._memory_store("tasks").tasks
+
+    @property
+    def push_notification_infos(self) -> dict[str, PushNotificationConfig]:
+        """Push notification configs in memory, only with the in-memory task store. Deprecated, use task_store."""
+        return self._memory_store("push_notification_infos").push_notification_infos
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Deprecated, task updates are locked per task by the task store and no longer take this lock."""
+        return self._lock
+
+    @property
+    def subscriber_lock(self) -> asyncio.Lock:
+        """Deprecated, subscribers are added and removed synchronously and no longer take this lock."""
+        return self._subscriber_lock
+
+    @property
+    def task_sse_subscribers(self) -> dict[str, List[SubscriberQueue]]:
+        """Snapshot of the SSE subscriber queues of each task. Deprecated, use task_event_buses."""
+        return {task_id: list(event_bus.subscribers)
+                for task_id, event_bus in self.task_event_buses.items() if event_bus.subscribers}
+
+    async def on_startup(self) -> None:
+        await self.task_store.start()
+
+    async def on_shutdown(self) -> None:
+        await self.task_store.close()
 
     async def on_get_task(self, request: GetTaskRequest) -> GetTaskResponse:
         logger.info(f"Getting task {request.params.id}")
         task_query_params: TaskQueryParams = request.params
 
-        async with self.lock:
-            task = self.tasks.get(task_query_params.id)
-            if task is None:
-                return GetTaskResponse(id=request.id, error=TaskNotFoundError())
-
-            task_result = self.append_task_history(
-                task, task_query_params.historyLength
-            )
+        task_result = await self.task_store.get_task_view(task_query_params.id, task_query_params.historyLength)
+        if task_result is None:
+            return GetTaskResponse(id=request.id, error=TaskNotFoundError())
 
         return GetTaskResponse(id=request.id, result=task_result)
 
@@ -102,10 +204,9 @@ class InMemoryTaskManager(TaskManager):
         logger.info(f"Cancelling task {request.params.id}")
         task_id_params: TaskIdParams = request.params
 
-        async with self.lock:
-            task = self.tasks.get(task_id_params.id)
-            if task is None:
-                return CancelTaskResponse(id=request.id, error=TaskNotFoundError())
+        task = await self.task_store.get_task(task_id_params.id)
+        if task is None:
+            return CancelTaskResponse(id=request.id, error=TaskNotFoundError())
 
         return CancelTaskResponse(id=request.id, error=TaskNotCancelableError())
 
@@ -120,29 +221,25 @@ class InMemoryTaskManager(TaskManager):
         pass
 
     async def set_push_notification_info(self, task_id: str, notification_config: PushNotificationConfig):
-        async with self.lock:
-            task = self.tasks.get(task_id)
-            if task is None:
-                raise ValueError(f"Task not found for {task_id}")
+        task = await self.task_store.get_task(task_id)
+        if task is None:
+            raise ValueError(f"Task not found for {task_id}")
 
-            self.push_notification_infos[task_id] = notification_config
+        await self.task_store.set_push_notification_info(task_id, notification_config)
 
-        return
-    
     async def get_push_notification_info(self, task_id: str) -> PushNotificationConfig:
-        async with self.lock:
-            task = self.tasks.get(task_id)
-            if task is None:
-                raise ValueError(f"Task not found for {task_id}")
+        task = await self.task_store.get_task(task_id)
+        if task is None:
+            raise ValueError(f"Task not found for {task_id}")
+
+        notification_info = await self.task_store.get_push_notification_info(task_id)
+        if notification_info is None:
+            raise KeyError(task_id)
+        return notification_info
 
-            return self.push_notification_infos[task_id]
-            
-        return
-    
     async def has_push_notification_info(self, task_id: str) -> bool:
-        async with self.lock:
-            return task_id in self.push_notification_infos
-            
+        return await self.task_store.has_push_notification_info(task_id)
+
 
     async def on_set_task_push_notification(
         self, request: SetTaskPushNotificationRequest
@@ -184,85 +281,148 @@ class InMemoryTaskManager(TaskManager):
 
     async def upsert_task(self, task_send_params: TaskSendParams) -> Task:
         logger.info(f"Upserting task {task_send_params.id}")
-        async with self.lock:
-            task = self.tasks.get(task_send_params.id)
-            if task is None:
-                task = Task(
-                    id=task_send_params.id,
-                    sessionId = task_send_params.sessionId,
-                    messages=[task_send_params.message],
-                    status=TaskStatus(state=TaskState.SUBMITTED),
-                    history=[task_send_params.message],
-                )
-                self.tasks[task_send_params.id] = task
-            else:
-                task.history.append(task_send_params.message)
-
-            return task
+        return await self.task_store.upsert_task(task_send_params)
 
     async def on_resubscribe_to_task(
         self, request: TaskResubscriptionRequest
     ) -> Union[AsyncIterable[SendTaskStreamingResponse], JSONRPCResponse]:
-        return new_not_implemented_error(request.id)
+        """
+        Replay the buffered events of the task from params.offset on, then
+        continue with the live events until the final event.
+
+        事件总线只在执行任务的worker进程里。任务由其他worker执行时(共享的task store)，
+        改为轮询task store，转发任务状态和artifact的变化直到任务结束；task store只保存
+        每次更新后的状态和合并后的artifact，中间的文本片段只有执行任务的worker能重放，
+        需要完整事件流时，负载均衡应按任务id把tasks/resubscribe路由到同一个worker。
+        """
+        logger.info(f"Resubscribing to task {request.params.id} from offset {request.params.offset}")
+        task_id = request.params.id
+        try:
+            sse_event_queue = await self.setup_sse_consumer(task_id, True, request.params.offset)
+        except ValueError:
+            task = await self.task_store.get_task(task_id)
+            if task is None:
+                return JSONRPCResponse(id=request.id, error=TaskNotFoundError())
+            if self.task_store.shared:
+                return self._relay_store_stream(request.id, task)
+            # 事件已经被淘汰，只返回任务的当前状态
+            return self._current_status_stream(request.id, task)
+        return self.dequeue_events_for_sse(request.id, task_id, sse_event_queue)
+
+    async def _current_status_stream(self, request_id, task: Task) -> AsyncIterable[SendTaskStreamingResponse]:
+        final = task.status.state in FINAL_STATES
+        yield SendTaskStreamingResponse(
+            id=request_id,
+            result=TaskStatusUpdateEvent(id=task.id, status=task.status, final=final),
+        )
+
+    async def _relay_store_stream(self, request_id, task: Task) -> AsyncIterable[SendTaskStreamingResponse]:
+        """轮询共享的task store，把其他worker写入的状态和新的artifact作为事件发送，直到任务结束"""
+        status, artifact_count = None, 0
+        while task is not None:
+            for artifact in (task.artifacts or [])[artifact_count:]:
+                yield SendTaskStreamingResponse(id=request_id, result=TaskArtifactUpdateEvent(id=task.id, artifact=artifact))
+            artifact_count = len(task.artifacts or [])
+            if task.status != status:
+                status = task.status
+                final = status.state in FINAL_STATES
+                yield SendTaskStreamingResponse(
+                    id=request_id,
+                    result=TaskStatusUpdateEvent(id=task.id, status=status, final=final),
+                )
+                if final:
+                    return
+            await asyncio.sleep(self.relay_poll_interval)
+            task = await self.task_store.get_task(task.id)
 
     async def update_store(
         self, task_id: str, status: TaskStatus, artifacts: list[Artifact]
     ) -> Task:
-        async with self.lock:
-            try:
-                task = self.tasks[task_id]
-            except KeyError:
-                logger.error(f"Task {task_id} not found for updating the task")
-                raise ValueError(f"Task {task_id} not found")
-
-            task.status = status
-
-            if status.message is not None:
-                task.history.append(status.message)
-
-            if artifacts is not None:
-                if task.artifacts is None:
-                    task.artifacts = []
-                task.artifacts.extend(artifacts)
-
-            return task
+        try:
+            return await self.task_store.update_task(task_id, status, artifacts)
+        except ValueError:
+            logger.error(f"Task {task_id} not found for updating the task")
+            raise
 
     def append_task_history(self, task: Task, historyLength: int | None):
-        new_task = task.model_copy()
-        if historyLength is not None and historyLength > 0:
-            new_task.history = new_task.history[-historyLength:]
-        else:
-            new_task.history = []
-
-        return new_task        
-
-    async def setup_sse_consumer(self, task_id: str, is_resubscribe: bool = False):
-        async with self.subscriber_lock:
-            if task_id not in self.task_sse_subscribers:
-                if is_resubscribe:
-                    raise ValueError("Task not found for resubscription")
-                else:
-                    self.task_sse_subscribers[task_id] = []
-
-            sse_event_queue = asyncio.Queue(maxsize=0) # <=0 is unlimited
-            self.task_sse_subscribers[task_id].append(sse_event_queue)
-            return sse_event_queue
+        return task_view(task, historyLength)
+
+    def _get_event_bus(self, task_id: str) -> TaskEventBus:
+        event_bus = self.task_event_buses.get(task_id)
+        if event_bus is None:
+            event_bus = TaskEventBus(task_id, self.event_buffer_size, self.subscriber_queue_size,
+                                     self.status_overflow_policy, self.artifact_overflow_policy, self.block_timeout)
+            self.task_event_buses[task_id] = event_bus
+        return event_bus
+
+    async def setup_sse_consumer(self, task_id: str, is_resubscribe: bool = False, offset: int | None = None):
+        """
+        Register an SSE subscriber of the task. A resubscriber's queue is first
+        filled with the buffered events from offset on, so it continues with the
+        live events without a gap or a duplicate.
+        """
+        if is_resubscribe:
+            event_bus = self.task_event_buses.get(task_id)
+            if event_bus is None:
+                raise ValueError("Task not found for resubscription")
+            return event_bus.subscribe(replay=True, offset=offset)
+
+        return self.open_event_bus(task_id).subscribe()
+
+    def open_event_bus(self, task_id: str) -> TaskEventBus:
+        """
+        开始任务新的一次流式执行前打开事件总线，包括input-required之后的继续对话，序号接着之前的事件
+        """
+        event_bus = self._get_event_bus(task_id)
+        event_bus.reopen()
+        self._closed_event_buses.pop(task_id, None)
+        return event_bus
 
     async def enqueue_events_for_sse(self, task_id, task_update_event):
-        async with self.subscriber_lock:
-            if task_id not in self.task_sse_subscribers:
-                return
-
-            current_subscribers = self.task_sse_subscribers[task_id]
-            for subscriber in current_subscribers:
-                await subscriber.put(task_update_event)
+        event_bus = self._get_event_bus(task_id)
+        await event_bus.publish(task_update_event)
+        if event_bus.closed:
+            self._retain_closed_event_bus(task_id)
+
+    async def close_sse_stream(self, task_id: str):
+        """End the SSE streams of the task, e.g. when the agent stopped without a final event."""
+        event_bus = self.task_event_buses.get(task_id)
+        if event_bus is None or event_bus.closed:
+            return
+        event_bus.close()
+        self._retain_closed_event_bus(task_id)
+
+    def _retain_closed_event_bus(self, task_id: str):
+        """Keep the events of a finished stream for late resubscribers, bounded by max_closed_event_buffers."""
+        self._closed_event_buses[task_id] = None
+        self._closed_event_buses.move_to_end(task_id)
+        while len(self._closed_event_buses) > self.max_closed_event_buffers:
+            tid, _ = self._closed_event_buses.popitem(last=False)
+            self.task_event_buses.pop(tid, None)
+
+    def metrics(self) -> dict:
+        """Task store metrics and event bus metrics, with the lag of every SSE subscriber behind its task's newest event."""
+        return {
+            "task_store": self.task_store.metrics(),
+            "event_bus": {
+                "tasks": len(self.task_event_buses),
+                "closed": len(self._closed_event_buses),
+                "subscribers": sum(len(event_bus.subscribers) for event_bus in self.task_event_buses.values()),
+                "per_task": {
+                    task_id: event_bus.metrics()
+                    for task_id, event_bus in self.task_event_buses.items() if event_bus.subscribers
+                },
+            }
+        }
 
     async def dequeue_events_for_sse(
-        self, request_id, task_id, sse_event_queue: asyncio.Queue
+        self, request_id, task_id, sse_event_queue: SubscriberQueue
     ) -> AsyncIterable[SendTaskStreamingResponse] | JSONRPCResponse:
         try:
             while True:                
                 event = await sse_event_queue.get()
+                if event is None:
+                    break
                 if isinstance(event, JSONRPCError):
                     yield SendTaskStreamingResponse(id=request_id, error=event)
                     break
@@ -271,7 +431,8 @@ class InMemoryTaskManager(TaskManager):
                 if isinstance(event, TaskStatusUpdateEvent) and event.final:
                     break
         finally:
-            async with self.subscriber_lock:
-                if task_id in self.task_sse_subscribers:
-                    self.task_sse_subscribers[task_id].remove(sse_event_queue)
-
+            event_bus = self.task_event_buses.get(task_id)
+            if event_bus is not None:
+                event_bus.unsubscribe(sse_event_queue)
+            else:
+                sse_event_queue.close()
@@ -0,0 +1,657 @@
+"""
+任务和推送通知配置的存储，通过create_task_store从URL创建：
+    memory://                     默认，只在一个进程内有效
+    memory://?max_tasks=10000&ttl=3600&archive=/path/to/archive.db
+    sqlite:///path/to/tasks.db    多个worker之间共享任务
+    redis://host:6379/0           多个worker之间共享任务
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from A2AServer.common.A2Atypes import (
+    Artifact,
+    PushNotificationConfig,
+    Task,
+    TaskSendParams,
+    TaskState,
+    TaskStatus,
+)
+from A2AServer.common.server.task_archive import SQLiteTaskArchive
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCK_SHARDS = 64
+DEFAULT_SWEEP_INTERVAL = 60
+# 每个任务最多缓存几个不同历史长度的视图，historyLength由客户端决定，不能无限缓存
+MAX_CACHED_VIEWS_PER_TASK = 4
+
+# 未结束的任务，包括等待用户输入和状态未知的，不会被淘汰
+ACTIVE_STATES = (TaskState.SUBMITTED, TaskState.WORKING, TaskState.INPUT_REQUIRED, TaskState.UNKNOWN)
+
+
+def new_task(task_send_params: TaskSendParams) -> Task:
+    return Task(
+        id=task_send_params.id,
+        sessionId=task_send_params.sessionId,
+        messages=[task_send_params.message],
+        status=TaskStatus(state=TaskState.SUBMITTED),
+        history=[task_send_params.message],
+    )
+
+
+def task_view(task: Task, history_length: Optional[int]) -> Task:
+    """
+    Shallow copy of the task with only its last history_length messages, no
+    history when history_length is None or 0. The artifacts list is copied
+    because apply_update extends it in place, status and messages are shared.
+    """
+    if history_length is not None and history_length > 0 and task.history:
+        history = task.history[-history_length:]
+    else:
+        history = []
+    artifacts = list(task.artifacts) if task.artifacts is not None else None
+    return task.model_copy(update={"history": history, "artifacts": artifacts})
+
+
+def apply_update(task: Task, status: TaskStatus, artifacts: Optional[List[Artifact]]) -> Task:
+    task.status = status
+    if status.message is not None:
+        task.history.append(status.message)
+    if artifacts is not None:
+        if task.artifacts is None:
+            task.artifacts = []
+        task.artifacts.extend(artifacts)
+    return task
+
+
+class TaskStore(ABC):
+    """Storage of tasks and their push notification configs."""
+
+    # 是否可以在多个进程之间共享，workers > 1时必须使用共享的store
+    shared = False
+
+    @abstractmethod
+    async def get_task(self, task_id: str) -> Optional[Task]:
+        pass
+
+    async def get_task_view(self, task_id: str, history_length: Optional[int]) -> Optional[Task]:
+        """The task as returned by tasks/get, with its last history_length messages."""
+        task = await self.get_task(task_id)
+        return None if task is None else task_view(task, history_length)
+
+    @abstractmethod
+    async def upsert_task(self, task_send_params: TaskSendParams) -> Task:
+        """Create the task, or append the message to its history if it exists."""
+        pass
+
+    @abstractmethod
+    async def update_task(self, task_id: str, status: TaskStatus, artifacts: Optional[List[Artifact]]) -> Task:
+        """Set the task status and append artifacts, raises ValueError if the task does not exist."""
+        pass
+
+    @abstractmethod
+    async def set_push_notification_info(self, task_id: str, notification_config: PushNotificationConfig) -> None:
+        pass
+
+    @abstractmethod
+    async def get_push_notification_info(self, task_id: str) -> Optional[PushNotificationConfig]:
+        pass
+
+    async def has_push_notification_info(self, task_id: str) -> bool:
+        return await self.get_push_notification_info(task_id) is not None
+
+    async def start(self) -> None:
+        """Called when the server starts, e.g. to start background maintenance."""
+        pass
+
+    def metrics(self) -> dict:
+        return {}
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryTaskStore(TaskStore):
+    """
+    保存在进程内存中的任务，默认的store。
+    读取不加锁，写入只锁住被修改的任务(按哈希分片的固定数量的锁)，不同任务的更新不会互相等待。
+    每次写入增加任务的版本号，tasks/get返回的视图按(版本号, 历史长度)缓存，任务不变时轮询不会分配新对象，
+    每个任务最多缓存MAX_CACHED_VIEWS_PER_TASK个视图，超出时淘汰最早缓存的。
+
+    保留策略：terminal_ttl为已结束任务(completed、canceled、failed)最后一次更新后保留的秒数，
+    max_tasks超出时淘汰最早结束的任务，未结束的任务(ACTIVE_STATES，包括等待用户输入的)不会被淘汰。
+    后台清理任务随服务启动，被淘汰的任务写入archive(如果有)，读取时从归档读取，继续对话时恢复到内存。
+
+    Args:
+        lock_shards: Number of write locks
+        max_tasks: Maximum number of tasks kept in memory, None for no limit
+        terminal_ttl: Seconds a finished task is kept in memory, None for no limit
+        archive: Where evicted tasks go, e.g. SQLiteTaskArchive; without one they are dropped
+        sweep_interval: Seconds between two sweeps
+    """
+
+    def __init__(self, lock_shards: int = DEFAULT_LOCK_SHARDS, max_tasks: Optional[int] = None,
+                 terminal_ttl: Optional[float] = None, archive: Optional[SQLiteTaskArchive] = None,
+                 sweep_interval: float = DEFAULT_SWEEP_INTERVAL):
+        self.tasks: dict[str, Task] = {}
+        self.push_notification_infos: dict[str, PushNotificationConfig] = {}
+        self.versions: dict[str, int] = {}
+        # task_id -> (version, {history_length: view})
+        self._views: dict[str, tuple[int, dict[Optional[int], Task]]] = {}
+        self._locks = [asyncio.Lock() for _ in range(max(1, lock_shards))]
+
+        self.max_tasks = max_tasks
+        self.terminal_ttl = terminal_ttl
+        self.archive = archive
+        self.sweep_interval = sweep_interval
+        # 已结束的任务 -> 最后一次更新的时间，按时间排序
+        self._finished: OrderedDict[str, float] = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._sweep_requested: Optional[asyncio.Event] = None
+        self.evicted = 0
+        self.expired = 0
+        # task_id -> (version, 序列化后的字节数)，用于估算内存占用
+        self._sizes: dict[str, tuple[int, int]] = {}
+
+    def _lock_for(self, task_id: str) -> asyncio.Lock:
+        return self._locks[hash(task_id) % len(self._locks)]
+
+    def _bump_version(self, task_id: str) -> None:
+        self.versions[task_id] = self.versions.get(task_id, 0) + 1
+        self._views.pop(task_id, None)
+        task = self.tasks[task_id]
+        if task.status.state in ACTIVE_STATES:
+            self._finished.pop(task_id, None)
+        else:
+            self._finished[task_id] = time.monotonic()
+            self._finished.move_to_end(task_id)
+
+    async def _load(self, task_id: str) -> Optional[Task]:
+        """The task in memory, restored from the archive if it was evicted. Called with the task's lock held."""
+        task = self.tasks.get(task_id)
+        if task is not None or self.archive is None:
+            return task
+        archived = await self.archive.get(task_id)
+        if archived is None:
+            return None
+        task, push_notification_config = archived
+        self.tasks[task_id] = task
+        if push_notification_config is not None:
+            self.push_notification_infos[task_id] = push_notification_config
+        await self.archive.delete(task_id)
+        logger.info(f"Restored task {task_id} from the archive")
+        return task
+
+    async def get_task(self, task_id: str) -> Optional[Task]:
+        task = self.tasks.get(task_id)
+        if task is None and self.archive is not None:
+            archived = await self.archive.get(task_id)
+            if archived is not None:
+                return archived[0]
+        return task
+
+    async def get_task_view(self, task_id: str, history_length: Optional[int]) -> Optional[Task]:
+        task = self.tasks.get(task_id)
+        if task is None:
+            # 已经归档的任务从归档中读取，不放回内存
+            archived = await self.get_task(task_id)
+            return None if archived is None else task_view(archived, history_length)
+        version = self.versions.get(task_id, 0)
+        cached = self._views.get(task_id)
+        if cached is None or cached[0] != version:
+            cached = (version, {})
+            self._views[task_id] = cached
+        # 历史长度为None、0或负数时都不返回历史，共用同一个视图；超过历史条数的都返回全部历史，也共用一个视图
+        if history_length is not None and history_length > 0:
+            key = min(history_length, len(task.history or ())) or None
+        else:
+            key = None
+        views = cached[1]
+        view = views.get(key)
+        if view is None:
+            view = task_view(task, key)
+            if len(views) >= MAX_CACHED_VIEWS_PER_TASK:
+                del views[next(iter(views))]
+            views[key] = view
+        return view
+
+    async def upsert_task(self, task_send_params: TaskSendParams) -> Task:
+        async with self._lock_for(task_send_params.id):
+            task = await self._load(task_send_params.id)
+            if task is None:
+                task = new_task(task_send_params)
+                self.tasks[task_send_params.id] = task
+                if self.max_tasks is not None and len(self.tasks) > self.max_tasks:
+                    self._request_sweep()
+            else:
+                task.history.append(task_send_params.message)
+            self._bump_version(task_send_params.id)
+            return task
+
+    async def update_task(self, task_id: str, status: TaskStatus, artifacts: Optional[List[Artifact]]) -> Task:
+        async with self._lock_for(task_id):
+            task = await self._load(task_id)
+            if task is None:
+                raise ValueError(f"Task {task_id} not found")
+            apply_update(task, status, artifacts)
+            self._bump_version(task_id)
+            return task
+
+    async def set_push_notification_info(self, task_id: str, notification_config: PushNotificationConfig) -> None:
+        async with self._lock_for(task_id):
+            await self._load(task_id)
+            self.push_notification_infos[task_id] = notification_config
+
+    async def get_push_notification_info(self, task_id: str) -> Optional[PushNotificationConfig]:
+        notification_config = self.push_notification_infos.get(task_id)
+        if notification_config is None and task_id not in self.tasks and self.archive is not None:
+            archived = await self.archive.get(task_id)
+            if archived is not None:
+                return archived[1]
+        return notification_config
+
+    # -------------------------------------------------------------
+    # Retention
+    # -------------------------------------------------------------
+
+    def _request_sweep(self) -> None:
+        if self._sweep_requested is not None:
+            self._sweep_requested.set()
+
+    async def start(self) -> None:
+        if (self.max_tasks is None and self.terminal_ttl is None) or self._sweeper is not None:
+            return
+        self._sweep_requested = asyncio.Event()
+        self._sweeper = asyncio.ensure_future(self._sweep_loop())
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._sweep_requested.wait(), self.sweep_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._sweep_requested.clear()
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error while sweeping tasks: {e}")
+
+    async def sweep(self) -> int:
+        """
+        Evict the finished tasks past terminal_ttl, then the least recently
+        finished ones while there are more than max_tasks.
+
+        Returns:
+            Number of evicted tasks
+        """
+        now = time.monotonic()
+        expired = []
+        if self.terminal_ttl is not None:
+            for task_id, finished_at in self._finished.items():
+                if now - finished_at < self.terminal_ttl:
+                    break
+                expired.append(task_id)
+        over_capacity = []
+        if self.max_tasks is not None:
+            excess = len(self.tasks) - len(expired) - self.max_tasks
+            if excess > 0:
+                expired_ids = set(expired)
+                for task_id in self._finished:
+                    if len(over_capacity) >= excess:
+                        break
+                    if task_id not in expired_ids:
+                        over_capacity.append(task_id)
+                if len(over_capacity) < excess:
+                    logger.warning(f"{len(self.tasks)} tasks in memory, more than max_tasks={self.max_tasks}, "
+                                   f"the others are still running")
+
+        evicted = 0
+        for task_id in expired + over_capacity:
+            if await self._evict(task_id):
+                evicted += 1
+        self.expired += len(expired)
+        if evicted:
+            logger.info(f"Evicted {evicted} tasks ({len(expired)} expired), {len(self.tasks)} tasks in memory")
+        return evicted
+
+    async def _evict(self, task_id: str) -> bool:
+        async with self._lock_for(task_id):
+            task = self.tasks.get(task_id)
+            # 等锁期间任务可能又开始运行了
+            if task is None or task.status.state in ACTIVE_STATES:
+                return False
+            if self.archive is not None:
+                # 先写归档再从内存删除，写归档期间读取仍然能拿到内存中的任务
+                await self.archive.put(task, self.push_notification_infos.get(task_id))
+            del self.tasks[task_id]
+            self.push_notification_infos.pop(task_id, None)
+            self.versions.pop(task_id, None)
+            self._views.pop(task_id, None)
+            self._sizes.pop(task_id, None)
+            self._finished.pop(task_id, None)
+            self.evicted += 1
+            return True
+
+    def metrics(self) -> dict:
+        """Number and approximate memory footprint of the tasks in memory, and the retention counters."""
+        approx_bytes = 0
+        messages = artifacts = 0
+        for task_id, task in self.tasks.items():
+            version = self.versions.get(task_id, 0)
+            cached = self._sizes.get(task_id)
+            if cached is None or cached[0] != version:
+                # 只有变化过的任务重新计算大小
+                cached = (version, len(task.model_dump_json(exclude_none=True)))
+                self._sizes[task_id] = cached
+            approx_bytes += cached[1]
+            messages += len(task.history or ())
+            artifacts += len(task.artifacts or ())
+        metrics = {
+            "tasks": len(self.tasks),
+            "finished": len(self._finished),
+            "push_notification_configs": len(self.push_notification_infos),
+            "messages": messages,
+            "artifacts": artifacts,
+            "approx_bytes": approx_bytes,
+            "max_tasks": self.max_tasks,
+            "terminal_ttl": self.terminal_ttl,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
+        if self.archive is not None:
+            metrics["archive"] = self.archive.metrics()
+        return metrics
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self.archive is not None:
+            await self.archive.close()
+
+
+class SQLiteTaskStore(TaskStore):
+    """Tasks in a SQLite database shared by all workers on the host.
+
+    Every read-modify-write runs in a BEGIN IMMEDIATE transaction, so concurrent
+    updates from different processes are serialized by SQLite.
+    """
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # 所有线程打开的连接，close时一起关闭
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # 建表用的连接用完就关闭，不能把连接带进fork出来的worker进程
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS tasks (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS push_notifications (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每个线程一个连接，sqlite3的连接不能跨线程使用
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False只是为了close时可以在其它线程关闭，使用时仍然每个线程一个连接
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _read(self, table: str, key: str) -> Optional[str]:
+        row = self._connect().execute(f"SELECT data FROM {table} WHERE id = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _modify_task(self, task_id: str, modify) -> Task:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            data = self._read("tasks", task_id)
+            task = modify(Task.model_validate_json(data) if data else None)
+            conn.execute("INSERT OR REPLACE INTO tasks (id, data) VALUES (?, ?)", (task.id, task.model_dump_json()))
+            conn.execute("COMMIT")
+            return task
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def get_task(self, task_id: str) -> Optional[Task]:
+        data = await asyncio.to_thread(self._read, "tasks", task_id)
+        return Task.model_validate_json(data) if data else None
+
+    async def upsert_task(self, task_send_params: TaskSendParams) -> Task:
+        def modify(task):
+            if task is None:
+                return new_task(task_send_params)
+            task.history.append(task_send_params.message)
+            return task
+        return await asyncio.to_thread(self._modify_task, task_send_params.id, modify)
+
+    async def update_task(self, task_id: str, status: TaskStatus, artifacts: Optional[List[Artifact]]) -> Task:
+        def modify(task):
+            if task is None:
+                raise ValueError(f"Task {task_id} not found")
+            return apply_update(task, status, artifacts)
+        return await asyncio.to_thread(self._modify_task, task_id, modify)
+
+    async def set_push_notification_info(self, task_id: str, notification_config: PushNotificationConfig) -> None:
+        def write():
+            self._connect().execute("INSERT OR REPLACE INTO push_notifications (id, data) VALUES (?, ?)",
+                                    (task_id, notification_config.model_dump_json()))
+        await asyncio.to_thread(write)
+
+    async def get_push_notification_info(self, task_id: str) -> Optional[PushNotificationConfig]:
+        data = await asyncio.to_thread(self._read, "push_notifications", task_id)
+        return PushNotificationConfig.model_validate_json(data) if data else None
+
+    async def close(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """Minimal asyncio client for the Redis protocol (RESP2), one request at a time."""
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, password: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def _ensure_connected(self) -> None:
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._send("AUTH", self.password)
+        if self.db:
+            await self._send("SELECT", self.db)
+
+    async def _send(self, *args) -> Any:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._writer.write(b"".join(parts))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply from Redis: {line!r}")
+
+    async def execute(self, *args) -> Any:
+        async with self._lock:
+            try:
+                await self._ensure_connected()
+                return await self._send(*args)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # 连接断开时重连一次
+                await self.close()
+                await self._ensure_connected()
+                return await self._send(*args)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = self._writer = None
+
+
+class RedisTaskStore(TaskStore):
+    """Tasks in Redis (or any server speaking the Redis protocol), shared by all workers and hosts.
+
+    Read-modify-write of a task holds a short per-task lock key (SET NX PX),
+    released with a compare-and-delete script.
+    """
+
+    shared = True
+    LOCK_TIMEOUT_MS = 5000
+    # 等锁的重试间隔从LOCK_RETRY_DELAY开始指数增长，最多LOCK_RETRY_MAX_DELAY秒
+    LOCK_RETRY_DELAY = 0.005
+    LOCK_RETRY_MAX_DELAY = 0.1
+    # 只有锁的值还是自己的token时才删除，GET和DEL之间锁可能已经过期并被其他worker拿到
+    RELEASE_SCRIPT = 'if redis.call("GET", KEYS[1]) == ARGV[1] then return redis.call("DEL", KEYS[1]) else return 0 end'
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 prefix: str = "a2a"):
+        self.redis = RedisConnection(host, port, db, password)
+        self.prefix = prefix
+
+    def _key(self, kind: str, task_id: str) -> str:
+        return f"{self.prefix}:{kind}:{task_id}"
+
+    async def _acquire(self, task_id: str) -> str:
+        token = uuid.uuid4().hex
+        key = self._key("lock", task_id)
+        deadline = time.monotonic() + self.LOCK_TIMEOUT_MS / 1000
+        delay = self.LOCK_RETRY_DELAY
+        while await self.redis.execute("SET", key, token, "NX", "PX", self.LOCK_TIMEOUT_MS) is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Timed out waiting for the lock of task {task_id}")
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.LOCK_RETRY_MAX_DELAY)
+        return token
+
+    async def _release(self, task_id: str, token: str) -> None:
+        await self.redis.execute("EVAL", self.RELEASE_SCRIPT, 1, self._key("lock", task_id), token)
+
+    async def _modify_task(self, task_id: str, modify) -> Task:
+        token = await self._acquire(task_id)
+        try:
+            data = await self.redis.execute("GET", self._key("task", task_id))
+            task = modify(Task.model_validate_json(data) if data else None)
+            await self.redis.execute("SET", self._key("task", task_id), task.model_dump_json())
+            return task
+        finally:
+            await self._release(task_id, token)
+
+    async def get_task(self, task_id: str) -> Optional[Task]:
+        data = await self.redis.execute("GET", self._key("task", task_id))
+        return Task.model_validate_json(data) if data else None
+
+    async def upsert_task(self, task_send_params: TaskSendParams) -> Task:
+        def modify(task):
+            if task is None:
+                return new_task(task_send_params)
+            task.history.append(task_send_params.message)
+            return task
+        return await self._modify_task(task_send_params.id, modify)
+
+    async def update_task(self, task_id: str, status: TaskStatus, artifacts: Optional[List[Artifact]]) -> Task:
+        def modify(task):
+            if task is None:
+                raise ValueError(f"Task {task_id} not found")
+            return apply_update(task, status, artifacts)
+        return await self._modify_task(task_id, modify)
+
+    async def set_push_notification_info(self, task_id: str, notification_config: PushNotificationConfig) -> None:
+        await self.redis.execute("SET", self._key("push", task_id), notification_config.model_dump_json())
+
+    async def get_push_notification_info(self, task_id: str) -> Optional[PushNotificationConfig]:
+        data = await self.redis.execute("GET", self._key("push", task_id))
+        return PushNotificationConfig.model_validate_json(data) if data else None
+
+    async def close(self) -> None:
+        await self.redis.close()
+
+
+def create_task_store(url: Optional[str] = None) -> TaskStore:
+    """
+    Create a task store from a URL, defaulting to the A2A_TASK_STORE environment variable.
+
+    Args:
+        url: memory://, sqlite:///path/to/tasks.db or redis://[:password@]host:port/db.
+            The memory store takes retention options as query parameters:
+            memory://?max_tasks=10000&ttl=3600&archive=/path/to/archive.db
+
+    Returns:
+        TaskStore
+    """
+    url = url or os.getenv("A2A_TASK_STORE") or "memory://"
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        return InMemoryTaskStore(
+            max_tasks=int(query["max_tasks"]) if "max_tasks" in query else None,
+            terminal_ttl=float(query["ttl"]) if "ttl" in query else None,
+            archive=SQLiteTaskArchive(query["archive"]) if "archive" in query else None,
+            sweep_interval=float(query.get("sweep_interval", DEFAULT_SWEEP_INTERVAL)),
+        )
+    if parsed.scheme == "sqlite":
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else parsed.path
+        return SQLiteTaskStore(path or "tasks.db")
+    if parsed.scheme == "redis":
+        db = int(parsed.path.lstrip("/") or 0)
+        return RedisTaskStore(parsed.hostname or "localhost", parsed.port or 6379, db, parsed.password)
+    raise ValueError(f"Unsupported task store URL: {url}")
@@ -0,0 +1,248 @@
+"""
+BasicAgent对话的上下文窗口管理：每次调用generate_text前把对话缩减到模型的上下文窗口以内，
+会话中保存的对话不会被修改，模型只收到缩减后的副本。
+策略：
+    none                不做处理(默认)
+    sliding_window      丢弃最早的轮次直到放得下
+    drop_tool_results   把旧的工具结果替换为简短的占位文本，仍然放不下时按sliding_window处理
+    summarize           用LLM生成的摘要替换旧的轮次，仍然放不下时按sliding_window处理
+带tool_calls的assistant消息和对应的工具结果总是一起保留或丢弃，模型不会看到没有对应的tool_call_id。
+"""
+
+import json
+import logging
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+POLICIES = ("none", "sliding_window", "drop_tool_results", "summarize")
+# 这些provider使用OpenAI兼容的tokenizer
+OPENAI_COMPATIBLE_PROVIDERS = ("openai", "deepseek", "zhipu", "vllm", "bytedance", "lmstudio")
+# 每条消息的role、分隔符等格式开销
+MESSAGE_OVERHEAD_TOKENS = 4
+DROPPED_TOOL_RESULT = "[工具结果已省略以节省上下文]"
+SUMMARY_PROMPT = "请简要总结下面的对话，保留用户的问题、已经得到的关键事实和结论、工具返回的重要数据，总结将替代原始对话作为后续对话的上下文。"
+
+_CJK_RE = re.compile("[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+TOKEN_CACHE_SIZE = 4096
+# (hash(text), len(text), provider, model) -> token数，按LRU淘汰
+_token_cache: "OrderedDict[tuple, int]" = OrderedDict()
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _encode_text_tokens(text: str, provider: str, model: str) -> int:
+    if tiktoken is not None and provider in OPENAI_COMPATIBLE_PROVIDERS:
+        return len(_get_encoding(model).encode(text, disallowed_special=()))
+    # 没有对应tokenizer时估算: 中日韩字符大约1个token，其它字符大约4个字符1个token
+    cjk = len(_CJK_RE.findall(text))
+    chars_per_token = 3.5 if provider == "anthropic" else 4
+    return cjk + int((len(text) - cjk) / chars_per_token) + 1
+
+
+def _count_text_tokens(text: str, provider: str, model: str) -> int:
+    # 缓存的key只用文本的hash和长度，不持有文本本身，被淘汰的会话和很长的工具结果可以被回收
+    key = (hash(text), len(text), provider, model)
+    count = _token_cache.get(key)
+    if count is None:
+        count = _encode_text_tokens(text, provider, model)
+        _token_cache[key] = count
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    else:
+        _token_cache.move_to_end(key)
+    return count
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content") or ""
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False, default=str)
+    if message.get("tool_calls"):
+        content += json.dumps(message["tool_calls"], ensure_ascii=False, default=str)
+    return content
+
+
+def count_message_tokens(message: Dict[str, Any], model_cfg: Dict) -> int:
+    """Number of prompt tokens a single conversation message costs for the model."""
+    provider = model_cfg.get("provider", "").lower()
+    return MESSAGE_OVERHEAD_TOKENS + _count_text_tokens(_message_text(message), provider, model_cfg.get("model", ""))
+
+
+def count_tokens(messages: List[Dict[str, Any]], model_cfg: Dict) -> int:
+    """Number of prompt tokens a list of conversation messages costs for the model."""
+    return sum(count_message_tokens(m, model_cfg) for m in messages)
+
+
+def count_tools_tokens(all_functions: List[Dict], model_cfg: Dict) -> int:
+    """Number of prompt tokens the tool definitions cost for the model."""
+    if not all_functions:
+        return 0
+    provider = model_cfg.get("provider", "").lower()
+    return _count_text_tokens(json.dumps(all_functions, ensure_ascii=False, sort_keys=True), provider, model_cfg.get("model", ""))
+
+
+def split_turns(conversation: List[Dict[str, Any]]):
+    """
+    Split a conversation into its system messages and its turns.
+
+    A turn runs from a user message up to the next one, so it always contains
+    complete tool_call/tool_result pairs. Messages before the first user message
+    (other than system messages) form a turn of their own.
+    """
+    system_messages = [m for m in conversation if m.get("role") == "system"]
+    turns: List[List[Dict[str, Any]]] = []
+    for message in conversation:
+        if message.get("role") == "system":
+            continue
+        if message.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return system_messages, turns
+
+
+class ContextManager:
+    """Reduce a conversation to the model's context window with a configurable policy.
+
+    Args:
+        policy: One of none, sliding_window, drop_tool_results, summarize.
+        max_tokens: Prompt token budget, including the tool definitions.
+        keep_recent_turns: Number of latest turns that are never reduced.
+        summarizer: Async callable turning a transcript into a summary, required by the summarize policy.
+    """
+
+    def __init__(self, policy: str = "none", max_tokens: Optional[int] = 32000,
+                 keep_recent_turns: int = 1,
+                 summarizer: Optional[Callable[[str], Awaitable[str]]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown context policy {policy!r}, expected one of {POLICIES}")
+        self.policy = policy
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = max(1, int(keep_recent_turns))
+        self.summarizer = summarizer
+        # sessionId -> (被总结的轮数, 总结内容, 第一条被总结的消息)，新的轮次只在之前的总结上增量总结
+        self._summaries: Dict[str, tuple] = {}
+        self.reduced_requests = 0
+        self.dropped_messages = 0
+        self.dropped_tool_results = 0
+        self.summaries = 0
+
+    async def prepare(self, session_id: str, conversation: List[Dict[str, Any]], model_cfg: Dict,
+                      all_functions: Optional[List[Dict]] = None) -> List[Dict[str, Any]]:
+        """
+        Return the messages to send to the model for this conversation.
+
+        Args:
+            session_id: Session of the conversation, used to reuse summaries
+            conversation: The full session conversation, it is not modified
+            model_cfg: Configuration for the model
+            all_functions: Available functions for the model to call
+
+        Returns:
+            The conversation itself if it fits, otherwise a reduced copy
+        """
+        if self.policy == "none" or not self.max_tokens:
+            return conversation
+        budget = self.max_tokens - count_tools_tokens(all_functions or [], model_cfg)
+        if count_tokens(conversation, model_cfg) <= budget:
+            return conversation
+
+        self.reduced_requests += 1
+        system_messages, turns = split_turns(conversation)
+        split = max(0, len(turns) - self.keep_recent_turns)
+        old_turns, recent_turns = turns[:split], turns[split:]
+
+        if self.policy == "drop_tool_results":
+            old_turns = [self._drop_tool_results(turn) for turn in old_turns]
+        elif self.policy == "summarize" and old_turns:
+            summary_message = await self._summarize(session_id, old_turns, model_cfg)
+            if summary_message is not None:
+                system_messages = system_messages + [summary_message]
+                old_turns = []
+
+        messages = self._sliding_window(system_messages, old_turns, recent_turns, budget, model_cfg)
+        logger.info(f"Reduced context of session {session_id} from {len(conversation)} to {len(messages)} messages with policy {self.policy}")
+        return messages
+
+    def _drop_tool_results(self, turn: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        reduced = []
+        for message in turn:
+            if message.get("role") == "tool" and message.get("content") != DROPPED_TOOL_RESULT:
+                message = {**message, "content": DROPPED_TOOL_RESULT}
+                self.dropped_tool_results += 1
+            reduced.append(message)
+        return reduced
+
+    def _sliding_window(self, system_messages, old_turns, recent_turns, budget, model_cfg):
+        used = count_tokens(system_messages, model_cfg) + sum(count_tokens(t, model_cfg) for t in recent_turns)
+        kept: List[List[Dict[str, Any]]] = []
+        # 从最新的轮次往前保留，直到超出预算，整轮丢弃以保证tool_call和tool_result成对出现
+        for turn in reversed(old_turns):
+            cost = count_tokens(turn, model_cfg)
+            if used + cost > budget:
+                break
+            kept.insert(0, turn)
+            used += cost
+        self.dropped_messages += sum(len(t) for t in old_turns[:len(old_turns) - len(kept)])
+        messages = list(system_messages)
+        for turn in kept + recent_turns:
+            messages.extend(turn)
+        return messages
+
+    async def _summarize(self, session_id, old_turns, model_cfg) -> Optional[Dict[str, Any]]:
+        if self.summarizer is None:
+            logger.warning("summarize context policy has no summarizer, falling back to sliding_window")
+            return None
+        covered, summary, first_message = self._summaries.get(session_id, (0, "", None))
+        if covered > len(old_turns) or old_turns[0][0] is not first_message:
+            # 会话被裁剪过，之前的总结不再对应当前的轮次
+            covered, summary = 0, ""
+        if covered < len(old_turns):
+            transcript = self._transcript(old_turns[covered:])
+            if summary:
+                transcript = f"之前对话的总结:\n{summary}\n\n后续对话:\n{transcript}"
+            try:
+                summary = await self.summarizer(f"{SUMMARY_PROMPT}\n\n{transcript}")
+            except Exception as e:
+                logger.error(f"Failed to summarize session {session_id}, falling back to sliding_window: {e}")
+                return None
+            self._summaries[session_id] = (len(old_turns), summary, old_turns[0][0])
+            self.summaries += 1
+        return {"role": "system", "content": f"之前对话的总结: {summary}"}
+
+    @staticmethod
+    def _transcript(turns: List[List[Dict[str, Any]]]) -> str:
+        lines = []
+        for turn in turns:
+            for message in turn:
+                lines.append(f"{message.get('role')}: {_message_text(message)}")
+        return "\n".join(lines)
+
+    def forget(self, session_id: str) -> None:
+        """Drop the cached summary of a session."""
+        self._summaries.pop(session_id, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Policy, budget and reduction counters."""
+        return {
+            "policy": self.policy,
+            "max_tokens": self.max_tokens,
+            "reduced_requests": self.reduced_requests,
+            "dropped_messages": self.dropped_messages,
+            "dropped_tool_results": self.dropped_tool_results,
+            "summaries": self.summaries,
+        }
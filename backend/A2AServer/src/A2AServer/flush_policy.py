@@ -0,0 +1,216 @@
+"""
+BasicAgent流式输出普通文本时的flush策略：token先收集在TextBatcher中，策略满足时才作为一段"normal"文本输出。
+    tokens:N    累积N个token
+    chars:N     累积N个字符
+    bytes:N     累积N个UTF-8字节
+    time:MS     最早的token已经等待MS毫秒，模型暂时没有新的token时也按时输出(agent用with_flush_ticks计时)
+    sentence    token以句子或子句的边界结尾(。！？，；：.!?;:或换行)，或者只有空白的token
+    punct       整个token是中文标点(。！？，；：)或换行中的一个或几个，或者只有空白的token
+多个策略用"+"组合，任意一个满足就输出，例如"sentence+time:200"。
+默认的"chars:5+punct"与之前的固定行为一致：累积5个字符，或者收到单独的中文标点、空白token时输出。
+调用工具前和一轮结束时总是会输出剩余的文本。
+"""
+
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional, Union
+
+DEFAULT_FLUSH_POLICY = "chars:5+punct"
+SENTENCE_BOUNDARIES = "。！？，；：.!?;:\n"
+PUNCTUATION_TOKENS = "。！？，；：\n"
+
+
+class TextBatch:
+    """Text pending in a TextBatcher."""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.tokens = 0
+        self.chars = 0
+        self.bytes = 0
+        self.started_at: Optional[float] = None
+        self.last_token = ""
+
+    def add(self, token: str) -> None:
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        self.parts.append(token)
+        self.tokens += 1
+        self.chars += len(token)
+        self.bytes += len(token.encode("utf-8"))
+        self.last_token = token
+
+    @property
+    def age(self) -> float:
+        return 0.0 if self.started_at is None else time.monotonic() - self.started_at
+
+
+class FlushPolicy(ABC):
+    """Decides when the pending text of a stream is sent."""
+
+    @abstractmethod
+    def should_flush(self, batch: TextBatch) -> bool:
+        pass
+
+    def max_wait(self) -> Optional[float]:
+        """Seconds the oldest pending token may wait even if no other token arrives, None for no time bound."""
+        return None
+
+    def __add__(self, other: "FlushPolicy") -> "FlushPolicy":
+        return AnyPolicy(self, other)
+
+
+class TokenCountPolicy(FlushPolicy):
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+
+    def should_flush(self, batch: TextBatch) -> bool:
+        return batch.tokens >= self.tokens
+
+    def __repr__(self):
+        return f"tokens:{self.tokens}"
+
+
+class CharCountPolicy(FlushPolicy):
+    def __init__(self, chars: int):
+        self.chars = chars
+
+    def should_flush(self, batch: TextBatch) -> bool:
+        return batch.chars >= self.chars
+
+    def __repr__(self):
+        return f"chars:{self.chars}"
+
+
+class ByteSizePolicy(FlushPolicy):
+    def __init__(self, size: int):
+        self.size = size
+
+    def should_flush(self, batch: TextBatch) -> bool:
+        return batch.bytes >= self.size
+
+    def __repr__(self):
+        return f"bytes:{self.size}"
+
+
+class TimePolicy(FlushPolicy):
+    def __init__(self, max_ms: float):
+        self.max_ms = max_ms
+
+    def should_flush(self, batch: TextBatch) -> bool:
+        return batch.age * 1000 >= self.max_ms
+
+    def max_wait(self) -> Optional[float]:
+        return self.max_ms / 1000
+
+    def __repr__(self):
+        return f"time:{self.max_ms:g}"
+
+
+class SentencePolicy(FlushPolicy):
+    def __init__(self, boundaries: str = SENTENCE_BOUNDARIES):
+        self.boundaries = boundaries
+
+    def should_flush(self, batch: TextBatch) -> bool:
+        token = batch.last_token
+        return token.strip() == "" or token.rstrip(" ")[-1:] in self.boundaries
+
+    def __repr__(self):
+        return "sentence"
+
+
+class PunctuationPolicy(FlushPolicy):
+    """Flush on a token made only of punctuation, the fixed rule used before flush policies existed."""
+
+    def __init__(self, punctuation: str = PUNCTUATION_TOKENS):
+        self.punctuation = punctuation
+
+    def should_flush(self, batch: TextBatch) -> bool:
+        token = batch.last_token
+        return token in self.punctuation or token.strip() == ""
+
+    def __repr__(self):
+        return "punct"
+
+
+class AnyPolicy(FlushPolicy):
+    """Flush as soon as any of the policies says so."""
+
+    def __init__(self, *policies: FlushPolicy):
+        self.policies = policies
+
+    def should_flush(self, batch: TextBatch) -> bool:
+        return any(policy.should_flush(batch) for policy in self.policies)
+
+    def max_wait(self) -> Optional[float]:
+        waits = [wait for wait in (policy.max_wait() for policy in self.policies) if wait is not None]
+        return min(waits) if waits else None
+
+    def __repr__(self):
+        return "+".join(repr(policy) for policy in self.policies)
+
+
+_POLICY_TYPES = {
+    "tokens": lambda value: TokenCountPolicy(int(value)),
+    "chars": lambda value: CharCountPolicy(int(value)),
+    "bytes": lambda value: ByteSizePolicy(int(value)),
+    "time": lambda value: TimePolicy(float(value)),
+}
+
+
+def create_flush_policy(spec: Union[str, FlushPolicy, None]) -> FlushPolicy:
+    """
+    Build a flush policy from its spec, e.g. "sentence+time:200".
+
+    Args:
+        spec: Policy spec, a FlushPolicy instance, or None for DEFAULT_FLUSH_POLICY
+    """
+    if isinstance(spec, FlushPolicy):
+        return spec
+    policies = []
+    for item in (spec or DEFAULT_FLUSH_POLICY).split("+"):
+        name, _, value = item.strip().partition(":")
+        if name == "sentence":
+            policies.append(SentencePolicy())
+        elif name == "punct":
+            policies.append(PunctuationPolicy())
+        elif name in _POLICY_TYPES and value:
+            policies.append(_POLICY_TYPES[name](value))
+        else:
+            raise ValueError(f"Unknown flush policy {item!r}, expected tokens:N, chars:N, bytes:N, time:MS, sentence or punct")
+    return policies[0] if len(policies) == 1 else AnyPolicy(*policies)
+
+
+class TextBatcher:
+    """Collects streamed tokens and releases them as the flush policy decides."""
+
+    def __init__(self, policy: Union[str, FlushPolicy, None] = None):
+        self.policy = create_flush_policy(policy)
+        self.max_wait = self.policy.max_wait()
+        self._batch = TextBatch()
+
+    @property
+    def timed(self) -> bool:
+        """Whether the policy has a time bound that needs a timer between tokens."""
+        return self.max_wait is not None
+
+    def add(self, token: str) -> Optional[str]:
+        """Add a token, return the pending text if it should be sent now."""
+        self._batch.add(token)
+        if self.policy.should_flush(self._batch):
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """The pending text, None if there is none."""
+        if not self._batch.parts:
+            return None
+        text = "".join(self._batch.parts)
+        self._batch = TextBatch()
+        return text
+
+    def time_to_flush(self) -> Optional[float]:
+        """Seconds until the pending text must be sent, None if nothing is pending or there is no time bound."""
+        if self.max_wait is None or self._batch.started_at is None:
+            return None
+        return max(0.0, self.max_wait - self._batch.age)
@@ -16,10 +16,12 @@ from contextlib import AsyncExitStack
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from mcp.client.sse import sse_client
-from mcp import ClientSession
 from anyio import ClosedResourceError
 
 from .utils import load_mcp_config_from_file
+from .session_pool import MCPSessionPool, CONNECTION_ERRORS, DEFAULT_RECONNECT_TIMEOUT
+from .tool_cache import ToolResultCache
+from .tool_registry import ToolRegistry
 from .providers.openai import generate_with_openai
 from .providers.deepseek import generate_with_deepseek
 from .providers.anthropic import generate_with_anthropic
@@ -32,37 +34,32 @@ from .providers.zhipu import generate_with_zhipu
 logger = logging.getLogger(__name__)
 
 
-class SSEMCPClient:
+class SSEMCPClient(MCPSessionPool):
     """Implementation for a SSE-based MCP server."""
 
-    def __init__(self, server_name: str, url: str):
-        self.server_name = server_name
+    def __init__(self, server_name: str, url: str, pool_size: int = 1, health_check_interval: float = 30,
+                 health_check_timeout: float = 5, reconnect_timeout: float = DEFAULT_RECONNECT_TIMEOUT):
+        super().__init__(server_name, pool_size, health_check_interval, health_check_timeout, reconnect_timeout)
         self.url = url
-        self.tools = []
-        self._streams_context = None
-        self._session_context = None
-        self.session = None
 
-    async def start(self):
-        try:
-            self._streams_context = sse_client(url=self.url, sse_read_timeout=None)
-            streams = await self._streams_context.__aenter__()
-
-            self._session_context = ClientSession(*streams)
-            self.session = await self._session_context.__aenter__()
+    async def _open_session(self, stack: AsyncExitStack) -> ClientSession:
+        streams = await stack.enter_async_context(sse_client(url=self.url, sse_read_timeout=None))
+        session = await stack.enter_async_context(ClientSession(*streams))
+        # Initialize
+        await session.initialize()
+        return session
 
-            # Initialize
-            await self.session.initialize()
-            return True
-        except Exception as e:
-            logger.error(f"Server {self.server_name}: SSE connection error: {str(e)}")
-            return False
+    async def start(self):
+        ok = await super().start()
+        if not ok:
+            logger.error(f"Server {self.server_name}: SSE connection error")
+        return ok
 
     async def list_tools(self):
         if not self.session:
             return []
         try:
-            response = await self.session.list_tools()
+            response = await self._with_session(lambda session: session.list_tools())
             # 将 pydantic 模型转换为字典格式
             self.tools = [
                 Tool(tool.name, tool.description, tool.inputSchema) for tool in response.tools
@@ -73,29 +70,24 @@ class SSEMCPClient:
             return []
 
     async def call_tool(self, tool_name: str, arguments: dict, retries: int = 2, delay: float = 1.0,):
-        if not self.session:
+        if not self.session and not self._slots:
             return {"error": "MCP SSE Not connected"}
 
-        if not self.session:
-            raise RuntimeError(f"Server {self.name} not initialized")
-
         attempt = 0
         while attempt < retries:
             try:
                 logger.info(f"开始使用SSE MCP协议调用工具，tool_name: {tool_name}, arguments: {arguments}")
-                response = await self.session.call_tool(tool_name, arguments, read_timeout_seconds=timedelta(seconds=6))
+                # session断开时会立即换到其它warm session重试，断开的session在后台重连
+                response = await self._with_session(
+                    lambda session: session.call_tool(tool_name, arguments, read_timeout_seconds=timedelta(seconds=6)),
+                    retries=retries,
+                )
                 # 将 pydantic 模型转换为字典格式
                 return response.model_dump() if hasattr(response, 'model_dump') else response
-            except ClosedResourceError as e:
-                logger.warning(f"Session closed: {e.__repr__()}, attempting to restart session.")
-                await self.cleanup()
-                status = await self.start()  # 重新建立 session
-                if status:
-                    logger.info("Session restarted successfully.")
-                else:
-                    logger.error("Failed to restart session.")
-                attempt += 1
-                await asyncio.sleep(delay)
+            except CONNECTION_ERRORS as e:
+                # 没有可用的session时只让这一个工具调用失败，错误返回给模型，不中断同一轮的其它工具调用
+                logger.error(f"Max retries reached, server {self.server_name} is not connected: {e.__repr__()}")
+                return {"error": f"MCP server {self.server_name} connection error: {e}"}
             except Exception as e:
                 attempt += 1
                 logger.warning(
@@ -108,29 +100,16 @@ class SSEMCPClient:
                     logger.error("Max retries reached. Failing.")
                     raise
 
-    async def stop(self):
-        await self.cleanup()
-    async def cleanup(self):
-        try:
-            if self.session:
-                await self._session_context.__aexit__(None, None, None)
-            if self._streams_context:
-                await self._streams_context.__aexit__(None, None, None)
-        except Exception as e:
-            logger.warning(f"Error cleaning up SSE client: {e.__repr__()}")
 
-
-class MCPClient:
+class MCPClient(MCPSessionPool):
     """Manages MCP server connections and tool execution."""
 
-    def __init__(self, server_name: str, command, args=None, env=None) -> None:
-        self.name: str = server_name
+    def __init__(self, server_name: str, command, args=None, env=None, pool_size: int = 1,
+                 health_check_interval: float = 30, health_check_timeout: float = 5,
+                 reconnect_timeout: float = DEFAULT_RECONNECT_TIMEOUT) -> None:
+        super().__init__(server_name, pool_size, health_check_interval, health_check_timeout, reconnect_timeout)
         self.config: dict[str, Any] = {"command": command, "args": args, "env": env}
-        self.stdio_context: Any | None = None
-        self.session: ClientSession | None = None
-        self._cleanup_lock: asyncio.Lock = asyncio.Lock()
-        self.exit_stack: AsyncExitStack = AsyncExitStack()
-        self.tools = []
+        self._server_params: StdioServerParameters | None = None
 
     async def start(self) -> bool:
         """Initialize the server connection."""
@@ -147,28 +126,24 @@ class MCPClient:
         if command is None:
             raise ValueError("The command must be a valid string and cannot be None.")
 
-        server_params = StdioServerParameters(
+        self._server_params = StdioServerParameters(
             command=command,
             args=self.config["args"],
             env={**os.environ, **self.config["env"]}
             if self.config.get("env")
             else None,
         )
-        try:
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(server_params)
-            )
-            read, write = stdio_transport
-            session = await self.exit_stack.enter_async_context(
-                ClientSession(read, write)
-            )
-            await session.initialize()
-            self.session = session
-            return True
-        except Exception as e:
-            logger.error(f"Error initializing server {self.name}: {e}")
+        ok = await super().start()
+        if not ok:
+            logger.error(f"Error initializing server {self.name}")
             await self.cleanup()
-            return False
+        return ok
+
+    async def _open_session(self, stack: AsyncExitStack) -> ClientSession:
+        read, write = await stack.enter_async_context(stdio_client(self._server_params))
+        session = await stack.enter_async_context(ClientSession(read, write))
+        await session.initialize()
+        return session
 
     async def list_tools(self) -> list[Any]:
         """List available tools from the server.
@@ -182,7 +157,7 @@ class MCPClient:
         if not self.session:
             raise RuntimeError(f"Server {self.name} not initialized")
 
-        tools_response = await self.session.list_tools()
+        tools_response = await self._with_session(lambda session: session.list_tools())
         tools = []
 
         for item in tools_response:
@@ -204,38 +179,38 @@ class MCPClient:
     ) -> Any:
         """Execute a tool with retry mechanism.
 
+        A closed session is not restarted inside the call: the call moves to another
+        warm session right away and the closed one is reconnected in the background.
+
         Args:
             tool_name: Name of the tool to execute.
             arguments: Tool arguments.
             retries: Number of retry attempts.
-            delay: Delay between retries in seconds.
+            delay: Delay between retries of failed tool executions in seconds.
 
         Returns:
-            Tool execution result.
+            Tool execution result, or {"error": ...} when no session could be used.
 
         Raises:
             RuntimeError: If server is not initialized.
             Exception: If tool execution fails after all retries.
         """
-        if not self.session:
+        if not self.session and not self._slots:
             raise RuntimeError(f"Server {self.name} not initialized")
 
         attempt = 0
         while attempt < retries:
             try:
                 logger.info(f"执行工具: {tool_name}...，最多等待6秒")
-                response = await self.session.call_tool(tool_name, arguments, read_timeout_seconds=timedelta(seconds=6))
+                response = await self._with_session(
+                    lambda session: session.call_tool(tool_name, arguments, read_timeout_seconds=timedelta(seconds=6)),
+                    retries=retries,
+                )
                 return response.model_dump() if hasattr(response, 'model_dump') else response
-            except ClosedResourceError as e:
-                logger.warning(f"Session closed: {e.__repr__()}, attempting to restart session.")
-                await self.cleanup()
-                status = await self.start()  # 重新建立 session
-                if status:
-                    logger.info("Session restarted successfully.")
-                else:
-                    logger.error("Failed to restart session.")
-                attempt += 1
-                await asyncio.sleep(delay)
+            except CONNECTION_ERRORS as e:
+                # 没有可用的session时只让这一个工具调用失败，错误返回给模型，不中断同一轮的其它工具调用
+                logger.error(f"Max retries run tools reached, server {self.name} is not connected: {e.__repr__()}")
+                return {"error": f"MCP server {self.name} connection error: {e}"}
             except Exception as e:
                 attempt += 1
                 logger.warning(
@@ -248,18 +223,6 @@ class MCPClient:
                     logger.error(f"Max retries run tools reached.: {traceback.format_exc()}")
                     raise
 
-    async def stop(self):
-        await self.cleanup()
-    async def cleanup(self) -> None:
-        """Clean up server resources."""
-        async with self._cleanup_lock:
-            try:
-                await self.exit_stack.aclose()
-                self.session = None
-                self.stdio_context = None
-            except Exception as e:
-                logger.error(f"Error during cleanup of server {self.name}: {e}")
-
 
 class Tool:
     """Represents a tool with its properties and formatting."""
@@ -345,22 +308,12 @@ async def generate_text(conversation: List[Dict], model_cfg: Dict,
             # Await the coroutine returned by the async generator function call
             # to get the actual async generator object.
             return await generator_coroutine # Return the awaitable generator object
-        elif provider in ["anthropic", "ollama", "lmstudio"]:
-             # This part needs to be an async generator that yields the *single* result
-             async def wrap_response():
-                 # Call the non-streaming function
-                 if provider == "anthropic":
-                     result = await generate_with_anthropic(conversation, model_cfg, all_functions)
-                 elif provider == "ollama":
-                     result = await generate_with_ollama(conversation, model_cfg, all_functions)
-                 elif provider == "lmstudio":
-                     result = await generate_with_lmstudio(conversation, model_cfg, all_functions)
-                 else: # Should not happen based on outer check, but good practice
-                     result = {"assistant_text": f"Unsupported provider '{provider}'", "tool_calls": []}
-                 # Yield the complete result as a single item in the stream
-                 yield result
-             # *** Return the RESULT OF CALLING wrap_response() ***
-             return wrap_response() # Return the async generator OBJECT
+        elif provider == "anthropic":
+            return await generate_with_anthropic(conversation, model_cfg, all_functions, stream=True)
+        elif provider == "ollama":
+            return await generate_with_ollama(conversation, model_cfg, all_functions, stream=True)
+        elif provider == "lmstudio":
+            return await generate_with_lmstudio(conversation, model_cfg, all_functions, stream=True)
         else:
              # Fallback for unsupported streaming providers
              async def empty_gen():
@@ -414,8 +367,14 @@ async def log_messages_to_file(messages: List[Dict], functions: List[Dict], log_
     except Exception as e:
         logger.error(f"Error logging messages to {log_path}: {str(e)}")
 
-async def process_tool_call(tc: Dict, servers: Dict[str, MCPClient], quiet_mode: bool) -> Optional[Dict]:
-    """Process a single tool call and return the result"""
+async def process_tool_call(tc: Dict, servers: Dict[str, MCPClient], quiet_mode: bool,
+                            tool_cache: Optional[ToolResultCache] = None, use_cache: bool = True,
+                            registry: Optional[ToolRegistry] = None) -> Optional[Dict]:
+    """Process a single tool call and return the result
+
+    tool_cache: 可缓存工具(mcp_config.json中的cache)的结果缓存，use_cache=False时跳过缓存直接调用工具
+    registry: 函数名到(server, tool, 参数校验)的索引，没有传入时根据servers临时构建
+    """
     func_name = tc["function"]["name"]
     func_args_str = tc["function"].get("arguments", "{}")
     try:
@@ -423,47 +382,43 @@ async def process_tool_call(tc: Dict, servers: Dict[str, MCPClient], quiet_mode:
     except:
         func_args = {}
 
-    parts = func_name.split("_", 1)
-    if len(parts) != 2:
+    if registry is None:
+        registry = ToolRegistry.from_servers(servers)
+    entry = registry.get(func_name)
+    if entry is None or entry.server_name not in servers:
+        print(f"错误：注意，模型生成的工具{func_name}不在工具列表中，请检查配置文件")
         return {
             "role": "tool",
             "tool_call_id": tc["id"],
             "name": func_name,
-            "content": json.dumps({"error": "Invalid function name format"})
+            "content": json.dumps({"error": f"Unknown tool: {func_name}"})
         }
 
-    srv_name, tool_name = parts
+    srv_name, tool_name = entry.server_name, entry.tool_name
     logger.info(f"\n调用process_tool_call开始获取运行MCP工具{tool_name} from {srv_name} {json.dumps(func_args, ensure_ascii=False)}")
 
-    if srv_name not in servers:
-        print(f"错误：注意，模型生成的服务器{srv_name}不在服务器列表中，请检查配置文件，或者查看你的mcp配置是否包含了特殊字符_")
+    # 本地校验参数，类型不对的参数先尝试转换，校验失败直接返回错误给模型，不调用MCP server
+    func_args, errors = entry.validator.validate(func_args)
+    if errors:
         return {
             "role": "tool",
             "tool_call_id": tc["id"],
             "name": func_name,
-            "content": json.dumps({"error": f"Unknown server: {srv_name}"})
+            "content": json.dumps({"error": f"Invalid arguments for tool {func_name}", "details": errors}, ensure_ascii=False)
         }
-
-    # Get the tool's schema
-    tool_schema = None
-    for tool in servers[srv_name].tools:
-        if tool.name == tool_name:
-            tool_schema = tool.input_schema
-            break
-
-    if tool_schema:
-        # Ensure required parameters are present
-        required_params = tool_schema.get("required", [])
-        for param in required_params:
-            if param not in func_args:
-                return {
-                    "role": "tool",
-                    "tool_call_id": tc["id"],
-                    "name": func_name,
-                    "content": json.dumps({"error": f"Missing required parameter: {param}"})
-                }
-    logger.info(f"开始调用call_tool: {tool_name}")
-    result = await servers[srv_name].call_tool(tool_name, func_args)
+    cacheable = tool_cache is not None and tool_cache.is_cacheable(srv_name, tool_name)
+    result = None
+    if cacheable and use_cache:
+        result = tool_cache.get(srv_name, tool_name, func_args)
+        if result is not None:
+            logger.info(f"工具{tool_name}命中结果缓存")
+    elif cacheable:
+        tool_cache.bypassed += 1
+    if result is None:
+        logger.info(f"开始调用call_tool: {tool_name}")
+        result = await servers[srv_name].call_tool(tool_name, func_args)
+        if cacheable:
+            tool_cache.set(srv_name, tool_name, func_args, result)
     if result is None:
         result_content = f"工具调用失败: {tool_name}"
     elif "error" in result:
@@ -471,13 +426,6 @@ async def process_tool_call(tc: Dict, servers: Dict[str, MCPClient], quiet_mode:
     else:
         result_content = "\n".join(content["text"] for content in result["content"])
     logger.info(f"工具{tool_name}运行结果: {result_content}")
-<<<<<<< HEAD
-
-    # 初始化data变量
-    data = []
-
-=======
->>>>>>> 284a1102a106dbcfa9e85dbc6c8cb09d5fe51a85
     if os.environ.get("TOOL_RESULT_HANDLE"):
         # 动态加载todo
         from tool_result import tool_process_result
@@ -488,9 +436,6 @@ async def process_tool_call(tc: Dict, servers: Dict[str, MCPClient], quiet_mode:
         else:
             data = tool_res
             result_content = tool_res
-<<<<<<< HEAD
-
-=======
         return {
             "role": "tool",
             "tool_call_id": tc["id"],
@@ -498,7 +443,6 @@ async def process_tool_call(tc: Dict, servers: Dict[str, MCPClient], quiet_mode:
             "content": result_content,
             "data": data  #函数的结果的原始数据
         }
->>>>>>> 284a1102a106dbcfa9e85dbc6c8cb09d5fe51a85
     return {
         "role": "tool",
         "tool_call_id": tc["id"],
@@ -4,18 +4,17 @@ import logging
 import json
 import hashlib
 import re
-import atexit
 import asyncio
 import sys
 import time
-from typing import Dict, List, Any
+from typing import Dict, List, Any, AsyncGenerator, Union
+
+from .client_pool import get_anthropic_client
+from .tool_call_accumulator import ToolCallAccumulator, tool_call_chunk
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-# Keep track of client resources that need cleanup
-_active_clients = set()
-
 # Track last request time for rate limiting
 _last_request_time = 0.0
 
@@ -34,58 +33,6 @@ def get_caching_enabled():
         logger.warning("Invalid ANTHROPIC_CACHING_ENABLED value, using default of True")
         return True
 
-def _cleanup_clients():
-    """Ensure all active clients are closed during interpreter shutdown"""
-    # Skip if no clients to clean up
-    if not _active_clients:
-        return
-        
-    try:
-        # Try to get or create an event loop for cleanup
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_closed():
-                # If the main loop is closed, create a new one
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-        except RuntimeError:
-            # No event loop in thread, create a new one
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-        # Now use the loop to clean up clients
-        for client in list(_active_clients):
-            try:
-                if hasattr(client, 'close'):
-                    if asyncio.iscoroutinefunction(client.close):
-                        try:
-                            loop.run_until_complete(client.close())
-                        except Exception as e:
-                            logger.error(f"Error in async client close: {e}")
-                    else:
-                        client.close()
-            except Exception as e:
-                logger.error(f"Error cleaning up client during shutdown: {e}")
-            finally:
-                _active_clients.discard(client)
-                
-        # Close our temporary loop if we created one
-        try:
-            if not loop.is_closed():
-                loop.close()
-        except:
-            pass
-                
-    except Exception as e:
-        # Last resort - make sure we don't crash during interpreter shutdown
-        logger.error(f"Error during client cleanup at exit: {e}")
-        
-    # Clear the set to help with garbage collection
-    _active_clients.clear()
-
-# Register the cleanup function to run at exit
-atexit.register(_cleanup_clients)
-
 def generate_tool_id(tool_name: str) -> str:
     """
     Generate a deterministic tool ID from the tool name.
@@ -142,7 +89,62 @@ def format_tools(all_functions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     
     return anthropic_tools
 
-async def generate_with_anthropic(conversation, model_cfg, all_functions):
+async def generate_with_anthropic_stream(client, api_params: Dict[str, Any]) -> AsyncGenerator:
+    """
+    Internal function for streaming generation.
+
+    Text and thinking deltas are yielded as soon as they arrive, tool_use input is
+    accumulated from input_json_delta events and each tool call is yielded as soon
+    as its content block stops, then returned again with the final chunk.
+    """
+    from anthropic import APIError as AnthropicAPIError
+
+    try:
+        response = await client.messages.create(**api_params, stream=True)
+
+        current_content = ""
+        # content block index -> tool call
+        tool_calls = ToolCallAccumulator()
+
+        async for event in response:
+            if event.type == "content_block_start":
+                block = event.content_block
+                if block.type == "tool_use":
+                    tool_calls.add(event.index, block.id or generate_tool_id(block.name), block.name)
+            elif event.type == "content_block_delta":
+                delta = event.delta
+                if delta.type == "text_delta":
+                    # Immediately yield each token without buffering
+                    yield {"assistant_text": delta.text, "tool_calls": [], "is_chunk": True, "token": True}
+                    current_content += delta.text
+                elif delta.type == "thinking_delta":
+                    yield {"assistant_text": delta.thinking, "tool_calls": [], "is_chunk": True, "token": True, "is_reasoning": True}
+                elif delta.type == "input_json_delta":
+                    tool_call = tool_calls.add(event.index, arguments=delta.partial_json)
+                    if tool_call is not None:
+                        yield tool_call_chunk(tool_call)
+            elif event.type == "content_block_stop":
+                # 没有参数的工具调用在content block结束时才算完整
+                tool_call = tool_calls.close(event.index)
+                if tool_call is not None:
+                    yield tool_call_chunk(tool_call)
+            elif event.type == "message_stop":
+                break
+
+        yield {
+            "assistant_text": current_content,
+            "tool_calls": tool_calls.finish(),
+            "is_chunk": False
+        }
+
+    except AnthropicAPIError as e:
+        logger.error(f"Anthropic API error: {str(e)}")
+        yield {"assistant_text": f"Anthropic error: {str(e)}", "tool_calls": [], "is_chunk": False}
+    except Exception as e:
+        logger.error(f"Unexpected error in Anthropic provider: {str(e)}")
+        yield {"assistant_text": f"Unexpected Anthropic error: {str(e)}", "tool_calls": [], "is_chunk": False}
+
+async def generate_with_anthropic(conversation, model_cfg, all_functions, stream: bool = False) -> Union[Dict, AsyncGenerator]:
     """
     Generate text using Anthropic's API.
     
@@ -150,11 +152,13 @@ async def generate_with_anthropic(conversation, model_cfg, all_functions):
         conversation: The conversation history
         model_cfg: Configuration for the model
         all_functions: Available functions for the model to call
+        stream: Whether to stream the response
         
     Returns:
-        Dict containing assistant_text and tool_calls
+        If stream=False: Dict containing assistant_text and tool_calls
+        If stream=True: AsyncGenerator yielding chunks of assistant text and tool calls
     """
-    from anthropic import AsyncAnthropic, APIError as AnthropicAPIError
+    from anthropic import APIError as AnthropicAPIError
     
     global _last_request_time
     
@@ -177,223 +181,209 @@ async def generate_with_anthropic(conversation, model_cfg, all_functions):
     # Initialize result outside context manager
     result = {"assistant_text": "", "tool_calls": []}
     
-    # Create the client
-    client = None
-    try:
-        client = AsyncAnthropic(api_key=anthro_api_key)
-        # Register for cleanup at interpreter shutdown - only if we need to
-        if client:
-            _active_clients.add(client)
-    
-        # Store tool ID mappings to ensure consistency
-        tool_id_map = {}
-        
-        # Helper function to get or create a tool ID
-        def get_or_create_tool_id(tool_name):
-            if tool_name in tool_id_map:
-                return tool_id_map[tool_name]
-            else:
-                new_id = generate_tool_id(tool_name)
-                tool_id_map[tool_name] = new_id
-                return new_id
-
-        model_name = model_cfg["model"]
-        temperature = model_cfg.get("temperature", 0.7)
-        top_k = model_cfg.get("top_k", None)
-        top_p = model_cfg.get("top_p", None)
-        max_tokens = model_cfg.get("max_tokens", 1024)
-
-        # Extract system messages and non-system messages
-        system_messages = []
-        non_system_messages = []
-        last_assistant_content = None
-
-        # Process conversation messages for Anthropic format
-        for i, msg in enumerate(conversation):
-            role = msg.get("role", "")
-            content = msg.get("content", "")
-            
-            if role == "system":
-                system_messages.append({
-                    "type": "text",
-                    "text": content,
-                })
-            elif role == "tool":
-                new_msg = {
-                    "role": "user",
-                    "content": [{
-                        "type": "tool_result",
-                        "tool_use_id": msg.get("tool_call_id"),
-                        "content": msg.get("content")
-                    }]
-                }
-                non_system_messages.append(new_msg)
-            elif role == "assistant" and isinstance(content, str) and msg.get("tool_calls"):
-                # Create a new message with content blocks for text and tool_use
-                new_msg = {"role": "assistant", "content": []}
-                
-                # Add text block if there's content
-                if content:
-                    last_assistant_content = {"type": "text", "text": content}
-                    new_msg["content"].append(last_assistant_content)
-                
-                # Add tool_use blocks for each tool call
-                for tool_call in msg.get("tool_calls", []):
-                    if tool_call.get("type") == "function":
-                        func = tool_call.get("function", {})
-                        func_name = func.get("name", "")
-                        tool_id = tool_call.get("id")
-                        
-                        # Parse arguments from string if needed
-                        arguments = func.get("arguments", "{}")
-                        if isinstance(arguments, str):
-                            try:
-                                tool_input = json.loads(arguments)
-                            except:
-                                tool_input = {"raw_input": arguments}
-                        else:
-                            tool_input = arguments
-                        
-                        # Create tool_use block
-                        tool_use = {
-                            "type": "tool_use",
-                            "id": tool_id,
-                            "name": func_name,
-                            "input": tool_input
-                        }
-                        new_msg["content"].append(tool_use)
-                
-                non_system_messages.append(new_msg)
-            else:
-                # Keep user and assistant messages as they are
-                non_system_messages.append(msg)
+    # Reuse the shared client so keep-alive connections survive across turns
+    client = get_anthropic_client(anthro_api_key, model_cfg.get("apiBase"), model_cfg)
 
-        if get_caching_enabled() and last_assistant_content:
-            last_assistant_content["cache_control"] = {"type": "ephemeral"}
+    # Store tool ID mappings to ensure consistency
+    tool_id_map = {}
 
-        
-        # Prepare API parameters, excluding None values
-        api_params = {
-            "model": model_name,
-            "messages": non_system_messages,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-        }
-        
+    # Helper function to get or create a tool ID
+    def get_or_create_tool_id(tool_name):
+        if tool_name in tool_id_map:
+            return tool_id_map[tool_name]
+        else:
+            new_id = generate_tool_id(tool_name)
+            tool_id_map[tool_name] = new_id
+            return new_id
+
+    model_name = model_cfg["model"]
+    temperature = model_cfg.get("temperature", 0.7)
+    top_k = model_cfg.get("top_k", None)
+    top_p = model_cfg.get("top_p", None)
+    max_tokens = model_cfg.get("max_tokens", 1024)
+
+    # Extract system messages and non-system messages
+    system_messages = []
+    non_system_messages = []
+    last_assistant_content = None
+
+    # Process conversation messages for Anthropic format
+    for i, msg in enumerate(conversation):
+        role = msg.get("role", "")
+        content = msg.get("content", "")
+
+        if role == "system":
+            system_messages.append({
+                "type": "text",
+                "text": content,
+            })
+        elif role == "tool":
+            new_msg = {
+                "role": "user",
+                "content": [{
+                    "type": "tool_result",
+                    "tool_use_id": msg.get("tool_call_id"),
+                    "content": msg.get("content")
+                }]
+            }
+            non_system_messages.append(new_msg)
+        elif role == "assistant" and isinstance(content, str) and msg.get("tool_calls"):
+            # Create a new message with content blocks for text and tool_use
+            new_msg = {"role": "assistant", "content": []}
+
+            # Add text block if there's content
+            if content:
+                last_assistant_content = {"type": "text", "text": content}
+                new_msg["content"].append(last_assistant_content)
+
+            # Add tool_use blocks for each tool call
+            for tool_call in msg.get("tool_calls", []):
+                if tool_call.get("type") == "function":
+                    func = tool_call.get("function", {})
+                    func_name = func.get("name", "")
+                    tool_id = tool_call.get("id")
+
+                    # Parse arguments from string if needed
+                    arguments = func.get("arguments", "{}")
+                    if isinstance(arguments, str):
+                        try:
+                            tool_input = json.loads(arguments)
+                        except:
+                            tool_input = {"raw_input": arguments}
+                    else:
+                        tool_input = arguments
+
+                    # Create tool_use block
+                    tool_use = {
+                        "type": "tool_use",
+                        "id": tool_id,
+                        "name": func_name,
+                        "input": tool_input
+                    }
+                    new_msg["content"].append(tool_use)
+
+            non_system_messages.append(new_msg)
+        else:
+            # Keep user and assistant messages as they are
+            non_system_messages.append(msg)
+
+    if get_caching_enabled() and last_assistant_content:
+        last_assistant_content["cache_control"] = {"type": "ephemeral"}
+
+
+    # Prepare API parameters, excluding None values
+    api_params = {
+        "model": model_name,
+        "messages": non_system_messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+
+    # Format tools for Anthropic API
+    if all_functions:
         # Format tools for Anthropic API
-        if all_functions:
-            # Format tools for Anthropic API
-            anthropic_tools = format_tools(all_functions)
-            
-            # Only add tools if we have valid ones
-            if anthropic_tools:
-                api_params["tools"] = anthropic_tools
-
-                # cache last tool (because this should be stable)
-                if get_caching_enabled() and not last_assistant_content:
-                    anthropic_tools[-1]["cache_control"] = {"type": "ephemeral"}
-                
-                # Let Claude decide when to use tools instead of forcing it
-                api_params["tool_choice"] = {"type": "auto"}
-            else:
-                logger.warning("No valid tools to add to the request")
-        
-        # Only add parameters if they have valid values
-        if system_messages:
-            api_params["system"] = system_messages
+        anthropic_tools = format_tools(all_functions)
+
+        # Only add tools if we have valid ones
+        if anthropic_tools:
+            api_params["tools"] = anthropic_tools
+
+            # cache last tool (because this should be stable)
             if get_caching_enabled() and not last_assistant_content:
-                for msg in system_messages:
-                    # do not cache if the first line contains "TODO.md"
-                    if "TODO.md" not in msg["text"].split("\n")[0]:
-                        msg["cache_control"] = {"type": "ephemeral"}
-        if top_p is not None:
-            api_params["top_p"] = top_p
-        if top_k is not None and isinstance(top_k, int):
-            api_params["top_k"] = top_k
-
-        try:
-            create_resp = await client.messages.create(**api_params)
-            
-            # Handle the case where content might be a list of TextBlock objects
-            if create_resp.content:
-                # Extract text properly from Anthropic response
-                if isinstance(create_resp.content, list):
-                    # If content is a list of blocks, extract text from each block
-                    assistant_text = ""
-                    for block in create_resp.content:
-                        if hasattr(block, 'text'):
-                            assistant_text += block.text
-                        elif isinstance(block, dict) and 'text' in block:
-                            assistant_text += block['text']
-                        elif isinstance(block, str):
-                            assistant_text += block
-                else:
-                    # If content is a single item
-                    if hasattr(create_resp.content, 'text'):
-                        assistant_text = create_resp.content.text
-                    elif isinstance(create_resp.content, dict) and 'text' in create_resp.content:
-                        assistant_text = create_resp.content['text']
-                    else:
-                        assistant_text = str(create_resp.content)
-            else:
+                anthropic_tools[-1]["cache_control"] = {"type": "ephemeral"}
+
+            # Let Claude decide when to use tools instead of forcing it
+            api_params["tool_choice"] = {"type": "auto"}
+        else:
+            logger.warning("No valid tools to add to the request")
+
+    # Only add parameters if they have valid values
+    if system_messages:
+        api_params["system"] = system_messages
+        if get_caching_enabled() and not last_assistant_content:
+            for msg in system_messages:
+                # do not cache if the first line contains "TODO.md"
+                if "TODO.md" not in msg["text"].split("\n")[0]:
+                    msg["cache_control"] = {"type": "ephemeral"}
+    if top_p is not None:
+        api_params["top_p"] = top_p
+    if top_k is not None and isinstance(top_k, int):
+        api_params["top_k"] = top_k
+
+    if stream:
+        return generate_with_anthropic_stream(client, api_params)
+
+    try:
+        create_resp = await client.messages.create(**api_params)
+
+        # Handle the case where content might be a list of TextBlock objects
+        if create_resp.content:
+            # Extract text properly from Anthropic response
+            if isinstance(create_resp.content, list):
+                # If content is a list of blocks, extract text from each block
                 assistant_text = ""
-            
-            # Check for tool calls in the response
-            tool_calls = []
-            if hasattr(create_resp, 'content') and create_resp.content:
-                # Look for tool calls in content blocks
-                content_blocks = create_resp.content if isinstance(create_resp.content, list) else [create_resp.content]
-                for block in content_blocks:
-                    if hasattr(block, 'type') and block.type == 'text':
-                        assistant_text = block.text
-                    
-                    # Check if this is a tool use block
-                    if hasattr(block, 'type') and block.type == 'tool_use':
-                        # Get the tool name and input
-                        tool_name = block.name
-                        tool_input = block.input
-                        tool_id = block.id
-                        
-                        # Generate a tool ID if one is not provided
-                        if not tool_id:
-                            tool_id = get_or_create_tool_id(tool_name)
-                        
-                        # Format as a function call for our system
-                        tool_call = {
-                            "id": tool_id,
-                            "type": "function",
-                            "function": {
-                                "name": tool_name,
-                                "arguments": json.dumps(tool_input) if isinstance(tool_input, dict) else tool_input
-                            }
+                for block in create_resp.content:
+                    if hasattr(block, 'text'):
+                        assistant_text += block.text
+                    elif isinstance(block, dict) and 'text' in block:
+                        assistant_text += block['text']
+                    elif isinstance(block, str):
+                        assistant_text += block
+            else:
+                # If content is a single item
+                if hasattr(create_resp.content, 'text'):
+                    assistant_text = create_resp.content.text
+                elif isinstance(create_resp.content, dict) and 'text' in create_resp.content:
+                    assistant_text = create_resp.content['text']
+                else:
+                    assistant_text = str(create_resp.content)
+        else:
+            assistant_text = ""
+
+        # Check for tool calls in the response
+        tool_calls = []
+        if hasattr(create_resp, 'content') and create_resp.content:
+            # Look for tool calls in content blocks
+            content_blocks = create_resp.content if isinstance(create_resp.content, list) else [create_resp.content]
+            for block in content_blocks:
+                if hasattr(block, 'type') and block.type == 'text':
+                    assistant_text = block.text
+
+                # Check if this is a tool use block
+                if hasattr(block, 'type') and block.type == 'tool_use':
+                    # Get the tool name and input
+                    tool_name = block.name
+                    tool_input = block.input
+                    tool_id = block.id
+
+                    # Generate a tool ID if one is not provided
+                    if not tool_id:
+                        tool_id = get_or_create_tool_id(tool_name)
+
+                    # Format as a function call for our system
+                    tool_call = {
+                        "id": tool_id,
+                        "type": "function",
+                        "function": {
+                            "name": tool_name,
+                            "arguments": json.dumps(tool_input) if isinstance(tool_input, dict) else tool_input
                         }
-                        tool_calls.append(tool_call)
-                        print(f"{assistant_text}")
-            
-            # Store the result to return after client is closed
-            result = {"assistant_text": assistant_text, "tool_calls": tool_calls}
+                    }
+                    tool_calls.append(tool_call)
+                    print(f"{assistant_text}")
+
+        # Store the result to return after client is closed
+        result = {"assistant_text": assistant_text, "tool_calls": tool_calls}
+
+    except AnthropicAPIError as e:
+        error_msg = str(e)
+        logger.error(f"Anthropic API error: {error_msg}")
+        result = {"assistant_text": f"Anthropic error: {error_msg}", "tool_calls": []}
+
+    except Exception as e:
+        import traceback
+        logger.error(f"Unexpected error in Anthropic provider: {str(e)}")
+        logger.error(traceback.format_exc())
+        result = {"assistant_text": f"Unexpected Anthropic error: {str(e)}", "tool_calls": []}
 
-        except AnthropicAPIError as e:
-            error_msg = str(e)
-            logger.error(f"Anthropic API error: {error_msg}")
-            result = {"assistant_text": f"Anthropic error: {error_msg}", "tool_calls": []}
-            
-        except Exception as e:
-            import traceback
-            logger.error(f"Unexpected error in Anthropic provider: {str(e)}")
-            logger.error(traceback.format_exc())
-            result = {"assistant_text": f"Unexpected Anthropic error: {str(e)}", "tool_calls": []}
-    
-    finally:
-        # Always clean up the client
-        if client:
-            try:
-                # First remove from active clients to prevent double cleanup
-                _active_clients.discard(client)
-                # Then close the client
-                await client.close()
-            except Exception as e:
-                logger.error(f"Error closing Anthropic client: {e}")
-    
-    # Return result after everything is cleaned up
     return result
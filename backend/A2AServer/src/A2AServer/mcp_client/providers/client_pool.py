@@ -0,0 +1,138 @@
+"""
+LLM provider客户端的共享注册表，每个(provider, apiBase, apiKey)只创建一次客户端，
+工具循环的每一轮复用keep-alive连接，不再每次新建连接池和TLS握手。
+连接池上限可以在model_cfg中按模型设置，或者用环境变量全局设置：
+    max_connections            / LLM_MAX_CONNECTIONS             (默认100)
+    max_keepalive_connections  / LLM_MAX_KEEPALIVE_CONNECTIONS   (默认20)
+    keepalive_expiry           / LLM_KEEPALIVE_EXPIRY            (秒，默认30)
+"""
+
+import os
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+# (provider, apiBase, apiKey) -> client
+_clients: Dict[Tuple[str, Optional[str], Optional[str]], Any] = {}
+
+
+def _get_setting(model_cfg: Optional[Dict], key: str, env_name: str, default: float) -> float:
+    value = (model_cfg or {}).get(key, os.getenv(env_name))
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid {key} value {value!r}, using default of {default}")
+        return default
+
+
+def get_pool_limits(model_cfg: Optional[Dict] = None) -> httpx.Limits:
+    """
+    Build the connection pool limits for a provider client.
+
+    Args:
+        model_cfg: Configuration for the model
+
+    Returns:
+        httpx.Limits for the shared HTTP client
+    """
+    return httpx.Limits(
+        max_connections=int(_get_setting(model_cfg, "max_connections", "LLM_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+        max_keepalive_connections=int(_get_setting(model_cfg, "max_keepalive_connections", "LLM_MAX_KEEPALIVE_CONNECTIONS", DEFAULT_MAX_KEEPALIVE_CONNECTIONS)),
+        keepalive_expiry=_get_setting(model_cfg, "keepalive_expiry", "LLM_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY),
+    )
+
+
+def get_openai_client(provider: str, api_key: Optional[str], base_url: Optional[str] = None,
+                      model_cfg: Optional[Dict] = None):
+    """
+    Get the shared AsyncOpenAI client for an OpenAI-compatible provider.
+
+    Args:
+        provider: Provider name, e.g. openai, deepseek, zhipu
+        api_key: API key of the provider
+        base_url: Base URL of the provider, None for the OpenAI default
+        model_cfg: Configuration for the model, used for pool limits
+
+    Returns:
+        AsyncOpenAI client
+    """
+    key = (provider, base_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        http_client = DefaultAsyncHttpxClient(limits=get_pool_limits(model_cfg))
+        if base_url:
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+        else:
+            client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+        _clients[key] = client
+        logger.info(f"Created shared {provider} client for {base_url or 'default base url'}")
+    return client
+
+
+def get_anthropic_client(api_key: Optional[str], base_url: Optional[str] = None,
+                         model_cfg: Optional[Dict] = None):
+    """
+    Get the shared AsyncAnthropic client.
+
+    Args:
+        api_key: Anthropic API key
+        base_url: Base URL of the API, None for the Anthropic default
+        model_cfg: Configuration for the model, used for pool limits
+
+    Returns:
+        AsyncAnthropic client
+    """
+    key = ("anthropic", base_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+        http_client = DefaultAsyncHttpxClient(limits=get_pool_limits(model_cfg))
+        if base_url:
+            client = AsyncAnthropic(api_key=api_key, base_url=base_url, http_client=http_client)
+        else:
+            client = AsyncAnthropic(api_key=api_key, http_client=http_client)
+        _clients[key] = client
+        logger.info(f"Created shared anthropic client for {base_url or 'default base url'}")
+    return client
+
+
+def get_ollama_client(host: Optional[str] = None, model_cfg: Optional[Dict] = None):
+    """
+    Get the shared Ollama AsyncClient.
+
+    Args:
+        host: Ollama host, None for the OLLAMA_HOST default
+        model_cfg: Configuration for the model, used for pool limits
+
+    Returns:
+        ollama.AsyncClient
+    """
+    key = ("ollama", host, None)
+    client = _clients.get(key)
+    if client is None:
+        from ollama import AsyncClient
+        client = AsyncClient(host=host, limits=get_pool_limits(model_cfg))
+        _clients[key] = client
+        logger.info(f"Created shared ollama client for {host or 'default host'}")
+    return client
+
+
+async def close_all_clients() -> None:
+    """Close every shared provider client, called when the server shuts down."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        try:
+            await client.close()
+        except Exception as e:
+            logger.error(f"Error closing provider client: {e}")
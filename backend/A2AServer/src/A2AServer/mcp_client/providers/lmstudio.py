@@ -2,6 +2,7 @@
 LMStudio provider implementation.
 """
 
+import os
 import json
 import logging
 import re
@@ -9,8 +10,47 @@ from typing import Dict, List, Any, Optional, Union, AsyncGenerator, Callable
 
 import lmstudio as lms
 
+from .client_pool import get_openai_client
+from .openai import generate_with_openai_stream
+
 logger = logging.getLogger("mcp_client")
 
+DEFAULT_LMSTUDIO_BASE_URL = "http://localhost:1234/v1"
+
+def generate_with_lmstudio_stream(conversation: List[Dict], model_cfg: Dict,
+                                  all_functions: List[Dict]) -> AsyncGenerator:
+    """
+    Stream a response from LMStudio.
+
+    The SDK only exposes tool calling through model.act(), which runs the tools itself and
+    gives no incremental tool call deltas, so streaming goes through the OpenAI-compatible
+    server that LMStudio runs alongside the SDK endpoint (LMSTUDIO_BASE_URL or apiBase).
+
+    Args:
+        conversation: The conversation history
+        model_cfg: Configuration for the model
+        all_functions: Available functions for the model to call
+
+    Returns:
+        AsyncGenerator yielding chunks of assistant text and tool calls
+    """
+    base_url = model_cfg.get("apiBase") or os.getenv("LMSTUDIO_BASE_URL", DEFAULT_LMSTUDIO_BASE_URL)
+    # LMStudio does not check the key, but the OpenAI client requires one
+    api_key = model_cfg.get("apiKey") or os.getenv("LMSTUDIO_API_KEY", "lm-studio")
+    client = get_openai_client("lmstudio", api_key, base_url, model_cfg)
+    formatted_functions = [
+        {
+            "name": func["name"],
+            "description": func["description"],
+            "parameters": func["parameters"]
+        }
+        for func in all_functions
+    ]
+    return generate_with_openai_stream(
+        client, model_cfg["model"], conversation, formatted_functions,
+        model_cfg.get("temperature", None), model_cfg.get("top_p", None), model_cfg.get("max_tokens", None)
+    )
+
 async def generate_with_lmstudio(conversation: List[Dict], model_cfg: Dict, 
                                all_functions: List[Dict], stream: bool = False) -> Union[Dict, AsyncGenerator]:
     """
@@ -20,11 +60,14 @@ async def generate_with_lmstudio(conversation: List[Dict], model_cfg: Dict,
         conversation: The conversation history
         model_cfg: Configuration for the model
         all_functions: Available functions for the model to call
-        stream: Whether to stream the response (not currently supported by LMStudio)
+        stream: Whether to stream the response
         
     Returns:
-        Dict containing assistant_text and tool_calls
+        If stream=False: Dict containing assistant_text and tool_calls
+        If stream=True: AsyncGenerator yielding chunks of assistant text and tool calls
     """
+    if stream:
+        return generate_with_lmstudio_stream(conversation, model_cfg, all_functions)
     try:
         # Get model configuration
         model_name = model_cfg["model"]
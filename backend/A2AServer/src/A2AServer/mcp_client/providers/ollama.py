@@ -5,16 +5,19 @@ This module provides integration with Ollama models for text generation and tool
 including proper formatting of tool calls and their arguments.
 """
 
+import contextlib
 import json
 import logging
 import sys
 import traceback
 import copy
-from typing import Dict, List, Any, Optional, Union, Mapping, TypeVar, cast, Callable
+from typing import Dict, List, Any, Optional, Union, Mapping, TypeVar, cast, Callable, AsyncGenerator
 
 # Third-party imports
 from pydantic import BaseModel, ValidationError
 
+from .client_pool import get_ollama_client
+
 logger = logging.getLogger('ollama')
 
 # Constants
@@ -251,13 +254,9 @@ def prepare_ollama_options(model_cfg: Dict[str, Any]) -> tuple[Dict[str, Any], O
         model_cfg: Model configuration
         
     Returns:
-        Tuple of (options dict, client object, keep_alive value)
+        Tuple of (options dict, shared AsyncClient, keep_alive value)
     """
-    # Import here to avoid import errors when module is loaded
-    from ollama import Client
-    
     options = {}
-    client = None
     keep_alive_seconds = "0"
 
     # Set model parameters from config
@@ -269,8 +268,8 @@ def prepare_ollama_options(model_cfg: Dict[str, Any]) -> tuple[Dict[str, Any], O
         options["repeat_penalty"] = model_cfg.get("repetition_penalty")
     if "max_tokens" in model_cfg:
         options["num_predict"] = model_cfg.get("max_tokens", DEFAULT_MAX_TOKENS)
-    if "client" in model_cfg:
-        client = Client(host=model_cfg.get("client", DEFAULT_API_HOST))
+    # AsyncClient keeps the event loop free while Ollama generates, None host falls back to OLLAMA_HOST
+    client = get_ollama_client(model_cfg.get("client"), model_cfg)
     if "keep_alive_seconds" in model_cfg:
         keep_alive_seconds = model_cfg.get("keep_alive_seconds") + "s"
         
@@ -345,11 +344,70 @@ def format_function_name(func_name: str) -> str:
     return formatted_name
 
 
+async def generate_with_ollama_stream(
+    client: Any,
+    chat_params: Dict[str, Any]
+) -> AsyncGenerator:
+    """
+    Internal function for streaming generation.
+
+    Content and thinking tokens are yielded as they arrive. Ollama sends each tool call
+    complete in a single chunk, they are collected and returned with the final chunk.
+
+    Args:
+        client: Ollama AsyncClient
+        chat_params: Parameters for the chat call
+
+    Yields:
+        Chunks in the same format as the OpenAI-compatible providers
+    """
+    from ollama import ResponseError
+
+    try:
+        response = await client.chat(**{**chat_params, "stream": True})
+
+        current_content = ""
+        response_tool_calls = []
+
+        # 提前结束迭代或者调用方关闭生成器时，关闭底层的HTTP响应
+        async with contextlib.aclosing(response) as chunks:
+            async for chunk in chunks:
+                message = chunk.message
+                if getattr(message, "thinking", None):
+                    yield {"assistant_text": message.thinking, "tool_calls": [], "is_chunk": True, "token": True, "is_reasoning": True}
+                if message.content:
+                    # Immediately yield each token without buffering
+                    yield {"assistant_text": message.content, "tool_calls": [], "is_chunk": True, "token": True}
+                    current_content += message.content
+                if message.tool_calls:
+                    response_tool_calls.extend(message.tool_calls)
+                if chunk.done:
+                    break
+
+        yield {
+            "assistant_text": current_content,
+            "tool_calls": format_tool_calls(response_tool_calls),
+            "is_chunk": False
+        }
+    except ResponseError as e:
+        logger.error(f"Ollama API ResponseError: {e}")
+        yield {"assistant_text": f"Ollama error: {str(e)}", "tool_calls": [], "is_chunk": False}
+    except Exception as e:
+        logger.error(f"Unexpected error during Ollama streaming: {e}")
+        yield {"assistant_text": f"Unexpected Ollama error: {str(e)}", "tool_calls": [], "is_chunk": False}
+
+
+async def _single_result_stream(result: Dict[str, Any]) -> AsyncGenerator:
+    """Wrap an error result as a one-chunk stream so streaming callers can iterate it."""
+    yield {**result, "is_chunk": False}
+
+
 async def generate_with_ollama(
     conversation: List[MessageType], 
     model_cfg: Dict[str, Any], 
-    all_functions: Union[List[Any], Dict[str, Any], Any]
-) -> Dict[str, Any]:
+    all_functions: Union[List[Any], Dict[str, Any], Any],
+    stream: bool = False
+) -> Union[Dict[str, Any], AsyncGenerator]:
     """
     Generate text using Ollama's API.
 
@@ -357,9 +415,11 @@ async def generate_with_ollama(
         conversation: The conversation history as a list of message objects
         model_cfg: Configuration for the model including parameters and options
         all_functions: Available functions for the model to call
+        stream: Whether to stream the response
 
     Returns:
-        Dict containing assistant_text and tool_calls
+        If stream=False: Dict containing assistant_text and tool_calls
+        If stream=True: AsyncGenerator yielding chunks of assistant text and tool calls
     """
     logger.debug("===== Starting generate_with_ollama =====")
 
@@ -367,18 +427,21 @@ async def generate_with_ollama(
     try:
         ollama_imports = import_ollama_components()
         if not ollama_imports:
-            return {"assistant_text": "Failed to import required Ollama components", "tool_calls": []}
-        chat, Client, ResponseError = ollama_imports
+            result = {"assistant_text": "Failed to import required Ollama components", "tool_calls": []}
+            return _single_result_stream(result) if stream else result
+        AsyncClient, ResponseError = ollama_imports
     except Exception as e:
         logger.error(f"Unexpected error during Ollama import: {e}")
-        return {"assistant_text": f"Unexpected Ollama import error: {str(e)}", "tool_calls": []}
+        result = {"assistant_text": f"Unexpected Ollama import error: {str(e)}", "tool_calls": []}
+        return _single_result_stream(result) if stream else result
 
     # Get model name from config
     model_name = model_cfg.get("model", "")
     if not model_name:
         error_msg = "Model name is required but was not provided in configuration"
         logger.error(error_msg)
-        return {"assistant_text": error_msg, "tool_calls": []}
+        result = {"assistant_text": error_msg, "tool_calls": []}
+        return _single_result_stream(result) if stream else result
         
     logger.debug(f"Using model: {model_name}")
 
@@ -409,10 +472,13 @@ async def generate_with_ollama(
     # Log conversation for debugging (abbreviated)
     log_conversation_sample(processed_conversation)
 
+    if stream:
+        return generate_with_ollama_stream(client, chat_params)
+
     # Call Ollama API
     try:
         # Make the API call
-        response = await call_ollama_api(chat, client, chat_params)
+        response = await call_ollama_api(client, chat_params)
         if isinstance(response, dict) and "assistant_text" in response:
             # This is an error response from call_ollama_api
             return response
@@ -440,10 +506,10 @@ def import_ollama_components() -> Optional[tuple]:
     Import the necessary Ollama components.
     
     Returns:
-        Tuple of (chat, Client, ResponseError) or None if import fails
+        Tuple of (AsyncClient, ResponseError) or None if import fails
     """
     try:
-        from ollama import chat, Client, ResponseError
+        from ollama import AsyncClient, ResponseError
         logger.debug("Imported Ollama SDK successfully")
         
         # Try to get the version if available
@@ -454,7 +520,7 @@ def import_ollama_components() -> Optional[tuple]:
         except (ImportError, importlib.metadata.PackageNotFoundError):
             logger.debug("Could not determine Ollama SDK version")
             
-        return chat, Client, ResponseError
+        return AsyncClient, ResponseError
     except ImportError as e:
         logger.error(f"Failed to import Ollama SDK: {e}")
         return None
@@ -483,16 +549,17 @@ def log_conversation_sample(conversation: List[MessageType]) -> None:
 
 
 async def call_ollama_api(
-    chat: Callable, 
-    client: Optional[Any], 
+    client: Any,
     chat_params: Dict[str, Any]
 ) -> Union[Any, Dict[str, Any]]:
     """
     Call the Ollama API and handle errors.
+
+    The call is awaited on the AsyncClient, so the event loop keeps serving other
+    requests and SSE streams while the local model generates.
     
     Args:
-        chat: The chat function from ollama
-        client: Optional ollama client
+        client: Ollama AsyncClient
         chat_params: Parameters for the chat call
         
     Returns:
@@ -503,10 +570,7 @@ async def call_ollama_api(
     logger.debug("Calling Ollama API...")
     
     try:
-        if client:
-            response = client.chat(**chat_params)
-        else:
-            response = chat(**chat_params)
+        response = await client.chat(**chat_params)
         
         logger.debug("Ollama API call successful")
         return response
@@ -0,0 +1,74 @@
+"""
+OpenAI兼容接口(openai、deepseek、zhipu、vllm、bytedance、lmstudio)共用的流式生成
+"""
+
+import logging
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from openai import AsyncOpenAI
+
+from .tool_call_accumulator import ToolCallAccumulator, tool_call_chunk
+
+logger = logging.getLogger(__name__)
+
+
+async def stream_chat_completion(client: AsyncOpenAI, model_name: str, conversation: List[Dict],
+                                 formatted_functions: List[Dict], temperature: Optional[float] = None,
+                                 top_p: Optional[float] = None, max_tokens: Optional[int] = None,
+                                 error_label: str = "OpenAI error", reasoning: bool = False) -> AsyncGenerator:
+    """
+    Stream a chat completion from an OpenAI-compatible server.
+
+    Args:
+        client: Pooled AsyncOpenAI client of the provider
+        error_label: Prefix of the error text yielded when the call fails, e.g. "DeepSeek error"
+        reasoning: Whether the provider streams reasoning_content, which is yielded with is_reasoning
+
+    Yields:
+        Text tokens as they arrive, each tool call as soon as its arguments are complete,
+        then the full text and all tool calls with is_chunk False
+    """
+    try:
+        if formatted_functions:
+            tools = [{"type": "function", "function": f} for f in formatted_functions]
+        else:
+            tools = None
+        response = await client.chat.completions.create(
+            model=model_name,
+            messages=conversation,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            tools=tools,
+            tool_choice="auto",
+            stream=True
+        )
+
+        tool_calls = ToolCallAccumulator()
+        current_content = ""
+
+        async for chunk in response:
+            logger.debug("%s output chunk: %s", model_name, chunk)
+            delta = chunk.choices[0].delta
+            if reasoning and delta.model_extra and "reasoning_content" in delta.model_extra:
+                yield {"assistant_text": delta.model_extra["reasoning_content"], "tool_calls": [], "is_chunk": True, "token": True, "is_reasoning": True}
+            if delta.content:
+                # Immediately yield each token without buffering
+                yield {"assistant_text": delta.content, "tool_calls": [], "is_chunk": True, "token": True}
+                current_content += delta.content
+
+            # Handle tool call updates, a tool call is yielded as soon as its arguments are complete
+            if delta.tool_calls:
+                for tool_call in tool_calls.add_openai_deltas(delta.tool_calls):
+                    yield tool_call_chunk(tool_call)
+
+            # If this is the last chunk, yield final state with complete tool calls
+            if chunk.choices[0].finish_reason is not None:
+                yield {
+                    "assistant_text": current_content,
+                    "tool_calls": tool_calls.finish(),
+                    "is_chunk": False
+                }
+
+    except Exception as e:
+        yield {"assistant_text": f"{error_label}: {str(e)}", "tool_calls": [], "is_chunk": False}
@@ -0,0 +1,159 @@
+"""
+流式工具调用的增量拼接：provider把工具调用的id、名字和JSON参数拆成任意片段输出，
+ToolCallAccumulator在片段到达时逐字符跟踪参数的JSON结构，不重新解析整个缓冲区，
+参数一成为完整的JSON值就可以产出这个调用，模型还在输出时就开始执行工具
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def tool_call_chunk(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+    """Stream chunk announcing a tool call whose arguments are complete."""
+    return {"assistant_text": "", "tool_calls": [tool_call], "is_chunk": True, "tool_call_complete": True}
+
+
+class _ArgumentScanner:
+    """Tracks nesting and string state of a JSON document fed in fragments."""
+
+    def __init__(self):
+        self.buffer: List[str] = []
+        # 还没有闭合的 { 和 [
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+        self.complete = False
+
+    def feed(self, fragment: str) -> bool:
+        """Append a fragment, True once the top-level JSON value is closed."""
+        self.buffer.append(fragment)
+        if self.complete:
+            return True
+        for char in fragment:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.started = True
+                self.stack.append(char)
+            elif char in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if self.started and not self.stack:
+                    self.complete = True
+                    break
+        return self.complete
+
+    @property
+    def text(self) -> str:
+        return "".join(self.buffer)
+
+    def repaired(self) -> str:
+        """The arguments with an unterminated string and unclosed brackets closed."""
+        text = self.text.strip()
+        if self.in_string:
+            text += '"'
+        text = text.rstrip().rstrip(",")
+        for opener in reversed(self.stack):
+            text += "}" if opener == "{" else "]"
+        return text
+
+
+def normalize_arguments(arguments: str, scanner: Optional[_ArgumentScanner] = None) -> str:
+    """Canonical JSON for the tool arguments, "{}" when they are empty or cannot be repaired."""
+    if not arguments or arguments.isspace():
+        return "{}"
+    try:
+        return json.dumps(json.loads(arguments), ensure_ascii=False)
+    except json.JSONDecodeError:
+        pass
+    if scanner is not None:
+        try:
+            return json.dumps(json.loads(scanner.repaired()), ensure_ascii=False)
+        except json.JSONDecodeError:
+            pass
+    logger.warning(f"Malformed tool call arguments, using empty arguments: {arguments}")
+    return "{}"
+
+
+class ToolCallAccumulator:
+    """Assemble streamed tool calls and report each one as soon as its arguments are complete."""
+
+    def __init__(self):
+        # index -> tool call
+        self._calls: Dict[Any, Dict[str, Any]] = {}
+        self._scanners: Dict[Any, _ArgumentScanner] = {}
+        self._emitted = set()
+
+    def add(self, index: Any, id: Optional[str] = None, name: Optional[str] = None,
+            arguments: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Add a fragment of the tool call at index.
+
+        Returns:
+            The tool call, the first time its id, name and arguments are all complete
+        """
+        tc = self._calls.get(index)
+        if tc is None:
+            tc = {"id": "", "type": "function", "function": {"name": "", "arguments": ""}}
+            self._calls[index] = tc
+            self._scanners[index] = _ArgumentScanner()
+        if id:
+            tc["id"] = id
+        if name:
+            tc["function"]["name"] += name
+        if arguments:
+            self._scanners[index].feed(arguments)
+        return self._ready(index)
+
+    def add_openai_deltas(self, delta_tool_calls: Iterable[Any]) -> List[Dict[str, Any]]:
+        """Add the tool_calls of an OpenAI-compatible stream delta, return the calls that just completed."""
+        completed = []
+        for delta in delta_tool_calls:
+            function = delta.function
+            tc = self.add(delta.index, delta.id,
+                          function.name if function else None,
+                          function.arguments if function else None)
+            if tc is not None:
+                completed.append(tc)
+        return completed
+
+    def close(self, index: Any) -> Optional[Dict[str, Any]]:
+        """Mark the tool call at index as finished, e.g. on content_block_stop, and return it if not emitted yet."""
+        scanner = self._scanners.get(index)
+        if scanner is None:
+            return None
+        scanner.complete = True
+        return self._ready(index)
+
+    def _ready(self, index: Any) -> Optional[Dict[str, Any]]:
+        tc = self._calls[index]
+        scanner = self._scanners[index]
+        if index in self._emitted or not scanner.complete or not tc["id"] or not tc["function"]["name"]:
+            return None
+        self._emitted.add(index)
+        tc["function"]["arguments"] = normalize_arguments(scanner.text, scanner)
+        return tc
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """All tool calls with an id and a name, in index order, with normalized arguments."""
+        final_tool_calls = []
+        for index in sorted(self._calls):
+            tc = self._calls[index]
+            if not tc["id"] or not tc["function"]["name"]:
+                continue
+            if index not in self._emitted:
+                scanner = self._scanners[index]
+                tc["function"]["arguments"] = normalize_arguments(scanner.text, scanner)
+            final_tool_calls.append(tc)
+        return final_tool_calls
@@ -8,122 +8,15 @@ from typing import Dict, List, Any, AsyncGenerator, Optional, Union
 
 from openai import AsyncOpenAI, APIError, RateLimitError
 
-async def generate_with_vllm_stream(client: AsyncOpenAI, model_name: str, conversation: List[Dict],
-                                    formatted_functions: List[Dict], temperature: Optional[float] = None,
-                                    top_p: Optional[float] = None, max_tokens: Optional[int] = None) -> AsyncGenerator:
-    """Internal function for streaming generation"""
-    try:
-        if formatted_functions:
-            tools = [{"type": "function", "function": f} for f in formatted_functions]
-        else:
-            tools = None
-        response = await client.chat.completions.create(
-            model=model_name,
-            messages=conversation,
-            temperature=temperature,
-            top_p=top_p,
-            max_tokens=max_tokens,
-            tools=tools,
-            tool_choice="auto",
-            stream=True
-        )
-
-        current_tool_calls = []
-        current_content = ""
-
-        async for chunk in response:
-            delta = chunk.choices[0].delta
-            if delta.model_extra:
-                if "reasoning_content" in delta.model_extra:
-                    yield {"assistant_text": delta.model_extra["reasoning_content"], "tool_calls": [], "is_chunk": True, "token": True, "is_reasoning": True}
-            if delta.content:
-                # Immediately yield each token without buffering
-                yield {"assistant_text": delta.content, "tool_calls": [], "is_chunk": True, "token": True}
-                current_content += delta.content
-
-            # Handle tool call updates
-            if delta.tool_calls:
-                for tool_call in delta.tool_calls:
-                    # Initialize or update tool call
-                    while tool_call.index >= len(current_tool_calls):
-                        current_tool_calls.append({
-                            "id": "",
-                            "function": {
-                                "name": "",
-                                "arguments": ""
-                            }
-                        })
-                    
-                    current_tool = current_tool_calls[tool_call.index]
-                    
-                    # Update tool call properties
-                    if tool_call.id:
-                        current_tool["id"] = tool_call.id
-                    
-                    if tool_call.function.name:
-                        current_tool["function"]["name"] = (
-                            current_tool["function"]["name"] + tool_call.function.name
-                        )
-                    
-                    if tool_call.function.arguments:
-                        # Properly accumulate JSON arguments
-                        current_args = current_tool["function"]["arguments"]
-                        new_args = tool_call.function.arguments
-                        
-                        # Handle special cases for JSON accumulation
-                        if new_args.startswith("{") and not current_args:
-                            current_tool["function"]["arguments"] = new_args
-                        elif new_args.endswith("}") and current_args:
-                            # If we're receiving the end of the JSON object
-                            if not current_args.endswith("}"):
-                                current_tool["function"]["arguments"] = current_args + new_args
-                        else:
-                            # Middle part of JSON - append carefully
-                            current_tool["function"]["arguments"] += new_args
+from .client_pool import get_openai_client
+from .openai_compatible import stream_chat_completion
 
-            # If this is the last chunk, yield final state with complete tool calls
-            if chunk.choices[0].finish_reason is not None:
-                # Clean up and validate tool calls
-                final_tool_calls = []
-                for tc in current_tool_calls:
-                    if tc["id"] and tc["function"]["name"]:
-                        try:
-                            # Ensure arguments is valid JSON
-                            args = tc["function"]["arguments"].strip()
-                            if not args or args.isspace():
-                                args = "{}"
-                            # Parse and validate JSON
-                            parsed_args = json.loads(args)
-                            tc["function"]["arguments"] = json.dumps(parsed_args)
-                            final_tool_calls.append(tc)
-                        except json.JSONDecodeError:
-                            # If arguments are malformed, try to fix common issues
-                            args = tc["function"]["arguments"].strip()
-                            # Remove any trailing commas
-                            args = args.rstrip(",")
-                            # Ensure proper JSON structure
-                            if not args.startswith("{"):
-                                args = "{" + args
-                            if not args.endswith("}"):
-                                args = args + "}"
-                            try:
-                                # Try parsing again after fixes
-                                parsed_args = json.loads(args)
-                                tc["function"]["arguments"] = json.dumps(parsed_args)
-                                final_tool_calls.append(tc)
-                            except json.JSONDecodeError:
-                                # If still invalid, default to empty object
-                                tc["function"]["arguments"] = "{}"
-                                final_tool_calls.append(tc)
-
-                yield {
-                    "assistant_text": current_content,
-                    "tool_calls": final_tool_calls,
-                    "is_chunk": False
-                }
-
-    except Exception as e:
-        yield {"assistant_text": f"VLLM error: {str(e)}", "tool_calls": [], "is_chunk": False}
+def generate_with_vllm_stream(client: AsyncOpenAI, model_name: str, conversation: List[Dict],
+                              formatted_functions: List[Dict], temperature: Optional[float] = None,
+                              top_p: Optional[float] = None, max_tokens: Optional[int] = None) -> AsyncGenerator:
+    """Internal function for streaming generation"""
+    return stream_chat_completion(client, model_name, conversation, formatted_functions, temperature, top_p, max_tokens,
+                                  error_label="VLLM error", reasoning=True)
 
 async def generate_with_vllm_sync(client: AsyncOpenAI, model_name: str, conversation: List[Dict],
                                   formatted_functions: List[Dict], temperature: Optional[float] = None,
@@ -185,10 +78,10 @@ async def generate_with_vllm(conversation: List[Dict], model_cfg: Dict,
     """
     api_key = model_cfg.get("apiKey") or os.getenv("VLLM_API_KEY")
     if "apiBase" in model_cfg:
-        client = AsyncOpenAI(api_key=api_key, base_url=model_cfg["apiBase"])
+        client = get_openai_client("vllm", api_key, model_cfg["apiBase"], model_cfg)
     else:
         assert os.getenv("VLLM_BASE_URL"),  "VLLM_BASE_URL environment variable is not set,请设置.env文件"
-        client = AsyncOpenAI(api_key=api_key, base_url=os.getenv("VLLM_BASE_URL"))
+        client = get_openai_client("vllm", api_key, os.getenv("VLLM_BASE_URL"), model_cfg)
 
     model_name = model_cfg["model"]
     temperature = model_cfg.get("temperature", None)
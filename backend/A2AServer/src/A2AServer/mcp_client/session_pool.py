@@ -0,0 +1,282 @@
+"""
+带后台健康检查的MCP会话池：每个MCP server保持pool_size个已初始化的会话，后台每隔health_check_interval秒ping一次，
+同时保持SSE连接存活，主动重连失效的会话。工具调用选择最空闲的健康会话，只有没有可用会话时才等待重连，最多reconnect_timeout秒。
+每个会话由自己的任务进入和退出transport与ClientSession上下文(anyio要求由进入的任务退出)，所以可以在任意任务中关闭和替换会话。
+mcp_config.json中每个server的选项：
+    poolSize             会话数量(默认1)
+    healthCheckInterval  两次ping之间的秒数，0表示不检查(默认30)
+    healthCheckTimeout   ping超时的秒数(默认5)
+    reconnectTimeout     工具调用等待重连的秒数，也是每次建立会话的超时时间(默认10)
+"""
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from anyio import BrokenResourceError, ClosedResourceError
+from mcp import ClientSession
+
+logger = logging.getLogger(__name__)
+
+# 这些异常说明session已经断开，需要换一个session或者重连，而不是工具本身出错
+CONNECTION_ERRORS = (ClosedResourceError, BrokenResourceError, ConnectionError, EOFError)
+MAX_RECONNECT_BACKOFF = 30.0
+DEFAULT_RECONNECT_TIMEOUT = 10.0
+
+
+class PooledSession:
+    """One initialized ClientSession and the task that owns its contexts."""
+
+    def __init__(self):
+        self.session: Optional[ClientSession] = None
+        self.task: Optional[asyncio.Task] = None
+        self.closed = asyncio.Event()
+        self.alive = False
+        self.in_flight = 0
+
+
+class MCPSessionPool(ABC):
+    """Base class of the MCP clients, keeps warm sessions to one server.
+
+    Subclasses implement ``_open_session`` to connect their transport.
+
+    Args:
+        server_name: Name of the server in mcp_config.json.
+        pool_size: Number of warm sessions.
+        health_check_interval: Seconds between health checks, 0 or None to disable.
+        health_check_timeout: Seconds before a ping counts as failed.
+        reconnect_timeout: Seconds a call waits for a session when none is left,
+            also the timeout of each connect attempt.
+    """
+
+    def __init__(self, server_name: str, pool_size: int = 1, health_check_interval: Optional[float] = 30,
+                 health_check_timeout: float = 5, reconnect_timeout: float = DEFAULT_RECONNECT_TIMEOUT):
+        self.server_name = server_name
+        self.name = server_name
+        self.tools = []
+        self.pool_size = max(1, int(pool_size))
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.reconnect_timeout = reconnect_timeout
+        self._slots: List[PooledSession] = []
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._closing = False
+        # 指标
+        self.reconnects = 0
+        self.failed_reconnects = 0
+        self.last_reconnect_latency: Optional[float] = None
+        self.total_reconnect_latency = 0.0
+        self.last_ping_latency: Optional[float] = None
+
+    @abstractmethod
+    async def _open_session(self, stack: AsyncExitStack) -> ClientSession:
+        """Connect the transport and return an initialized ClientSession registered on stack."""
+        pass
+
+    @property
+    def session(self) -> Optional[ClientSession]:
+        """A healthy session, or None when the server is not connected."""
+        slot = self._acquire()
+        return slot.session if slot else None
+
+    async def start(self) -> bool:
+        """Open the warm sessions and start the health check loop, True if at least one session is up."""
+        self._closing = False
+        slots = await asyncio.gather(*[self._open_slot() for _ in range(self.pool_size)])
+        self._slots = [slot for slot in slots if slot is not None]
+        if not self._slots:
+            return False
+        if len(self._slots) < self.pool_size:
+            logger.warning(f"Server {self.server_name}: only {len(self._slots)} of {self.pool_size} sessions started")
+            self._schedule_reconnect()
+        if self.health_check_interval:
+            self._health_task = asyncio.ensure_future(self._health_check_loop())
+        return True
+
+    async def _open_slot(self) -> Optional[PooledSession]:
+        slot = PooledSession()
+        ready = asyncio.get_running_loop().create_future()
+        slot.task = asyncio.ensure_future(self._own_session(slot, ready))
+        try:
+            # 超时只等待ready，由owner任务自己取消并退出已经进入的上下文，卡住的连接不会一直阻塞重连
+            await asyncio.wait_for(ready, timeout=self.reconnect_timeout)
+        except asyncio.TimeoutError:
+            slot.task.cancel()
+            logger.error(f"Server {self.server_name}: connection timed out after {self.reconnect_timeout}s")
+            return None
+        except Exception as e:
+            logger.error(f"Server {self.server_name}: connection error: {e.__repr__()}")
+            return None
+        return slot
+
+    async def _own_session(self, slot: PooledSession, ready: asyncio.Future):
+        """Owner task of a session, keeps its contexts open until the session is closed."""
+        try:
+            async with AsyncExitStack() as stack:
+                slot.session = await self._open_session(stack)
+                if ready.done():
+                    # _open_slot已经超时放弃了这个会话
+                    return
+                slot.alive = True
+                ready.set_result(True)
+                await slot.closed.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e if isinstance(e, Exception) else ConnectionError(repr(e)))
+            elif not isinstance(e, asyncio.CancelledError):
+                logger.warning(f"Server {self.server_name}: session closed with error: {e.__repr__()}")
+        finally:
+            slot.alive = False
+            slot.session = None
+
+    async def _close_slot(self, slot: PooledSession) -> None:
+        slot.alive = False
+        slot.closed.set()
+        if slot.task is not None:
+            try:
+                await asyncio.wait_for(slot.task, timeout=self.health_check_timeout)
+            except Exception as e:
+                logger.warning(f"Server {self.server_name}: error closing session: {e.__repr__()}")
+
+    def _acquire(self) -> Optional[PooledSession]:
+        healthy = [slot for slot in self._slots if slot.alive]
+        if not healthy:
+            return None
+        return min(healthy, key=lambda slot: slot.in_flight)
+
+    def _schedule_reconnect(self) -> asyncio.Task:
+        """Single-flight background reconnect of all dead sessions."""
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.ensure_future(self._reconnect())
+        return self._reconnect_task
+
+    async def _reconnect(self) -> None:
+        backoff = 0.5
+        while not self._closing:
+            dead = [slot for slot in self._slots if not slot.alive]
+            missing = self.pool_size - (len(self._slots) - len(dead))
+            if missing <= 0:
+                return
+            for slot in dead:
+                await self._close_slot(slot)
+            self._slots = [slot for slot in self._slots if slot.alive]
+            start_time = time.monotonic()
+            slots = await asyncio.gather(*[self._open_slot() for _ in range(missing)])
+            opened = [slot for slot in slots if slot is not None]
+            if self._closing:
+                for slot in opened:
+                    await self._close_slot(slot)
+                return
+            self._slots.extend(opened)
+            if opened:
+                latency = time.monotonic() - start_time
+                self.reconnects += len(opened)
+                self.last_reconnect_latency = latency
+                self.total_reconnect_latency += latency * len(opened)
+                logger.info(f"Server {self.server_name}: reconnected {len(opened)} session(s) in {latency:.3f}s")
+            if len(opened) < missing:
+                self.failed_reconnects += missing - len(opened)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_RECONNECT_BACKOFF)
+
+    async def _health_check_loop(self) -> None:
+        while not self._closing:
+            await asyncio.sleep(self.health_check_interval)
+            for slot in list(self._slots):
+                if slot.alive:
+                    await self._ping(slot)
+            if any(not slot.alive for slot in self._slots) or len(self._slots) < self.pool_size:
+                self._schedule_reconnect()
+
+    async def _ping(self, slot: PooledSession) -> None:
+        start_time = time.monotonic()
+        try:
+            await asyncio.wait_for(slot.session.send_ping(), timeout=self.health_check_timeout)
+            self.last_ping_latency = time.monotonic() - start_time
+        except Exception as e:
+            logger.warning(f"Server {self.server_name}: health check failed: {e.__repr__()}, reconnecting")
+            slot.alive = False
+
+    async def _wait_for_session(self) -> PooledSession:
+        """
+        Wait for the background reconnect to bring a session back, at most
+        reconnect_timeout seconds, raises ConnectionError when none is available.
+        """
+        reconnect = self._schedule_reconnect()
+        deadline = time.monotonic() + self.reconnect_timeout
+        slot = self._acquire()
+        while slot is None and not reconnect.done():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                # shield: 调用方超时或者被取消时，不取消其它调用方也在等待的重连任务
+                # 每0.1秒检查一次，池中有一个session恢复就可以使用，不用等整个池重连完成
+                await asyncio.wait_for(asyncio.shield(reconnect), timeout=min(remaining, 0.1))
+            except asyncio.TimeoutError:
+                pass
+            slot = self._acquire()
+        if slot is None:
+            raise ConnectionError(f"Server {self.server_name}: no MCP session available "
+                                  f"after waiting {self.reconnect_timeout}s for a reconnect")
+        return slot
+
+    async def _with_session(self, fn: Callable[[ClientSession], Awaitable[Any]], retries: int = 2) -> Any:
+        """
+        Run fn on a healthy session. A session that turns out to be dead is replaced
+        in the background and fn is retried on another session right away; the call
+        only waits for the reconnect when no warm session is left, at most
+        reconnect_timeout seconds.
+        """
+        attempt = 0
+        while True:
+            slot = self._acquire()
+            if slot is None:
+                if self._closing:
+                    raise RuntimeError(f"Server {self.server_name} not initialized")
+                slot = await self._wait_for_session()
+            slot.in_flight += 1
+            try:
+                return await fn(slot.session)
+            except CONNECTION_ERRORS as e:
+                attempt += 1
+                logger.warning(f"Server {self.server_name}: session closed: {e.__repr__()}. Attempt {attempt} of {retries}.")
+                slot.alive = False
+                self._schedule_reconnect()
+                if attempt >= retries:
+                    raise
+            finally:
+                slot.in_flight -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Warm session count, reconnect counts and latencies."""
+        return {
+            "pool_size": self.pool_size,
+            "healthy_sessions": sum(1 for slot in self._slots if slot.alive),
+            "in_flight": sum(slot.in_flight for slot in self._slots),
+            "reconnects": self.reconnects,
+            "failed_reconnects": self.failed_reconnects,
+            "last_reconnect_latency": self.last_reconnect_latency,
+            "avg_reconnect_latency": self.total_reconnect_latency / self.reconnects if self.reconnects else None,
+            "last_ping_latency": self.last_ping_latency,
+        }
+
+    async def stop(self):
+        await self.cleanup()
+
+    async def cleanup(self) -> None:
+        """Stop the health check loop and close every session."""
+        self._closing = True
+        current = asyncio.current_task()
+        for task in (self._health_task, self._reconnect_task):
+            if task is not None and task is not current and not task.done():
+                task.cancel()
+        self._health_task = None
+        self._reconnect_task = None
+        slots, self._slots = self._slots, []
+        for slot in slots:
+            await self._close_slot(slot)
@@ -0,0 +1,98 @@
+"""
+幂等MCP工具的结果缓存，需要在mcp_config.json中按server声明，可以是工具名列表(默认过期时间和大小)，也可以给每个工具设置选项：
+    "LNGExpert": {
+        "command": "...",
+        "cache": {
+            "search_labor_law": {"ttl": 600, "maxSize": 256},
+            "search_social_security_law": {}
+        }
+    }
+按(server, 工具, 参数的规范JSON)缓存ttl秒，一个工具超过maxSize个结果时淘汰最久未使用的，失败的调用不缓存
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_SIZE = 256
+
+
+def canonical_arguments(arguments: Dict[str, Any]) -> str:
+    """Arguments as canonical JSON, so the same arguments in any key order share a cache entry."""
+    return json.dumps(arguments, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class ToolResultCache:
+    """LRU and TTL bounded cache of MCP tool results, one cache per declared tool.
+
+    Args:
+        tool_options: {(server, tool): {"ttl": seconds, "maxSize": entries}} for every cacheable tool.
+    """
+
+    def __init__(self, tool_options: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None):
+        self._caches: Dict[Tuple[str, str], TTLCache] = {}
+        for key, options in (tool_options or {}).items():
+            options = options or {}
+            self._caches[key] = TTLCache(maxsize=int(options.get("maxSize", DEFAULT_MAX_SIZE)),
+                                         ttl=float(options.get("ttl", DEFAULT_TTL)))
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @classmethod
+    def from_servers_cfg(cls, servers_cfg: Dict[str, Dict[str, Any]]) -> "ToolResultCache":
+        """Build the cache from the mcpServers section of mcp_config.json."""
+        tool_options = {}
+        for server_name, conf in servers_cfg.items():
+            cache_cfg = conf.get("cache") or {}
+            if isinstance(cache_cfg, list):
+                cache_cfg = {tool_name: {} for tool_name in cache_cfg}
+            for tool_name, options in cache_cfg.items():
+                tool_options[(server_name, tool_name)] = options
+        if tool_options:
+            logger.info(f"Tool result cache enabled for {sorted(f'{s}_{t}' for s, t in tool_options)}")
+        return cls(tool_options)
+
+    def is_cacheable(self, server_name: str, tool_name: str) -> bool:
+        return (server_name, tool_name) in self._caches
+
+    def get(self, server_name: str, tool_name: str, arguments: Dict[str, Any]) -> Optional[Any]:
+        """Cached result of the call, None on a miss."""
+        cache = self._caches.get((server_name, tool_name))
+        if cache is None:
+            return None
+        result = cache.get(canonical_arguments(arguments))
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def set(self, server_name: str, tool_name: str, arguments: Dict[str, Any], result: Any) -> None:
+        """Store a successful result of the call."""
+        cache = self._caches.get((server_name, tool_name))
+        if cache is None or result is None:
+            return
+        if isinstance(result, dict) and (result.get("isError") or "error" in result):
+            return
+        cache[canonical_arguments(arguments)] = result
+
+    def clear(self) -> None:
+        for cache in self._caches.values():
+            cache.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit/miss counters and the number of cached results per tool."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / total if total else None,
+            "entries": {f"{server}_{tool}": len(cache) for (server, tool), cache in self._caches.items()},
+        }
@@ -0,0 +1,188 @@
+"""
+把提供给模型的函数名映射到MCP工具的注册表。
+模型按<server>_<tool>调用工具，server名带下划线时按第一个下划线拆分会有歧义，所以在server启动时建好注册表，
+一次字典查找得到完整函数名对应的工具和预编译的参数校验器，校验器转换模型几乎正确的参数，在本地拒绝无效参数，不必请求MCP server
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import jsonschema
+except ImportError:
+    jsonschema = None
+
+
+def function_name(server_name: str, tool_name: str) -> str:
+    """Name under which a server's tool is exposed to the model."""
+    return f"{server_name}_{tool_name}"
+
+
+def _schema_types(schema: Dict[str, Any]) -> Tuple[str, ...]:
+    types = schema.get("type")
+    if types is None:
+        return ()
+    return (types,) if isinstance(types, str) else tuple(types)
+
+
+def _coerce_value(value: Any, schema: Dict[str, Any]) -> Any:
+    """Coerce a value the model got almost right (e.g. "5" for an integer) to the schema's type."""
+    if not isinstance(schema, dict):
+        return value
+    types = _schema_types(schema)
+    if isinstance(value, str) and types and "string" not in types:
+        text = value.strip()
+        if "integer" in types and re.fullmatch(r"[-+]?\d+", text):
+            return int(text)
+        if "number" in types and re.fullmatch(r"[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?", text):
+            return float(text)
+        if "boolean" in types and text.lower() in ("true", "false"):
+            return text.lower() == "true"
+        if ("object" in types and text.startswith("{")) or ("array" in types and text.startswith("[")):
+            try:
+                value = json.loads(text)
+            except ValueError:
+                return value
+    elif isinstance(value, (int, float)) and not isinstance(value, bool) and types == ("string",):
+        return str(value)
+    elif isinstance(value, float) and value.is_integer() and "integer" in types and "number" not in types:
+        return int(value)
+
+    if isinstance(value, dict):
+        return _coerce_object(value, schema)
+    if isinstance(value, list) and isinstance(schema.get("items"), dict):
+        return [_coerce_value(item, schema["items"]) for item in value]
+    return value
+
+
+def _coerce_object(arguments: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+    properties = schema.get("properties") or {}
+    required = schema.get("required") or ()
+    coerced = {}
+    for key, value in arguments.items():
+        prop_schema = properties.get(key)
+        if prop_schema is None:
+            coerced[key] = value
+            continue
+        # 模型经常给可选参数传null，schema不允许null时当作没有传
+        if value is None and key not in required and "null" not in _schema_types(prop_schema):
+            continue
+        coerced[key] = _coerce_value(value, prop_schema)
+    return coerced
+
+
+class ArgumentValidator:
+    """Coerces and validates tool arguments against the tool's input schema, compiled once per tool.
+
+    Uses a compiled jsonschema validator when jsonschema is installed, otherwise only
+    checks the required parameters.
+    """
+
+    def __init__(self, input_schema: Optional[Dict[str, Any]]):
+        self.input_schema = input_schema or {"type": "object", "properties": {}}
+        self.required = tuple(self.input_schema.get("required", []))
+        self._validator = None
+        if jsonschema is not None:
+            try:
+                validator_cls = jsonschema.validators.validator_for(self.input_schema)
+                validator_cls.check_schema(self.input_schema)
+                self._validator = validator_cls(self.input_schema)
+            except jsonschema.SchemaError as e:
+                logger.warning(f"Invalid inputSchema, only checking required parameters: {e.message}")
+
+    def coerce(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Arguments coerced to the types declared in the schema."""
+        return _coerce_object(arguments, self.input_schema)
+
+    def errors(self, arguments: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Structured validation errors, an empty list when the arguments are valid."""
+        if self._validator is None:
+            return [{"path": param, "message": f"Missing required parameter: {param}", "validator": "required"}
+                    for param in self.required if param not in arguments]
+        if self._validator.is_valid(arguments):
+            return []
+        return [
+            {
+                "path": ".".join(str(p) for p in error.absolute_path),
+                "message": error.message,
+                "validator": error.validator,
+            }
+            for error in sorted(self._validator.iter_errors(arguments), key=lambda e: list(map(str, e.absolute_path)))
+        ]
+
+    def validate(self, arguments: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Coerce and validate the arguments.
+
+        Returns:
+            (coerced arguments, structured errors)
+        """
+        coerced = self.coerce(arguments)
+        return coerced, self.errors(coerced)
+
+
+class ToolEntry(NamedTuple):
+    function_name: str
+    server_name: str
+    tool_name: str
+    validator: ArgumentValidator
+
+
+class ToolRegistry:
+    """Index of every registered tool by the function name the model uses."""
+
+    def __init__(self):
+        self._entries: Dict[str, ToolEntry] = {}
+
+    @classmethod
+    def from_servers(cls, servers: Dict[str, Any]) -> "ToolRegistry":
+        """Build a registry from started MCP clients."""
+        registry = cls()
+        for server_name, client in servers.items():
+            registry.register(server_name, client.tools)
+        return registry
+
+    def register(self, server_name: str, tools: Iterable[Any]) -> List[Dict[str, Any]]:
+        """
+        Register the tools of a server.
+
+        Args:
+            server_name: Name of the server in mcp_config.json
+            tools: Tool objects listed by the server
+
+        Returns:
+            Function definitions of the newly registered tools for the model
+        """
+        functions = []
+        for tool in tools:
+            name = function_name(server_name, tool.name)
+            existing = self._entries.get(name)
+            if existing is not None and existing.server_name != server_name:
+                logger.warning(f"Tool {tool.name} of server {server_name} is exposed as {name}, "
+                               f"which is already used by tool {existing.tool_name} of server {existing.server_name}, skipping it")
+                continue
+            validator = ArgumentValidator(tool.input_schema)
+            self._entries[name] = ToolEntry(name, server_name, tool.name, validator)
+            functions.append({
+                "name": name,
+                "description": tool.description,
+                "parameters": validator.input_schema,
+            })
+        return functions
+
+    def unregister(self, server_name: str) -> None:
+        """Remove every tool of a server."""
+        self._entries = {name: entry for name, entry in self._entries.items() if entry.server_name != server_name}
+
+    def get(self, name: str) -> Optional[ToolEntry]:
+        return self._entries.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,133 @@
+"""
+Bounded conversation store for BasicAgent sessions.
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def message_size(message: Dict[str, Any]) -> int:
+    """UTF-8 size in bytes of a conversation message once serialized."""
+    return len(json.dumps(message, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class SessionStore:
+    """Conversation store with LRU and idle-TTL eviction.
+
+    Drop-in replacement for the previous ``defaultdict(list)``: indexing a missing
+    sessionId creates an empty conversation. Sessions are kept in access order, so
+    both the least recently used and the longest idle sessions sit at the front.
+
+    Args:
+        max_sessions: Maximum number of resident sessions, the least recently used is evicted.
+        idle_ttl: Seconds a session may stay unused before it is evicted, None to disable.
+        max_session_bytes: Per-session byte budget applied by ``enforce_budget``, None (default) to disable.
+        on_evict: Optional callback called with the sessionId of every evicted session.
+    """
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl: Optional[float] = 3600,
+                 max_session_bytes: Optional[int] = None,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_session_bytes = max_session_bytes
+        self.on_evict = on_evict
+        self._sessions: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self.lru_evictions = 0
+        self.idle_evictions = 0
+        self.trimmed_messages = 0
+
+    def __getitem__(self, session_id: str) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        self._evict_idle(now)
+        conversation = self._sessions.get(session_id)
+        if conversation is None:
+            conversation = []
+            self._sessions[session_id] = conversation
+            self._evict_lru()
+        else:
+            self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = now
+        return conversation
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __delitem__(self, session_id: str) -> None:
+        del self._sessions[session_id]
+        self._last_access.pop(session_id, None)
+        if self.on_evict is not None:
+            self.on_evict(session_id)
+
+    def get(self, session_id: str, default=None):
+        """Return the conversation without creating it or refreshing its access time."""
+        return self._sessions.get(session_id, default)
+
+    def _evict_idle(self, now: float) -> None:
+        if self.idle_ttl is None:
+            return
+        while self._sessions:
+            session_id = next(iter(self._sessions))
+            if now - self._last_access[session_id] <= self.idle_ttl:
+                break
+            del self[session_id]
+            self.idle_evictions += 1
+            logger.info(f"Evicted idle session {session_id}")
+
+    def _evict_lru(self) -> None:
+        while len(self._sessions) > self.max_sessions:
+            session_id = next(iter(self._sessions))
+            del self[session_id]
+            self.lru_evictions += 1
+            logger.info(f"Evicted least recently used session {session_id}")
+
+    def enforce_budget(self, session_id: str) -> None:
+        """Drop the oldest turns of a session until it fits in max_session_bytes.
+
+        System messages and the latest turn are always kept. A turn runs from a user
+        message up to the next one, so an assistant tool_calls message is never
+        separated from its tool results.
+        """
+        if self.max_session_bytes is None:
+            return
+        conversation = self._sessions.get(session_id)
+        if not conversation:
+            return
+        sizes = [message_size(m) for m in conversation]
+        total = sum(sizes)
+        if total <= self.max_session_bytes:
+            return
+
+        turn_starts = [i for i, m in enumerate(conversation) if m.get("role") == "user"]
+        dropped = set()
+        # never drop the latest turn
+        for start, end in zip(turn_starts, turn_starts[1:]):
+            if total <= self.max_session_bytes:
+                break
+            for i in range(start, end):
+                if conversation[i].get("role") != "system":
+                    dropped.add(i)
+                    total -= sizes[i]
+        if dropped:
+            conversation[:] = [m for i, m in enumerate(conversation) if i not in dropped]
+            self.trimmed_messages += len(dropped)
+            logger.info(f"Trimmed {len(dropped)} messages from session {session_id} to fit {self.max_session_bytes} bytes")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Resident sessions and eviction counters."""
+        return {
+            "resident_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "lru_evictions": self.lru_evictions,
+            "idle_evictions": self.idle_evictions,
+            "trimmed_messages": self.trimmed_messages,
+        }
@@ -10,6 +10,7 @@ from A2AServer.common.A2Atypes import (
     TaskStatusUpdateEvent,
     TaskArtifactUpdateEvent,
     TextPart,
+    DataPart,
     TaskState,
     Task,
     SendTaskResponse,
@@ -21,7 +22,16 @@ from A2AServer.common.A2Atypes import (
     TaskStatusUpdateEvent
 )
 from A2AServer.common.server.task_manager import InMemoryTaskManager
+from A2AServer.common.server.task_store import TaskStore
 from A2AServer.agent import BasicAgent
+from A2AServer.artifact_coalescer import (
+    ArtifactCoalescer,
+    FLUSH_TICK,
+    with_flush_ticks,
+    consolidate_artifacts,
+    DEFAULT_COALESCE_WINDOW,
+    DEFAULT_COALESCE_MAX_BYTES,
+)
 import A2AServer.common.server.utils as utils
 import asyncio
 import logging
@@ -41,9 +51,45 @@ else:
 class AgentTaskManager(InMemoryTaskManager):
     """Task manager for AG2 MCP agent."""
 
-    def __init__(self, agent: BasicAgent):
-        super().__init__()
+    def __init__(self, agent: BasicAgent, task_store: TaskStore | None = None,
+                 coalesce_window: float = DEFAULT_COALESCE_WINDOW,
+                 coalesce_max_bytes: int = DEFAULT_COALESCE_MAX_BYTES):
+        """
+        coalesce_window: 连续文本片段最多合并多少秒后发送，0表示每个片段单独发送
+        coalesce_max_bytes: 合并中的文本达到多少字节时立即发送
+        """
+        super().__init__(task_store)
         self.agent = agent
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_bytes = coalesce_max_bytes
+        self._warmup_task = None
+        # 正在后台执行的流式任务
+        self._producer_tasks = set()
+
+    async def on_startup(self) -> None:
+        """
+        服务器启动时在后台预热MCP工具，不阻塞服务器启动；
+        预热完成前到达的请求会等待同一个初始化任务，/ready 在预热完成前返回503
+        """
+        await super().on_startup()
+        self._warmup_task = asyncio.ensure_future(self.agent.ensure_tools())
+
+    async def on_shutdown(self) -> None:
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+        for producer in list(self._producer_tasks):
+            producer.cancel()
+        await self.agent.cleanup()
+        await super().on_shutdown()
+
+    def readiness(self) -> dict:
+        return {
+            "ready": self.agent.tool_ready,
+            "servers": self.agent.server_startup_report,
+        }
+
+    def metrics(self) -> dict:
+        return {**self.agent.metrics(), **super().metrics()}
 
     async def on_send_task(self, request: SendTaskRequest) -> SendTaskResponse:
         """
@@ -63,6 +109,8 @@ class AgentTaskManager(InMemoryTaskManager):
         )
 
         task_send_params: TaskSendParams = request.params
+        if (task_send_params.metadata or {}).get("detach"):
+            return await self._send_task_detached(request)
         query = self._get_user_query(task_send_params)
 
         try:
@@ -89,7 +137,39 @@ class AgentTaskManager(InMemoryTaskManager):
         if error:
             return error
         await self.upsert_task(request.params)
-        return self._stream_generator(request)
+        task_id = request.params.id
+        sse_event_queue = await self.setup_sse_consumer(task_id)
+        self._start_producer(request)
+        return self.dequeue_events_for_sse(request.id, task_id, sse_event_queue)
+
+    async def _send_task_detached(self, request: SendTaskRequest) -> SendTaskResponse:
+        """
+        metadata中detach为True时，agent在后台以流式方式执行，立即返回WORKING状态的任务，
+        调用方通过tasks/get轮询结果，也可以通过tasks/resubscribe接收事件
+        """
+        # 先打开事件总线，之后的tasks/resubscribe才能接收到实时事件
+        self.open_event_bus(request.params.id)
+        self._start_producer(SendTaskStreamingRequest(id=request.id, params=request.params))
+        task = await self.task_store.get_task(request.params.id)
+        return SendTaskResponse(id=request.id, result=self.append_task_history(task, request.params.historyLength))
+
+    def _start_producer(self, request: SendTaskStreamingRequest) -> None:
+        """
+        agent在后台任务中运行，与SSE连接的生命周期无关：客户端断开或者读取慢不会中断任务，
+        事件进入任务的事件总线，连接断开后可以通过tasks/resubscribe继续接收
+        """
+        producer = asyncio.ensure_future(self._publish_stream_events(request))
+        self._producer_tasks.add(producer)
+        producer.add_done_callback(self._producer_tasks.discard)
+
+    async def _publish_stream_events(self, request: SendTaskStreamingRequest) -> None:
+        """Run the streaming agent and publish its events to the SSE subscribers of the task."""
+        task_id = request.params.id
+        try:
+            async for response in self._stream_generator(request):
+                await self.enqueue_events_for_sse(task_id, response.error or response.result)
+        finally:
+            await self.close_sse_stream(task_id)
 
     # -------------------------------------------------------------
     # Agent response handlers
@@ -139,17 +219,43 @@ class AgentTaskManager(InMemoryTaskManager):
         logger.info(f"发送过来的请求是 {query}, 参数是 {task_send_params}")
         is_first_token = True
         artifacts = []
+        item = None
+        coalescer = ArtifactCoalescer(self.coalesce_window, self.coalesce_max_bytes)
+
+        def text_artifact_response(text: str) -> SendTaskStreamingResponse:
+            nonlocal is_first_token
+            artifact = Artifact(parts=[TextPart(type="text", text=text)], index=0,
+                                append=not is_first_token, lastChunk=False)
+            logger.debug("发送的artifact是: %s", artifact)
+            is_first_token = False
+            artifacts.append(artifact)
+            return SendTaskStreamingResponse(
+                id=request.id,
+                result=TaskArtifactUpdateEvent(id=task_send_params.id, artifact=artifact),
+            )
+
         try:
-            async for item in self.agent.stream(query, task_send_params.sessionId):
-                logger.info("返回的item: ", item)
+            # metadata中的bypassToolCache为True时，本次请求不使用工具结果缓存
+            use_tool_cache = not (task_send_params.metadata or {}).get("bypassToolCache", False)
+            stream = self.agent.stream(query, task_send_params.sessionId, use_tool_cache)
+            if coalescer.enabled:
+                stream = with_flush_ticks(stream, coalescer)
+            async for event in stream:
+                # 时间窗口到期，或者收到的不是文本片段时，先发送合并中的文本
+                if event is FLUSH_TICK or not self._is_text_delta(event):
+                    text = coalescer.flush()
+                    if text:
+                        yield text_artifact_response(text)
+                if event is FLUSH_TICK:
+                    continue
+                item = event
+                logger.debug("返回的item: %s", item)
                 if item.get("type") and item["type"] == "tool_call":
                     tool_data = decode_tool_calls_to_string(item["content"])
                     logger.info(f"CALL的工具的解析结果: {tool_data}")
-<<<<<<< HEAD
                     # 处理不同类型的tool_data，确保最终是字典类型
                     if isinstance(tool_data, str):
                         try:
-                            import json
                             parsed_data = json.loads(tool_data)
                             # 如果解析后是列表，包装成字典
                             if isinstance(parsed_data, list):
@@ -169,16 +275,8 @@ class AgentTaskManager(InMemoryTaskManager):
                         # 其他类型，转换为字典
                         tool_data = {"data": tool_data}
                     # 创建符合Pydantic模型的DataPart
-                    from A2AServer.common.A2Atypes import DataPart
                     data_part = DataPart(type="data", data=tool_data)
                     message = Message(role="agent", parts=[data_part])
-=======
-                    if isinstance(tool_data, str):
-                        parts = [{"type": "text", "text": tool_data}]
-                    else:
-                        parts = [{"type": "data", "data": tool_data}]
-                    message = Message(role="agent", parts=parts)
->>>>>>> 284a1102a106dbcfa9e85dbc6c8cb09d5fe51a85
                     task_status = TaskStatus(state=TaskState.WORKING, message=message)
                     task_update_event = TaskStatusUpdateEvent(
                         id=task_send_params.id,
@@ -190,7 +288,6 @@ class AgentTaskManager(InMemoryTaskManager):
                 elif item.get("type") and item["type"] == "tool_result":
                     tool_data = decode_tool_result_to_string(item["content"])
                     logger.info(f"RESULT的工具的解析结果: {tool_data}")
-<<<<<<< HEAD
                     # 处理不同类型的tool_data，确保最终是字典类型
                     if isinstance(tool_data, str):
                         try:
@@ -215,13 +312,6 @@ class AgentTaskManager(InMemoryTaskManager):
                     # 创建符合Pydantic模型的DataPart
                     data_part = DataPart(type="data", data=tool_data)
                     message = Message(role="agent", parts=[data_part])
-=======
-                    if isinstance(tool_data, str):
-                        parts = [{"type": "text", "text": tool_data}]
-                    else:
-                        parts = [{"type": "data", "data": tool_data}]
-                    message = Message(role="agent", parts=parts)
->>>>>>> 284a1102a106dbcfa9e85dbc6c8cb09d5fe51a85
                     task_status = TaskStatus(state=TaskState.WORKING, message=message)
                     task_update_event = TaskStatusUpdateEvent(
                         id=task_send_params.id,
@@ -251,22 +341,10 @@ class AgentTaskManager(InMemoryTaskManager):
                     # 初始化task_state变量
                     task_state = TaskState.WORKING
                     if not is_task_complete:
-                        if item.get("content"):
-                            # 创建符合Pydantic模型的TextPart
-                            text_part = TextPart(type="text", text=item["content"])
-                            append_value = not is_first_token
-                            artifact = Artifact(parts=[text_part], index=0, append=append_value, lastChunk=False)
-                            # 逐条发送每个生成的内容
-                            logger.info(f"发送的artifact是: {artifact}")
-                            yield SendTaskStreamingResponse(
-                                id=request.id,
-                                result=TaskArtifactUpdateEvent(
-                                    id=task_send_params.id,
-                                    artifact=artifact,
-                                )
-                            )
-                            is_first_token = False
-                            artifacts.append(artifact)
+                        # 连续的文本片段按时间窗口和字节数合并后再发送
+                        text = coalescer.add(item["content"]) if item.get("content") else None
+                        if text:
+                            yield text_artifact_response(text)
                     else:
                         # 初始化task_state变量
                         task_state = TaskState.COMPLETED
@@ -308,6 +386,9 @@ class AgentTaskManager(InMemoryTaskManager):
                     )
                     logger.info(f"发送的item的更新消息是: {task_update_event}")
                     yield SendTaskStreamingResponse(id=request.id, result=task_update_event)
+            text = coalescer.flush()
+            if text:
+                yield text_artifact_response(text)
             if item["is_task_complete"]:
                 task_status = TaskStatus(
                     state=TaskState.COMPLETED,
@@ -316,7 +397,8 @@ class AgentTaskManager(InMemoryTaskManager):
                 task_status = TaskStatus(
                     state=TaskState.WORKING,
                 )
-            await self.update_store(task_send_params.id, task_status, artifacts)
+            # 任务中只保存每个index合并后的一个artifact，而不是所有的片段
+            await self.update_store(task_send_params.id, task_status, consolidate_artifacts(artifacts))
             task_update_event = TaskStatusUpdateEvent(
                 id=task_send_params.id,
                 status=task_status,
@@ -347,6 +429,10 @@ class AgentTaskManager(InMemoryTaskManager):
                 ),
             )
 
+    @staticmethod
+    def _is_text_delta(item: dict) -> bool:
+        return item.get("type") == "normal" and not item.get("is_task_complete")
+
     def _validate_request(
             self, request: SendTaskRequest | SendTaskStreamingRequest
     ) -> JSONRPCResponse | None:
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 15:00
+# @File  : test_agent_prompt.py
+# @Desc  : 每个会话只保留一条system prompt，以及prompt文件按mtime缓存的测试
+
+import builtins
+import os
+import unittest
+from unittest.mock import patch
+
+from testutils import make_agent
+
+
+class AgentPromptTestCase(unittest.TestCase):
+    def setUp(self):
+        self.agent = make_agent(self)
+        self.prompt_file = self.agent.chosen_model["prompt_file"]
+
+    def test_follow_up_turns_keep_one_system_message(self):
+        for query in ["第一个问题", "第二个问题", "第三个问题"]:
+            self.agent._build_initial_conversation("s1", query)
+            self.agent.session_conversations["s1"].append({"role": "assistant", "content": "回答"})
+        conversation = self.agent.session_conversations["s1"]
+        system_messages = [m for m in conversation if m["role"] == "system"]
+        self.assertEqual(len(system_messages), 1)
+        self.assertIs(conversation[0], system_messages[0])
+        self.assertEqual(conversation[0]["content"].count("当前时间"), 1)
+        self.assertTrue(conversation[0]["content"].endswith("你是一个助手"))
+        self.assertEqual([m["content"] for m in conversation if m["role"] == "user"],
+                         ["第一个问题", "第二个问题", "第三个问题"])
+
+    def test_prompt_file_is_read_once_until_modified(self):
+        opened = []
+        real_open = builtins.open
+
+        def counting_open(file, *args, **kwargs):
+            if file == self.prompt_file:
+                opened.append(file)
+            return real_open(file, *args, **kwargs)
+
+        with patch("builtins.open", counting_open):
+            for _ in range(3):
+                self.assertEqual(self.agent._load_agent_prompt(), "你是一个助手")
+            self.assertEqual(len(opened), 1)
+
+            with real_open(self.prompt_file, "w", encoding="utf-8") as f:
+                f.write("你是一个新的助手")
+            stat = os.stat(self.prompt_file)
+            os.utime(self.prompt_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            self.assertEqual(self.agent._load_agent_prompt(), "你是一个新的助手")
+            self.assertEqual(len(opened), 2)
+
+    def test_missing_prompt_file_falls_back_to_cached_prompt(self):
+        self.assertEqual(self.agent._load_agent_prompt(), "你是一个助手")
+        os.remove(self.prompt_file)
+        self.assertEqual(self.agent._load_agent_prompt(), "你是一个助手")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 11:20
+# @File  : test_agent_startup.py
+# @Desc  : MCP server并发启动、启动期限和单飞初始化的测试
+
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from A2AServer.mcp_client.client import Tool
+from testutils import make_agent
+
+
+class FakeMCPClient:
+    """模拟本地进程MCP server，启动耗时和是否失败按server名配置"""
+    startup_seconds = {}
+    failing = set()
+    started = []
+
+    def __init__(self, server_name, command, args=None, env=None, **pool_kwargs):
+        self.name = server_name
+        self.tools = []
+        self.stopped = False
+
+    async def start(self):
+        FakeMCPClient.started.append(self.name)
+        await asyncio.sleep(self.startup_seconds.get(self.name, 0))
+        return self.name not in self.failing
+
+    async def list_tools(self):
+        self.tools = [Tool("search", f"{self.name} search", {"type": "object", "properties": {}})]
+        return self.tools
+
+    async def stop(self):
+        self.stopped = True
+
+
+def use_fake_mcp_client(test_case):
+    FakeMCPClient.startup_seconds = {}
+    FakeMCPClient.failing = set()
+    FakeMCPClient.started = []
+    patcher = patch("A2AServer.agent.MCPClient", FakeMCPClient)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+
+class StartupTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        use_fake_mcp_client(self)
+
+    async def test_servers_start_concurrently(self):
+        FakeMCPClient.startup_seconds = {"a": 0.2, "b": 0.2, "c": 0.2}
+        agent = make_agent(self, {name: {"command": "fake"} for name in "abc"})
+        started = time.monotonic()
+        self.assertTrue(await agent.setup_tools())
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual(sorted(f["name"] for f in agent.all_functions), ["a_search", "b_search", "c_search"])
+        self.assertTrue(all(r["status"] == "ready" for r in agent.server_startup_report.values()))
+
+    async def test_slow_server_is_degraded_then_registered(self):
+        FakeMCPClient.startup_seconds = {"fast": 0.01, "slow": 0.3}
+        agent = make_agent(self, {"fast": {"command": "fake"}, "slow": {"command": "fake", "startupTimeout": 0.1}})
+        started = time.monotonic()
+        self.assertTrue(await agent.setup_tools())
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual(agent.server_startup_report["slow"]["status"], "degraded")
+        self.assertNotIn("slow_search", agent.tool_registry)
+
+        await asyncio.sleep(0.3)
+        self.assertEqual(agent.server_startup_report["slow"]["status"], "ready")
+        self.assertIn("slow_search", agent.tool_registry)
+        self.assertIn("slow", agent.servers)
+
+    async def test_failed_server_does_not_block_others(self):
+        FakeMCPClient.failing = {"broken"}
+        agent = make_agent(self, {"ok": {"command": "fake"}, "broken": {"command": "fake"}})
+        self.assertTrue(await agent.setup_tools())
+        self.assertEqual(agent.server_startup_report["broken"]["status"], "failed")
+        self.assertEqual(list(agent.servers), ["ok"])
+
+
+class SingleFlightTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        use_fake_mcp_client(self)
+
+    async def test_concurrent_requests_share_one_setup(self):
+        FakeMCPClient.startup_seconds = {"a": 0.1}
+        agent = make_agent(self, {"a": {"command": "fake"}})
+        results = await asyncio.gather(*[agent.ensure_tools() for _ in range(5)])
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual(FakeMCPClient.started, ["a"])
+        self.assertTrue(await agent.ensure_tools())
+        self.assertEqual(FakeMCPClient.started, ["a"])
+
+    async def test_cancelled_request_does_not_cancel_setup(self):
+        FakeMCPClient.startup_seconds = {"a": 0.1}
+        agent = make_agent(self, {"a": {"command": "fake"}})
+        first = asyncio.ensure_future(agent.ensure_tools())
+        second = asyncio.ensure_future(agent.ensure_tools())
+        await asyncio.sleep(0.02)
+        first.cancel()
+        self.assertTrue(await second)
+        self.assertEqual(FakeMCPClient.started, ["a"])
+
+    async def test_failed_setup_is_retried(self):
+        FakeMCPClient.failing = {"a"}
+        agent = make_agent(self, {"a": {"command": "fake"}})
+        self.assertFalse(await agent.ensure_tools())
+        FakeMCPClient.failing = set()
+        self.assertTrue(await agent.ensure_tools())
+        self.assertEqual(FakeMCPClient.started, ["a", "a"])
+
+    async def test_tools_are_warmed_up_at_server_startup(self):
+        from A2AServer.task_manager import AgentTaskManager
+        FakeMCPClient.startup_seconds = {"a": 0.1}
+        agent = make_agent(self, {"a": {"command": "fake"}})
+        manager = AgentTaskManager(agent)
+        await manager.on_startup()
+        # 预热在后台进行，不阻塞启动
+        self.assertFalse(agent.tool_ready)
+        self.assertFalse(manager.readiness()["ready"])
+        await asyncio.sleep(0.2)
+        self.assertTrue(agent.tool_ready)
+        await manager.on_shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 10:05
+# @File  : test_agent_tools.py
+# @Desc  : BasicAgent同一轮中多个工具调用的并发执行、提前执行和会话写入测试
+
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from anyio import ClosedResourceError
+
+from A2AServer.mcp_client.client import MCPClient, Tool
+from A2AServer.mcp_client.tool_registry import ToolRegistry
+from testutils import make_agent
+
+
+def tool_call(call_id, name, arguments="{}"):
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments}}
+
+
+class FakeTools:
+    """按工具名设置的耗时执行，记录同时运行的工具数量"""
+
+    def __init__(self, delays, failing=()):
+        self.delays = delays
+        self.failing = set(failing)
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, tc, use_tool_cache=True):
+        name = tc["function"]["name"]
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delays[name])
+            if name in self.failing:
+                raise RuntimeError(f"{name} failed")
+            return {"role": "tool", "tool_call_id": tc["id"], "name": name, "content": f"{name} ok", "data": [name]}
+        finally:
+            self.running -= 1
+
+
+class ToolExecutionTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.agent = make_agent(self, tool_concurrency=4)
+        self.tool_calls = [tool_call("c1", "slow"), tool_call("c2", "fast"), tool_call("c3", "medium")]
+        self.conversation = [{"role": "assistant", "content": "", "tool_calls": self.tool_calls}]
+
+    def tool_messages(self):
+        return [message for message in self.conversation if message["role"] == "tool"]
+
+    async def test_results_in_completion_order_and_recorded_in_call_order(self):
+        tools = FakeTools({"slow": 0.3, "fast": 0.05, "medium": 0.15})
+        self.agent._run_tool_call = tools
+        started = time.monotonic()
+        yielded = [index async for index, _ in self.agent._execute_and_record(self.conversation, self.tool_calls)]
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(yielded, [1, 2, 0])
+        self.assertEqual([m["tool_call_id"] for m in self.tool_messages()], ["c1", "c2", "c3"])
+        # 原始数据data不写入会话
+        self.assertTrue(all("data" not in m for m in self.tool_messages()))
+        self.assertEqual(tools.max_running, 3)
+        self.assertLess(elapsed, 0.45)
+
+    async def test_results_are_recorded_as_soon_as_earlier_ones_arrived(self):
+        self.agent._run_tool_call = FakeTools({"slow": 0.05, "fast": 0.3, "medium": 0.1})
+        results = self.agent._execute_and_record(self.conversation, self.tool_calls)
+        index, _ = await results.__anext__()
+        self.assertEqual(index, 0)
+        self.assertEqual([m["tool_call_id"] for m in self.tool_messages()], ["c1"])
+        await results.aclose()
+
+    async def test_cancelled_tool_phase_leaves_no_dangling_tool_calls(self):
+        self.agent._run_tool_call = FakeTools({"slow": 10, "fast": 0.05, "medium": 10})
+        results = self.agent._execute_and_record(self.conversation, self.tool_calls)
+        index, _ = await results.__anext__()
+        self.assertEqual(index, 1)
+        await results.aclose()
+
+        messages = self.tool_messages()
+        self.assertEqual([m["tool_call_id"] for m in messages], ["c1", "c2", "c3"])
+        self.assertEqual(messages[1]["content"], "fast ok")
+        self.assertIn("did not complete", messages[0]["content"])
+
+    async def test_failing_tool_still_gets_a_tool_message(self):
+        self.agent._run_tool_call = FakeTools({"slow": 0.01, "fast": 0.05, "medium": 0.01}, failing={"fast"})
+        with self.assertRaises(RuntimeError):
+            async for _ in self.agent._execute_and_record(self.conversation, self.tool_calls):
+                pass
+        self.assertEqual([m["tool_call_id"] for m in self.tool_messages()], ["c1", "c2", "c3"])
+
+    async def test_tools_run_one_at_a_time_by_default(self):
+        agent = make_agent(self)
+        tools = FakeTools({"slow": 0.02, "fast": 0.02, "medium": 0.02})
+
+        async def run_with_limit(tc, use_tool_cache=True):
+            async with agent._tool_semaphore:
+                return await tools(tc, use_tool_cache)
+        agent._run_tool_call = run_with_limit
+        async for _ in agent._execute_and_record(self.conversation, self.tool_calls):
+            pass
+        self.assertEqual(tools.max_running, 1)
+
+    async def test_stream_closed_during_tool_phase_keeps_session_valid(self):
+        self.agent._run_tool_call = FakeTools({"slow": 10, "fast": 0.01, "medium": 10})
+        tool_calls = self.tool_calls
+
+        async def generate_text(messages, model, functions, stream=True):
+            async def chunks():
+                yield {"assistant_text": "", "tool_calls": tool_calls, "is_chunk": False}
+            return chunks()
+
+        self.agent._build_initial_conversation("s1", "查询一下")
+        with patch("A2AServer.agent.generate_text", generate_text):
+            stream = self.agent._stream_response_generator("s1")
+            types = []
+            async for item in stream:
+                types.append(item["type"])
+                if item["type"] == "tool_result":
+                    break
+            await stream.aclose()
+        self.assertEqual(types, ["tool_call", "tool_result"])
+        conversation = self.agent.session_conversations["s1"]
+        self.assertEqual(conversation[-4]["tool_calls"], tool_calls)
+        self.assertEqual([m["tool_call_id"] for m in conversation[-3:]], ["c1", "c2", "c3"])
+
+
+class FakeToolSession:
+    """模拟MCP ClientSession，broken后调用抛出连接断开的异常"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.broken = False
+
+    async def call_tool(self, name, arguments, read_timeout_seconds=None):
+        await asyncio.sleep(self.delay)
+        if self.broken:
+            raise ClosedResourceError()
+        return {"content": [{"type": "text", "text": f"{name}: {arguments['query']}"}]}
+
+
+class FakeStdioClient(MCPClient):
+    """不启动进程的MCPClient，up为False时无法重连"""
+
+    def __init__(self, name, delay=0):
+        super().__init__(name, "fake", args=[], health_check_interval=0, reconnect_timeout=0.2)
+        self.delay = delay
+        self.up = True
+        self.sessions = []
+        self.tools = [Tool("search", "", {"type": "object", "properties": {"query": {"type": "string"}}})]
+
+    async def _open_session(self, stack):
+        if not self.up:
+            raise ConnectionError("server is down")
+        session = FakeToolSession(self.delay)
+        self.sessions.append(session)
+        return session
+
+
+class ConnectionLossTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_lost_session_fails_only_its_tool_call(self):
+        up, down = FakeStdioClient("up", delay=0.05), FakeStdioClient("down")
+        for client in (up, down):
+            self.assertTrue(await client.start())
+            self.addAsyncCleanup(client.cleanup)
+        # down的session断开并且无法重连
+        down.up = False
+        for session in down.sessions:
+            session.broken = True
+
+        agent = make_agent(self, tool_concurrency=2)
+        agent.servers = {"up": up, "down": down}
+        agent.tool_registry = ToolRegistry.from_servers(agent.servers)
+        tool_calls = [tool_call("c1", "up_search", '{"query": "a"}'), tool_call("c2", "down_search", '{"query": "b"}')]
+        conversation = [{"role": "assistant", "content": "", "tool_calls": tool_calls}]
+        async for _ in agent._execute_and_record(conversation, tool_calls):
+            pass
+
+        contents = {m["tool_call_id"]: m["content"] for m in conversation if m["role"] == "tool"}
+        self.assertEqual(contents["c1"], "search: a")
+        self.assertIn("MCP server down connection error", contents["c2"])
+
+
+class ScriptedModel:
+    """第一轮先流式输出完整的工具调用，停顿stream_seconds秒后结束，第二轮直接回答"""
+
+    def __init__(self, streamed_calls, final_calls, stream_seconds=0.2):
+        self.streamed_calls = streamed_calls
+        self.final_calls = final_calls
+        self.stream_seconds = stream_seconds
+        self.rounds = 0
+        self.stream_end = None
+
+    async def __call__(self, messages, model, functions, stream=True):
+        self.rounds += 1
+        first_round = self.rounds == 1
+
+        async def chunks():
+            if not first_round:
+                yield {"assistant_text": "完成", "tool_calls": [], "is_chunk": True, "token": True}
+                yield {"assistant_text": "完成", "tool_calls": [], "is_chunk": False}
+                return
+            for tc in self.streamed_calls:
+                yield {"assistant_text": "", "tool_calls": [tc], "is_chunk": True, "tool_call_complete": True}
+            await asyncio.sleep(self.stream_seconds)
+            self.stream_end = time.monotonic()
+            yield {"assistant_text": "", "tool_calls": self.final_calls, "is_chunk": False}
+        return chunks()
+
+
+class SpeculativeDispatchTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.starts = {}
+        self.cancelled = []
+        self.tool_seconds = {}
+
+    def make_agent(self, speculative):
+        agent = make_agent(self, speculative_tool_dispatch=speculative)
+
+        async def run_tool_call(tc, use_tool_cache=True):
+            self.starts.setdefault(tc["id"], []).append(time.monotonic())
+            try:
+                await asyncio.sleep(self.tool_seconds.get(tc["id"], 0.2))
+            except asyncio.CancelledError:
+                self.cancelled.append(tc["id"])
+                raise
+            return {"role": "tool", "tool_call_id": tc["id"], "name": tc["function"]["name"], "content": "ok"}
+        agent._run_tool_call = run_tool_call
+        agent._build_initial_conversation("s1", "查询一下")
+        return agent
+
+    async def run_stream(self, agent, model):
+        with patch("A2AServer.agent.generate_text", model):
+            return [item async for item in agent._stream_response_generator("s1")]
+
+    async def test_complete_tool_call_starts_while_model_streams(self):
+        agent = self.make_agent(speculative=True)
+        calls = [tool_call("c1", "search")]
+        model = ScriptedModel(calls, calls)
+        started = time.monotonic()
+        items = await self.run_stream(agent, model)
+        elapsed = time.monotonic() - started
+
+        self.assertLess(self.starts["c1"][0], model.stream_end)
+        self.assertEqual(len(self.starts["c1"]), 1)
+        # 模型输出和工具执行重叠，总耗时小于两者之和
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual([item["type"] for item in items], ["tool_call", "tool_result", "normal"])
+        conversation = agent.session_conversations["s1"]
+        self.assertEqual(conversation[-2]["tool_calls"], calls)
+        self.assertEqual(conversation[-1]["tool_call_id"], "c1")
+
+    async def test_tool_calls_wait_for_stream_end_when_disabled(self):
+        agent = self.make_agent(speculative=False)
+        calls = [tool_call("c1", "search")]
+        model = ScriptedModel(calls, calls)
+        await self.run_stream(agent, model)
+        self.assertGreaterEqual(self.starts["c1"][0], model.stream_end)
+
+    async def test_speculative_call_missing_from_final_calls_is_cancelled(self):
+        agent = self.make_agent(speculative=True)
+        self.tool_seconds["c2"] = 10
+        model = ScriptedModel([tool_call("c1", "search"), tool_call("c2", "lookup")], [tool_call("c1", "search")])
+        await self.run_stream(agent, model)
+        await asyncio.sleep(0)
+        self.assertEqual(self.cancelled, ["c2"])
+        tool_messages = [m for m in agent.session_conversations["s1"] if m["role"] == "tool"]
+        self.assertEqual([m["tool_call_id"] for m in tool_messages], ["c1"])
+
+    async def test_closing_stream_cancels_speculative_calls(self):
+        agent = self.make_agent(speculative=True)
+        calls = [tool_call("c1", "search")]
+        model = ScriptedModel(calls, calls, stream_seconds=10)
+        with patch("A2AServer.agent.generate_text", model):
+            stream = agent._stream_response_generator("s1")
+            task = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await stream.aclose()
+        await asyncio.sleep(0)
+        self.assertEqual(self.cancelled, ["c1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 11:50
+# @File  : test_client_pool.py
+# @Desc  : LLM provider共享客户端和keep-alive连接复用的测试
+
+import json
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from A2AServer.mcp_client.providers import client_pool
+from A2AServer.mcp_client.providers.deepseek import generate_with_deepseek
+
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    """模拟OpenAI兼容的 /chat/completions 接口，记录每个请求来自哪个TCP连接"""
+    protocol_version = "HTTP/1.1"
+    connections = []
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        ChatCompletionsHandler.connections.append(self.client_address)
+        body = json.dumps({
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request.get("model", ""),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "你好"}, "finish_reason": "stop"}],
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ClientPoolTestCase(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ChatCompletionsHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/v1"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    async def asyncSetUp(self):
+        ChatCompletionsHandler.connections = []
+        await client_pool.close_all_clients()
+
+    async def asyncTearDown(self):
+        await client_pool.close_all_clients()
+
+    async def test_same_provider_and_endpoint_share_one_client(self):
+        a = client_pool.get_openai_client("deepseek", "key", self.base_url)
+        b = client_pool.get_openai_client("deepseek", "key", self.base_url)
+        other_key = client_pool.get_openai_client("deepseek", "other", self.base_url)
+        other_provider = client_pool.get_openai_client("zhipu", "key", self.base_url)
+        self.assertIs(a, b)
+        self.assertIsNot(a, other_key)
+        self.assertIsNot(a, other_provider)
+
+    async def test_calls_reuse_keepalive_connection(self):
+        model_cfg = {"model": "deepseek-chat", "provider": "deepseek", "apiBase": self.base_url, "apiKey": "key"}
+        for _ in range(3):
+            result = await generate_with_deepseek([{"role": "user", "content": "hi"}], model_cfg, [])
+            self.assertEqual(result["assistant_text"], "你好")
+        self.assertEqual(len(ChatCompletionsHandler.connections), 3)
+        self.assertEqual(len(set(ChatCompletionsHandler.connections)), 1)
+
+    async def test_close_all_clients_empties_registry(self):
+        client = client_pool.get_openai_client("deepseek", "key", self.base_url)
+        await client_pool.close_all_clients()
+        self.assertTrue(client.is_closed())
+        self.assertIsNot(client_pool.get_openai_client("deepseek", "key", self.base_url), client)
+
+    def test_pool_limits_from_model_cfg_and_env(self):
+        limits = client_pool.get_pool_limits({"max_connections": 7})
+        self.assertEqual(limits.max_connections, 7)
+        self.assertEqual(limits.max_keepalive_connections, client_pool.DEFAULT_MAX_KEEPALIVE_CONNECTIONS)
+        with patch.dict(os.environ, {"LLM_MAX_KEEPALIVE_CONNECTIONS": "3", "LLM_KEEPALIVE_EXPIRY": "bad"}):
+            limits = client_pool.get_pool_limits()
+        self.assertEqual(limits.max_keepalive_connections, 3)
+        self.assertEqual(limits.keepalive_expiry, client_pool.DEFAULT_KEEPALIVE_EXPIRY)
+
+
+if __name__ == "__main__":
+    unittest.main()
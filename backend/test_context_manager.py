@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 15:20
+# @File  : test_context_manager.py
+# @Desc  : ContextManager各个裁剪策略、总结位置和没有tiktoken时token估算的测试
+
+import unittest
+from unittest.mock import patch
+
+from A2AServer import context_manager
+from A2AServer.context_manager import DROPPED_TOOL_RESULT, ContextManager, count_tokens
+
+MODEL_CFG = {"provider": "deepseek", "model": "deepseek-chat"}
+
+
+def make_conversation(turns=4):
+    """每一轮: 用户提问、带tool_calls的assistant消息、工具结果、最终回答"""
+    conversation = [{"role": "system", "content": "你是一个助手"}]
+    for i in range(turns):
+        conversation.extend([
+            {"role": "user", "content": f"问题{i}"},
+            {"role": "assistant", "content": "", "tool_calls": [{"id": f"c{i}", "type": "function",
+                                                                 "function": {"name": "search", "arguments": "{}"}}]},
+            {"role": "tool", "tool_call_id": f"c{i}", "name": "search", "content": f"结果{i} " + "数据" * 200},
+            {"role": "assistant", "content": f"回答{i}"},
+        ])
+    return conversation
+
+
+def assert_tool_pairs_intact(test_case, messages):
+    """每个tool结果前面都有对应的tool_calls，每个tool_call也都有结果"""
+    pending = set()
+    for message in messages:
+        if message.get("tool_calls"):
+            test_case.assertFalse(pending, "上一个tool_calls还没有全部得到结果")
+            pending = {tc["id"] for tc in message["tool_calls"]}
+        elif message["role"] == "tool":
+            test_case.assertIn(message["tool_call_id"], pending)
+            pending.discard(message["tool_call_id"])
+    test_case.assertFalse(pending)
+
+
+class ContextManagerTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.conversation = make_conversation()
+        # 预算只够system消息和大约两轮对话
+        self.budget = count_tokens(self.conversation[:1] + self.conversation[-8:], MODEL_CFG) + 20
+
+    async def test_default_policy_sends_conversation_unchanged(self):
+        manager = ContextManager(max_tokens=10)
+        self.assertEqual(manager.policy, "none")
+        self.assertIs(await manager.prepare("s1", self.conversation, MODEL_CFG), self.conversation)
+
+    async def test_conversation_within_budget_is_unchanged(self):
+        manager = ContextManager(policy="sliding_window", max_tokens=100000)
+        self.assertIs(await manager.prepare("s1", self.conversation, MODEL_CFG), self.conversation)
+
+    async def test_every_policy_keeps_tool_pairs_intact(self):
+        async def summarizer(prompt):
+            return "用户问了几个问题"
+
+        for policy in ("sliding_window", "drop_tool_results", "summarize"):
+            with self.subTest(policy=policy):
+                manager = ContextManager(policy=policy, max_tokens=self.budget, summarizer=summarizer)
+                original = [dict(m) for m in self.conversation]
+                messages = await manager.prepare("s1", self.conversation, MODEL_CFG)
+                self.assertLessEqual(count_tokens(messages, MODEL_CFG), self.budget)
+                assert_tool_pairs_intact(self, messages)
+                # 最近一轮完整保留，保存的会话本身不变
+                self.assertEqual(messages[-4:], self.conversation[-4:])
+                self.assertEqual(self.conversation, original)
+
+    async def test_sliding_window_drops_whole_oldest_turns(self):
+        manager = ContextManager(policy="sliding_window", max_tokens=self.budget)
+        messages = await manager.prepare("s1", self.conversation, MODEL_CFG)
+        self.assertEqual(messages[0], self.conversation[0])
+        self.assertEqual(messages[1:], self.conversation[-8:])
+        self.assertEqual(manager.metrics()["dropped_messages"], 8)
+
+    async def test_drop_tool_results_keeps_old_turns_without_results(self):
+        manager = ContextManager(policy="drop_tool_results", max_tokens=count_tokens(self.conversation, MODEL_CFG) - 100)
+        messages = await manager.prepare("s1", self.conversation, MODEL_CFG)
+        self.assertEqual(len(messages), len(self.conversation))
+        tool_contents = [m["content"] for m in messages if m["role"] == "tool"]
+        self.assertEqual(tool_contents[:3], [DROPPED_TOOL_RESULT] * 3)
+        self.assertTrue(tool_contents[3].startswith("结果3"))
+
+    async def test_summary_follows_system_prompt_and_is_reused(self):
+        prompts = []
+
+        async def summarizer(prompt):
+            prompts.append(prompt)
+            return "用户问了几个问题"
+
+        manager = ContextManager(policy="summarize", max_tokens=self.budget, summarizer=summarizer)
+        messages = await manager.prepare("s1", self.conversation, MODEL_CFG)
+        self.assertEqual(messages[0], self.conversation[0])
+        self.assertEqual(messages[1], {"role": "system", "content": "之前对话的总结: 用户问了几个问题"})
+        self.assertEqual(messages[2:], self.conversation[-4:])
+        # 会话没有新的轮次时，直接使用之前的总结
+        await manager.prepare("s1", self.conversation, MODEL_CFG)
+        self.assertEqual(len(prompts), 1)
+
+    async def test_failed_summary_falls_back_to_sliding_window(self):
+        async def summarizer(prompt):
+            raise RuntimeError("model unavailable")
+
+        manager = ContextManager(policy="summarize", max_tokens=self.budget, summarizer=summarizer)
+        messages = await manager.prepare("s1", self.conversation, MODEL_CFG)
+        self.assertEqual(messages[1:], self.conversation[-8:])
+
+    def test_unknown_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ContextManager(policy="truncate")
+
+
+class TokenCountTestCase(unittest.TestCase):
+    def test_estimate_without_tiktoken(self):
+        with patch.object(context_manager, "tiktoken", None):
+            # 中日韩字符每个1个token，其它字符4个1个token，另外加1
+            self.assertEqual(context_manager._encode_text_tokens("你好" + "a" * 8, "deepseek", "deepseek-chat"), 5)
+            # anthropic按3.5个字符1个token估算
+            self.assertEqual(context_manager._encode_text_tokens("a" * 7, "anthropic", "claude"), 3)
+            self.assertEqual(context_manager._encode_text_tokens("a" * 8, "ollama", "qwen3"), 3)
+
+    def test_token_cache_does_not_keep_texts(self):
+        text = "很长的工具结果" * 1000
+        first = context_manager._count_text_tokens(text, "ollama", "qwen3")
+        self.assertEqual(context_manager._count_text_tokens(text, "ollama", "qwen3"), first)
+        for key in context_manager._token_cache:
+            self.assertFalse(any(isinstance(part, str) and len(part) > 100 for part in key))
+
+    def test_token_cache_is_bounded(self):
+        with patch.object(context_manager, "TOKEN_CACHE_SIZE", 10):
+            for i in range(50):
+                context_manager._count_text_tokens(f"text {i}", "ollama", "qwen3")
+            self.assertLessEqual(len(context_manager._token_cache), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
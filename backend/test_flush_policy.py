@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/20 10:30
+# @File  : test_flush_policy.py
+# @Desc  : 流式文本按flush策略分批发送的测试
+
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from A2AServer.flush_policy import FlushPolicy, TextBatcher, create_flush_policy
+from testutils import make_agent
+
+
+class FlushPolicyTestCase(unittest.TestCase):
+    def run_batcher(self, policy, tokens):
+        batcher = TextBatcher(policy)
+        frames = [batcher.add(token) for token in tokens]
+        return [frame for frame in frames + [batcher.flush()] if frame]
+
+    def test_default_policy_keeps_previous_behaviour(self):
+        frames = self.run_batcher(None, ["你好", "，", "我", "是", "一个", "助手", "。"])
+        self.assertEqual(frames, ["你好，", "我是一个助手", "。"])
+
+    def test_default_policy_matches_previous_fixed_rule(self):
+        def previous_frames(tokens):
+            # 引入flush策略之前agent中固定的规则
+            frames, text = [], ""
+            for token in tokens:
+                text += token
+                if len(text) >= 5 or token in "。！？，；：\n" or token.strip() == "":
+                    frames.append(text)
+                    text = ""
+            return frames + [text]
+
+        tokens = ["Hi", ".", "ok", "!", "好的，", "我", "。！", " ", "a", "b", "\n", "x;", "：", "end", "?", "", "结束"]
+        frames = self.run_batcher(None, tokens)
+        self.assertEqual(frames, [frame for frame in previous_frames(tokens) if frame])
+        # 以英文标点或者标点结尾的多字符token不会单独触发输出
+        self.assertEqual(self.run_batcher(None, ["a.", "b!", "c"]), ["a.b!c"])
+
+    def test_token_and_byte_policies(self):
+        self.assertEqual(self.run_batcher("tokens:2", ["a", "b", "c"]), ["ab", "c"])
+        # 一个汉字是3个字节
+        self.assertEqual(self.run_batcher("bytes:6", ["你", "好", "a"]), ["你好", "a"])
+
+    def test_combined_policy_and_unknown_spec(self):
+        self.assertEqual(repr(create_flush_policy("sentence+time:200")), "sentence+time:200")
+        self.assertEqual(self.run_batcher("sentence+tokens:3", ["a", ".", "b", "c", "d"]), ["a.", "bcd"])
+        with self.assertRaises(ValueError):
+            create_flush_policy("words:3")
+
+    def test_policy_must_implement_should_flush(self):
+        with self.assertRaises(TypeError):
+            FlushPolicy()
+
+    def test_time_to_flush_follows_time_policy(self):
+        self.assertFalse(TextBatcher(None).timed)
+        batcher = TextBatcher("chars:50+time:200+time:100")
+        self.assertTrue(batcher.timed)
+        self.assertIsNone(batcher.time_to_flush())
+        batcher.add("你")
+        self.assertLessEqual(batcher.time_to_flush(), 0.1)
+        batcher.flush()
+        self.assertIsNone(batcher.time_to_flush())
+
+
+class TimedFlushTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_time_policy_flushes_while_model_is_silent(self):
+        agent = make_agent(self, flush_policy="chars:50+time:50")
+        agent._build_initial_conversation("s1", "你好")
+
+        async def generate_text(messages, model, functions, stream=True):
+            async def chunks():
+                yield {"assistant_text": "你好", "tool_calls": [], "is_chunk": True, "token": True}
+                # 模型停顿，没有新的token
+                await asyncio.sleep(0.3)
+                yield {"assistant_text": "世界", "tool_calls": [], "is_chunk": True, "token": True}
+                yield {"assistant_text": "你好世界", "tool_calls": [], "is_chunk": False}
+            return chunks()
+
+        started = time.monotonic()
+        received = []
+        with patch("A2AServer.agent.generate_text", generate_text):
+            async for item in agent._stream_response_generator("s1"):
+                received.append((item["text"], time.monotonic() - started))
+        self.assertEqual([text for text, _ in received], ["你好", "世界"])
+        # 第一段文本在模型停顿期间就按time策略发送了
+        self.assertLess(received[0][1], 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
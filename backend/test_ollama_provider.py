@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/18 10:12
+# @File  : test_ollama_provider.py
+# @Desc  : Ollama provider 不阻塞事件循环和流式响应关闭的测试用例
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from A2AServer.mcp_client.providers import client_pool
+from A2AServer.mcp_client.providers.ollama import generate_with_ollama, generate_with_ollama_stream
+
+
+class SlowOllamaHandler(BaseHTTPRequestHandler):
+    """模拟本地Ollama的 /api/chat 接口，每次生成需要 GENERATION_SECONDS 秒"""
+    GENERATION_SECONDS = 0.5
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.GENERATION_SECONDS)
+        body = json.dumps({
+            "model": request.get("model", ""),
+            "created_at": "2026-10-18T00:00:00Z",
+            "message": {"role": "assistant", "content": "LNG是液化天然气"},
+            "done": True,
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OllamaNonBlockingTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    测试Ollama生成过程中，事件循环上的其它请求可以继续推进
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), SlowOllamaHandler)
+        cls.host = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    async def asyncTearDown(self):
+        await client_pool.close_all_clients()
+
+    async def test_generation_does_not_block_event_loop(self):
+        """
+        Ollama生成期间，另一个协程每10ms计数一次，如果事件循环被阻塞，计数会停住
+        """
+        model_cfg = {"model": "qwen3", "provider": "ollama", "client": self.host}
+        conversation = [{"role": "user", "content": "解释下LNG"}]
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        try:
+            start_time = time.monotonic()
+            result = await generate_with_ollama(conversation, model_cfg, [])
+            elapsed = time.monotonic() - start_time
+        finally:
+            ticker_task.cancel()
+
+        self.assertEqual(result["assistant_text"], "LNG是液化天然气")
+        self.assertGreaterEqual(elapsed, SlowOllamaHandler.GENERATION_SECONDS)
+        # 阻塞调用时ticks几乎为0，不阻塞时0.5秒内大约有50次
+        self.assertGreater(ticks, 20, f"生成期间事件循环只推进了{ticks}次，Ollama调用阻塞了事件循环")
+
+    async def test_concurrent_generations_overlap(self):
+        """
+        多个并发请求的生成时间应该重叠，而不是逐个排队
+        """
+        model_cfg = {"model": "qwen3", "provider": "ollama", "client": self.host}
+        conversation = [{"role": "user", "content": "解释下LNG"}]
+        start_time = time.monotonic()
+        results = await asyncio.gather(*[
+            generate_with_ollama(conversation, model_cfg, []) for _ in range(3)
+        ])
+        elapsed = time.monotonic() - start_time
+        self.assertEqual([r["assistant_text"] for r in results], ["LNG是液化天然气"] * 3)
+        self.assertLess(elapsed, 3 * SlowOllamaHandler.GENERATION_SECONDS)
+
+
+class FakeStreamingClient:
+    """chat(stream=True)返回的流在done之后还有数据，记录流是否被关闭"""
+
+    def __init__(self):
+        self.closed = False
+
+    async def chat(self, **kwargs):
+        async def chunks():
+            try:
+                for text, done in [("LNG", False), ("是液化天然气", True), ("多余的数据", False)]:
+                    yield SimpleNamespace(message=SimpleNamespace(content=text, thinking=None, tool_calls=None), done=done)
+            finally:
+                self.closed = True
+        return chunks()
+
+
+class OllamaStreamTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_stream_is_closed_after_done_chunk(self):
+        client = FakeStreamingClient()
+        chunks = [c async for c in generate_with_ollama_stream(client, {"model": "qwen3", "messages": []})]
+        self.assertEqual(chunks[-1]["assistant_text"], "LNG是液化天然气")
+        self.assertTrue(client.closed)
+
+    async def test_stream_is_closed_when_caller_stops_reading(self):
+        client = FakeStreamingClient()
+        stream = generate_with_ollama_stream(client, {"model": "qwen3", "messages": []})
+        self.assertEqual((await stream.__anext__())["assistant_text"], "LNG")
+        await stream.aclose()
+        self.assertTrue(client.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
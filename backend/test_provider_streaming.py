@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 14:10
+# @File  : test_provider_streaming.py
+# @Desc  : Anthropic、Ollama、LM Studio原生流式输出的测试，token和完整的工具调用要在生成结束前就产出
+
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from A2AServer.mcp_client.providers import client_pool
+from A2AServer.mcp_client.providers.anthropic import generate_with_anthropic_stream
+from A2AServer.mcp_client.providers.lmstudio import generate_with_lmstudio
+from A2AServer.mcp_client.providers.ollama import generate_with_ollama
+
+# 最后一个事件之前服务端停顿的秒数，停顿之前收到的chunk说明是流式输出
+FINAL_EVENT_DELAY = 0.3
+
+
+def anthropic_events():
+    message = {"id": "msg_1", "type": "message", "role": "assistant", "content": [], "model": "claude",
+               "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": 1, "output_tokens": 1}}
+    tool_use = {"type": "tool_use", "id": "toolu_1", "name": "a_search", "input": {}}
+    return [
+        {"type": "message_start", "message": message},
+        {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "你"}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "好"}},
+        {"type": "content_block_stop", "index": 0},
+        {"type": "content_block_start", "index": 1, "content_block": tool_use},
+        {"type": "content_block_delta", "index": 1, "delta": {"type": "input_json_delta", "partial_json": '{"q": "L'}},
+        {"type": "content_block_delta", "index": 1, "delta": {"type": "input_json_delta", "partial_json": 'NG"}'}},
+        {"type": "content_block_stop", "index": 1},
+        {"type": "message_delta", "delta": {"stop_reason": "tool_use", "stop_sequence": None}, "usage": {"output_tokens": 5}},
+        {"type": "message_stop"},
+    ]
+
+
+def openai_events():
+    def chunk(delta, finish_reason=None):
+        return {"id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": "qwen3",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+    first = {"index": 0, "id": "call_1", "type": "function", "function": {"name": "a_search", "arguments": '{"q": "L'}}
+    return [
+        chunk({"role": "assistant", "content": "你"}),
+        chunk({"content": "好"}),
+        chunk({"tool_calls": [first]}),
+        chunk({"tool_calls": [{"index": 0, "function": {"arguments": 'NG"}'}}]}),
+        chunk({}, finish_reason="tool_calls"),
+    ]
+
+
+def ollama_events():
+    def chunk(message, done=False):
+        return {"model": "qwen3", "created_at": "2026-10-19T00:00:00Z",
+                "message": {"role": "assistant", "content": "", **message}, "done": done}
+    tool_call = {"function": {"name": "a_search", "arguments": {"q": "LNG"}}}
+    return [
+        chunk({"content": "你"}),
+        chunk({"content": "好"}),
+        chunk({"tool_calls": [tool_call]}),
+        {**chunk({}, done=True), "done_reason": "stop"},
+    ]
+
+
+class StreamingHandler(BaseHTTPRequestHandler):
+    """按路径模拟三种流式接口: Anthropic /v1/messages、OpenAI兼容 /v1/chat/completions、Ollama /api/chat"""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        assert request.get("stream") is True, "provider没有请求流式输出"
+        if self.path.endswith("/messages"):
+            content_type = "text/event-stream"
+            lines = [f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in anthropic_events()]
+        elif self.path.endswith("/chat/completions"):
+            content_type = "text/event-stream"
+            lines = [f"data: {json.dumps(e)}\n\n" for e in openai_events()] + ["data: [DONE]\n\n"]
+        else:
+            content_type = "application/x-ndjson"
+            lines = [json.dumps(e) + "\n" for e in ollama_events()]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.end_headers()
+        for line in lines[:-1]:
+            self.wfile.write(line.encode("utf-8"))
+            self.wfile.flush()
+        time.sleep(FINAL_EVENT_DELAY)
+        self.wfile.write(lines[-1].encode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProviderStreamingTestCase(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StreamingHandler)
+        cls.host = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    async def asyncTearDown(self):
+        await client_pool.close_all_clients()
+
+    async def collect(self, stream):
+        """返回所有chunk，以及每个chunk距离开始的秒数"""
+        started = time.monotonic()
+        chunks, times = [], []
+        async for chunk in stream:
+            chunks.append(chunk)
+            times.append(time.monotonic() - started)
+        return chunks, times
+
+    def assert_streamed(self, chunks, times, incremental_tool_call=True):
+        tokens = [i for i, c in enumerate(chunks) if c.get("token")]
+        self.assertEqual("".join(chunks[i]["assistant_text"] for i in tokens), "你好")
+        # 第一个token在服务端生成结束之前就已经收到
+        self.assertLess(times[tokens[0]], FINAL_EVENT_DELAY)
+
+        final = chunks[-1]
+        self.assertFalse(final["is_chunk"])
+        self.assertEqual(final["assistant_text"], "你好")
+        self.assertEqual(len(final["tool_calls"]), 1)
+        self.assertEqual(final["tool_calls"][0]["function"]["name"], "a_search")
+        self.assertEqual(json.loads(final["tool_calls"][0]["function"]["arguments"]), {"q": "LNG"})
+
+        if incremental_tool_call:
+            complete = [i for i, c in enumerate(chunks) if c.get("tool_call_complete")]
+            self.assertEqual(len(complete), 1)
+            self.assertEqual(chunks[complete[0]]["tool_calls"], final["tool_calls"])
+            self.assertLess(times[complete[0]], FINAL_EVENT_DELAY)
+
+    async def test_anthropic_streams_text_and_tool_calls(self):
+        client = client_pool.get_anthropic_client("key", self.host)
+        api_params = {"model": "claude", "max_tokens": 1024, "messages": [{"role": "user", "content": "查询LNG"}]}
+        stream = generate_with_anthropic_stream(client, api_params)
+        chunks, times = await self.collect(stream)
+        self.assert_streamed(chunks, times)
+        self.assertEqual(chunks[-1]["tool_calls"][0]["id"], "toolu_1")
+
+    async def test_lmstudio_streams_through_openai_compatible_server(self):
+        model_cfg = {"model": "qwen3", "provider": "lmstudio", "apiBase": f"{self.host}/v1"}
+        stream = await generate_with_lmstudio([{"role": "user", "content": "查询LNG"}], model_cfg, [], stream=True)
+        chunks, times = await self.collect(stream)
+        self.assert_streamed(chunks, times)
+
+    async def test_ollama_streams_tokens(self):
+        model_cfg = {"model": "qwen3", "provider": "ollama", "client": self.host}
+        stream = await generate_with_ollama([{"role": "user", "content": "查询LNG"}], model_cfg, [], stream=True)
+        chunks, times = await self.collect(stream)
+        # Ollama每个工具调用本身就是完整的，随最后一个chunk一起返回
+        self.assert_streamed(chunks, times, incremental_tool_call=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 10:40
+# @File  : test_session_pool.py
+# @Desc  : MCP warm session池的重连、超时、取消和健康检查测试
+
+import asyncio
+import time
+import unittest
+
+from anyio import ClosedResourceError
+
+from A2AServer.mcp_client.session_pool import MCPSessionPool
+
+
+class FakeSession:
+    """模拟MCP ClientSession，broken后所有调用都抛出连接断开的异常"""
+
+    def __init__(self, server):
+        self.server = server
+        self.broken = False
+
+    async def send_ping(self):
+        if self.broken:
+            raise ClosedResourceError()
+
+    async def call_tool(self, name):
+        if self.broken:
+            raise ClosedResourceError()
+        return f"{name} ok"
+
+
+class FakeServer:
+    def __init__(self):
+        self.up = True
+        self.hang = False
+        self.sessions = []
+        self.unwound = 0
+
+    def break_sessions(self):
+        for session in self.sessions:
+            session.broken = True
+
+
+class FakePool(MCPSessionPool):
+    def __init__(self, server, **kwargs):
+        super().__init__("fake", **kwargs)
+        self.server = server
+
+    async def _open_session(self, stack):
+        await asyncio.sleep(0.01)
+        if self.server.hang:
+            # 连接卡住：上下文已经进入，但初始化一直不返回
+            stack.callback(self.count_unwound)
+            await asyncio.Event().wait()
+        if not self.server.up:
+            raise ConnectionError("server is down")
+        session = FakeSession(self.server)
+        self.server.sessions.append(session)
+        return session
+
+    def count_unwound(self):
+        self.server.unwound += 1
+
+    async def call(self, name):
+        return await self._with_session(lambda session: session.call_tool(name))
+
+
+class SessionPoolTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeServer()
+        self.pool = FakePool(self.server, pool_size=1, health_check_interval=0, reconnect_timeout=1.5)
+        self.assertTrue(await self.pool.start())
+
+    async def asyncTearDown(self):
+        await self.pool.cleanup()
+
+    async def test_call_uses_warm_session(self):
+        self.assertEqual(await self.pool.call("search"), "search ok")
+        self.assertEqual(len(self.server.sessions), 1)
+
+    async def test_reconnects_dead_session(self):
+        self.server.break_sessions()
+        self.assertEqual(await self.pool.call("search"), "search ok")
+        self.assertEqual(len(self.server.sessions), 2)
+        self.assertEqual(self.pool.metrics()["reconnects"], 1)
+
+    async def test_server_down_fails_within_reconnect_timeout(self):
+        self.server.up = False
+        self.server.break_sessions()
+        started = time.monotonic()
+        with self.assertRaises(ConnectionError):
+            await self.pool.call("search")
+        self.assertLess(time.monotonic() - started, 3)
+        # 重连任务仍然在后台按退避重试，服务恢复后调用可以成功
+        self.assertFalse(self.pool._reconnect_task.done())
+        self.server.up = True
+        self.assertEqual(await self.pool.call("search"), "search ok")
+
+    async def test_cancelled_caller_does_not_cancel_shared_reconnect(self):
+        self.server.up = False
+        self.server.break_sessions()
+        first = asyncio.ensure_future(self.pool.call("search"))
+        second = asyncio.ensure_future(self.pool.call("search"))
+        await asyncio.sleep(0.1)
+        first.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        reconnect = self.pool._reconnect_task
+        self.assertFalse(reconnect.cancelled())
+        self.server.up = True
+        self.assertEqual(await second, "search ok")
+
+
+class HealthCheckTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_health_ping_replaces_dead_warm_session(self):
+        server = FakeServer()
+        pool = FakePool(server, pool_size=2, health_check_interval=0.05, health_check_timeout=0.1)
+        try:
+            self.assertTrue(await pool.start())
+            server.sessions[0].broken = True
+            # 没有任何工具调用，后台的健康检查发现断开的session并重连
+            for _ in range(50):
+                await asyncio.sleep(0.02)
+                if pool.reconnects:
+                    break
+            metrics = pool.metrics()
+            self.assertEqual(metrics["reconnects"], 1)
+            self.assertEqual(metrics["healthy_sessions"], 2)
+            self.assertIsNotNone(metrics["last_ping_latency"])
+        finally:
+            await pool.cleanup()
+
+
+class ConnectTimeoutTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeServer()
+        self.pool = FakePool(self.server, pool_size=1, health_check_interval=0, reconnect_timeout=0.2)
+
+    async def asyncTearDown(self):
+        await self.pool.cleanup()
+
+    def test_pool_without_open_session_cannot_be_created(self):
+        with self.assertRaises(TypeError):
+            MCPSessionPool("fake")
+
+    async def test_hung_connect_fails_start_within_timeout(self):
+        self.server.hang = True
+        started = time.monotonic()
+        self.assertFalse(await self.pool.start())
+        self.assertLess(time.monotonic() - started, 1)
+        await asyncio.sleep(0.01)
+        # 放弃的会话由owner任务退出自己进入的上下文
+        self.assertEqual(self.server.unwound, 1)
+
+    async def test_hung_reconnect_does_not_stall_reconnect_loop(self):
+        self.assertTrue(await self.pool.start())
+        self.server.hang = True
+        self.server.break_sessions()
+        with self.assertRaises(ConnectionError):
+            await self.pool.call("search")
+        # 卡住的连接超时后重连任务继续按退避重试，服务恢复后调用可以成功
+        self.server.hang = False
+        for _ in range(50):
+            await asyncio.sleep(0.05)
+            if self.pool.reconnects:
+                break
+        self.assertEqual(await self.pool.call("search"), "search ok")
+        self.assertGreaterEqual(self.pool.metrics()["failed_reconnects"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 14:40
+# @File  : test_session_store.py
+# @Desc  : SessionStore的LRU淘汰、空闲过期和单会话字节预算的测试
+
+import unittest
+from unittest.mock import patch
+
+from A2AServer.session_store import SessionStore, message_size
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SessionStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch("A2AServer.session_store.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.evicted = []
+
+    def make_store(self, **kwargs):
+        return SessionStore(on_evict=self.evicted.append, **kwargs)
+
+    def test_missing_session_is_created_empty(self):
+        store = self.make_store()
+        store["s1"].append({"role": "user", "content": "你好"})
+        self.assertIn("s1", store)
+        self.assertEqual(store["s1"], [{"role": "user", "content": "你好"}])
+        self.assertIsNone(store.get("s2"))
+        self.assertNotIn("s2", store)
+
+    def test_least_recently_used_session_is_evicted(self):
+        store = self.make_store(max_sessions=2, idle_ttl=None)
+        store["a"]
+        store["b"]
+        # 访问a之后，最久未使用的是b
+        store["a"]
+        store["c"]
+        self.assertEqual(sorted(store._sessions), ["a", "c"])
+        self.assertEqual(self.evicted, ["b"])
+        self.assertEqual(store.metrics()["lru_evictions"], 1)
+
+    def test_get_does_not_refresh_access_order(self):
+        store = self.make_store(max_sessions=2, idle_ttl=None)
+        store["a"]
+        store["b"]
+        store.get("a")
+        store["c"]
+        self.assertEqual(self.evicted, ["a"])
+
+    def test_idle_sessions_expire(self):
+        store = self.make_store(idle_ttl=60)
+        store["old"]
+        self.clock.now += 30
+        store["recent"]
+        self.clock.now += 40
+        # old已经空闲70秒，recent只空闲了40秒
+        store["new"]
+        self.assertNotIn("old", store)
+        self.assertIn("recent", store)
+        self.assertEqual(self.evicted, ["old"])
+        self.assertEqual(store.metrics()["idle_evictions"], 1)
+
+    def test_budget_drops_oldest_turns_and_keeps_tool_pairs(self):
+        store = self.make_store(max_session_bytes=None)
+        conversation = store["s1"]
+        conversation.append({"role": "system", "content": "你是一个助手"})
+        for i in range(3):
+            conversation.extend([
+                {"role": "user", "content": f"问题{i} " + "x" * 200},
+                {"role": "assistant", "content": "", "tool_calls": [{"id": f"c{i}", "type": "function",
+                                                                     "function": {"name": "search", "arguments": "{}"}}]},
+                {"role": "tool", "tool_call_id": f"c{i}", "content": "y" * 200},
+                {"role": "assistant", "content": f"回答{i}"},
+            ])
+        last_turn = conversation[-4:]
+        store.max_session_bytes = sum(message_size(m) for m in conversation[:1] + last_turn) + 50
+        store.enforce_budget("s1")
+
+        self.assertEqual(conversation[0]["role"], "system")
+        self.assertEqual(conversation[1:], last_turn)
+        self.assertEqual(store.metrics()["trimmed_messages"], 8)
+
+    def test_budget_is_off_by_default(self):
+        store = self.make_store()
+        conversation = store["s1"]
+        conversation.append({"role": "system", "content": "prompt"})
+        for i in range(100):
+            conversation.extend([{"role": "user", "content": "x" * 10000}, {"role": "assistant", "content": f"回答{i}"}])
+        store.enforce_budget("s1")
+        self.assertEqual(len(conversation), 201)
+        self.assertEqual(store.metrics()["trimmed_messages"], 0)
+
+    def test_budget_never_drops_latest_turn(self):
+        store = self.make_store(max_session_bytes=10)
+        conversation = store["s1"]
+        conversation.extend([{"role": "system", "content": "prompt"}, {"role": "user", "content": "x" * 100}])
+        store.enforce_budget("s1")
+        self.assertEqual(len(conversation), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/20 10:50
+# @File  : test_sse_encoder.py
+# @Desc  : 流式响应编码为SSE帧的测试，输出与model_dump_json一致，包括没有安装orjson的情况
+
+import unittest
+
+from A2AServer.common.A2Atypes import (
+    Artifact,
+    SendTaskStreamingResponse,
+    TaskArtifactUpdateEvent,
+    TaskState,
+    TaskStatus,
+    TaskStatusUpdateEvent,
+    TextPart,
+)
+from A2AServer.common.server import sse_encoder
+
+
+class SseEncoderTestCase(unittest.TestCase):
+    def events(self):
+        delta = TaskArtifactUpdateEvent(
+            id="t1", artifact=Artifact(parts=[TextPart(text='你好 "a2a"\n\t\x00😀')], index=0, append=True, lastChunk=False))
+        delta.metadata = {"seq": 3}
+        named = TaskArtifactUpdateEvent(id="t1", artifact=Artifact(name="answer", parts=[TextPart(text="a")]))
+        status = TaskStatusUpdateEvent(id="t1", status=TaskStatus(state=TaskState.COMPLETED), final=True)
+        return [SendTaskStreamingResponse(id=request_id, result=event)
+                for request_id in ("r1", 7, None) for event in (delta, named, status)]
+
+    def assert_same_as_model_dump(self):
+        for item in self.events():
+            expected = "data: " + item.model_dump_json(exclude_none=True) + "\r\n\r\n"
+            self.assertEqual(sse_encoder.encode_event(item), expected.encode("utf-8"))
+
+    def test_encode_event_matches_model_dump_json(self):
+        self.assert_same_as_model_dump()
+
+    def test_encode_event_without_orjson(self):
+        orjson = sse_encoder.orjson
+        sse_encoder.orjson = None
+        try:
+            self.assert_same_as_model_dump()
+        finally:
+            sse_encoder.orjson = orjson
+
+
+if __name__ == "__main__":
+    unittest.main()
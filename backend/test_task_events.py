@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/18 16:20
+# @File  : test_task_events.py
+# @Desc  : 流式任务的事件重放(tasks/resubscribe)测试
+
+import asyncio
+import unittest
+
+from A2AServer.common.A2Atypes import (
+    Artifact,
+    GetTaskRequest,
+    Message,
+    SendTaskRequest,
+    TaskArtifactUpdateEvent,
+    TaskQueryParams,
+    TaskState,
+    TaskStatus,
+    SendTaskStreamingRequest,
+    TaskResubscriptionParams,
+    TaskResubscriptionRequest,
+    TaskSendParams,
+    TaskStatusUpdateEvent,
+    TextPart,
+)
+from A2AServer.common.server.event_buffer import TaskEventBuffer
+from A2AServer.common.server.event_bus import TaskEventBus, DISCONNECT, DROP_NEWEST
+from A2AServer.task_manager import AgentTaskManager
+
+
+class FakeAgent:
+    """每隔一小段时间输出一个token的agent"""
+
+    def __init__(self, tokens=6, delay=0.02):
+        self.tokens = tokens
+        self.delay = delay
+
+    async def stream(self, query, session_id, use_tool_cache=True):
+        for i in range(self.tokens):
+            await asyncio.sleep(self.delay)
+            yield {"type": "normal", "is_task_complete": False, "content": f"token{i} "}
+        yield {"type": "normal", "is_task_complete": True, "content": "done"}
+
+    async def cleanup(self):
+        pass
+
+
+def make_request(task_id):
+    message = Message(role="user", parts=[TextPart(text="你好")])
+    return SendTaskStreamingRequest(id=1, params=TaskSendParams(id=task_id, message=message))
+
+
+def resubscribe_request(task_id, offset=None):
+    return TaskResubscriptionRequest(id=2, params=TaskResubscriptionParams(id=task_id, offset=offset))
+
+
+class TaskEventBufferTestCase(unittest.TestCase):
+    def test_since_offset(self):
+        buffer = TaskEventBuffer(maxlen=3)
+        for i in range(5):
+            self.assertEqual(buffer.append(f"e{i}"), i)
+        self.assertEqual(buffer.first_seq, 2)
+        self.assertEqual(buffer.since(3), (["e3", "e4"], 0))
+        self.assertEqual(buffer.since(0), (["e2", "e3", "e4"], 2))
+        self.assertEqual(buffer.since(None), (["e2", "e3", "e4"], 0))
+        self.assertEqual(buffer.since(5), ([], 0))
+
+
+def status_event(task_id, final=False):
+    return TaskStatusUpdateEvent(id=task_id, status=TaskStatus(state=TaskState.WORKING), final=final)
+
+
+def artifact_event(task_id, text):
+    return TaskArtifactUpdateEvent(id=task_id, artifact=Artifact(parts=[TextPart(text=text)], index=0))
+
+
+class TaskEventBusTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_subscriber_drops_oldest_status(self):
+        bus = TaskEventBus("t", queue_size=2)
+        queue = bus.subscribe()
+        await bus.publish(status_event("t"))
+        await bus.publish(artifact_event("t", "a"))
+        await bus.publish(status_event("t"))
+        self.assertEqual(queue.dropped, 1)
+        events = [await queue.get(), await queue.get()]
+        self.assertEqual([e.metadata["seq"] for e in events], [1, 2])
+
+    async def test_artifacts_block_until_read(self):
+        bus = TaskEventBus("t", queue_size=1)
+        queue = bus.subscribe()
+        await bus.publish(artifact_event("t", "a"))
+        publish = asyncio.ensure_future(bus.publish(artifact_event("t", "b")))
+        await asyncio.sleep(0.01)
+        self.assertFalse(publish.done())
+        self.assertEqual((await queue.get()).artifact.parts[0].text, "a")
+        await asyncio.wait_for(publish, 1)
+        self.assertEqual((await queue.get()).artifact.parts[0].text, "b")
+
+    async def test_leaving_subscriber_releases_producer(self):
+        bus = TaskEventBus("t", queue_size=1)
+        queue = bus.subscribe()
+        await bus.publish(artifact_event("t", "a"))
+        publish = asyncio.ensure_future(bus.publish(artifact_event("t", "b")))
+        await asyncio.sleep(0.01)
+        bus.unsubscribe(queue)
+        await asyncio.wait_for(publish, 1)
+
+    async def test_blocked_subscriber_does_not_hold_back_others(self):
+        bus = TaskEventBus("t", queue_size=1)
+        slow, fast = bus.subscribe(), bus.subscribe()
+        await bus.publish(artifact_event("t", "a"))
+        self.assertEqual((await fast.get()).artifact.parts[0].text, "a")
+        publish = asyncio.ensure_future(bus.publish(artifact_event("t", "b")))
+        await asyncio.sleep(0.01)
+        # 慢订阅者还没读，快订阅者已经收到了新事件
+        self.assertFalse(publish.done())
+        self.assertEqual((await fast.get()).artifact.parts[0].text, "b")
+        self.assertEqual(slow.metrics(bus.buffer.next_seq)["lag"], 2)
+        await slow.get()
+        await asyncio.wait_for(publish, 1)
+        self.assertEqual(slow.metrics(bus.buffer.next_seq)["lag"], 1)
+
+    async def test_stalled_subscriber_is_disconnected_after_block_timeout(self):
+        bus = TaskEventBus("t", queue_size=1, block_timeout=0.05)
+        stalled, reader = bus.subscribe(), bus.subscribe()
+        await bus.publish(artifact_event("t", "a"))
+        self.assertEqual((await reader.get()).artifact.parts[0].text, "a")
+        # stalled一直不读取，生产者最多等待block_timeout秒
+        await asyncio.wait_for(bus.publish(artifact_event("t", "b")), 1)
+        self.assertTrue(stalled.disconnected)
+        self.assertIsNone(await stalled.get())
+        self.assertEqual((await reader.get()).artifact.parts[0].text, "b")
+        # 断开之后不再阻塞生产者
+        await asyncio.wait_for(bus.publish(artifact_event("t", "c")), 1)
+
+    async def test_disconnect_and_drop_newest_policies(self):
+        bus = TaskEventBus("t", queue_size=1, status_policy=DROP_NEWEST, artifact_policy=DISCONNECT)
+        queue = bus.subscribe()
+        await bus.publish(status_event("t"))
+        await bus.publish(status_event("t"))
+        self.assertEqual(queue.dropped, 1)
+        await bus.publish(artifact_event("t", "a"))
+        self.assertTrue(queue.disconnected)
+        self.assertIsNone(await queue.get())
+        bus.unsubscribe(queue)
+        self.assertEqual(bus.metrics()["disconnected"], 1)
+        # 断开的客户端按offset重新订阅，从重放缓冲区拿到剩下的事件
+        resubscribed = bus.subscribe(replay=True, offset=1)
+        self.assertEqual([(await resubscribed.get()).metadata["seq"] for _ in range(2)], [1, 2])
+
+
+class CoalescingTestCase(unittest.IsolatedAsyncioTestCase):
+    async def collect(self, manager, task_id):
+        stream = await manager.on_send_task_subscribe(make_request(task_id))
+        return [response.result async for response in stream]
+
+    async def test_deltas_are_merged_within_window(self):
+        manager = AgentTaskManager(FakeAgent(tokens=6, delay=0.001), coalesce_window=10, coalesce_max_bytes=1024)
+        events = await self.collect(manager, "c1")
+        texts = [e.artifact.parts[0].text for e in events if isinstance(e, TaskArtifactUpdateEvent)]
+        self.assertEqual(texts, ["token0 token1 token2 token3 token4 token5 ", "done"])
+
+        task = (await manager.on_get_task(GetTaskRequest(id=2, params=TaskQueryParams(id="c1")))).result
+        self.assertEqual(len(task.artifacts), 1)
+        self.assertEqual(task.artifacts[0].parts[0].text, "token0 token1 token2 token3 token4 token5 done")
+
+    async def test_byte_threshold_and_window_flush(self):
+        manager = AgentTaskManager(FakeAgent(tokens=6, delay=0.001), coalesce_window=10, coalesce_max_bytes=14)
+        events = await self.collect(manager, "c2")
+        texts = [e.artifact.parts[0].text for e in events if isinstance(e, TaskArtifactUpdateEvent)]
+        self.assertEqual(texts[:3], ["token0 token1 ", "token2 token3 ", "token4 token5 "])
+
+        # agent停顿超过时间窗口时，合并中的文本不等下一个片段就发送
+        manager = AgentTaskManager(FakeAgent(tokens=2, delay=0.2), coalesce_window=0.02)
+        stream = await manager.on_send_task_subscribe(make_request("c3"))
+        started = asyncio.get_running_loop().time()
+        async for response in stream:
+            if isinstance(response.result, TaskArtifactUpdateEvent):
+                break
+        self.assertLess(asyncio.get_running_loop().time() - started, 0.35)
+        self.assertEqual(response.result.artifact.parts[0].text, "token0 ")
+        await stream.aclose()
+
+
+class ResubscribeTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_resubscribe_after_disconnect(self):
+        manager = AgentTaskManager(FakeAgent(), coalesce_window=0)
+        stream = await manager.on_send_task_subscribe(make_request("t1"))
+        received = []
+        async for response in stream:
+            received.append(response.result.metadata["seq"])
+            if len(received) == 3:
+                break
+        await stream.aclose()
+
+        # 断开期间任务继续执行
+        await asyncio.sleep(0.05)
+        stream = await manager.on_resubscribe_to_task(resubscribe_request("t1", offset=len(received)))
+        async for response in stream:
+            received.append(response.result.metadata["seq"])
+        self.assertEqual(received, list(range(8)))
+        self.assertIsInstance(response.result, TaskStatusUpdateEvent)
+        self.assertTrue(response.result.final)
+
+    async def test_resubscribe_after_completion_replays_buffer(self):
+        manager = AgentTaskManager(FakeAgent(tokens=2, delay=0), coalesce_window=0)
+        stream = await manager.on_send_task_subscribe(make_request("t2"))
+        first = [response.result.metadata["seq"] async for response in stream]
+
+        stream = await manager.on_resubscribe_to_task(resubscribe_request("t2"))
+        self.assertEqual([response.result.metadata["seq"] async for response in stream], first)
+
+    async def test_detached_task_is_polled(self):
+        manager = AgentTaskManager(FakeAgent(tokens=3, delay=0.01))
+        message = Message(role="user", parts=[TextPart(text="你好")])
+        request = SendTaskRequest(id=1, params=TaskSendParams(id="t3", message=message, metadata={"detach": True}))
+        response = await manager.on_send_task(request)
+        self.assertEqual(response.result.status.state, TaskState.WORKING)
+
+        for _ in range(100):
+            response = await manager.on_get_task(GetTaskRequest(id=2, params=TaskQueryParams(id="t3")))
+            if response.result.status.state == TaskState.COMPLETED:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(response.result.status.state, TaskState.COMPLETED)
+        # 任务中保存的是合并后的一个artifact
+        self.assertEqual(len(response.result.artifacts), 1)
+        self.assertEqual(response.result.artifacts[0].parts[0].text, "token0 token1 token2 done")
+
+    async def test_resubscribe_to_detached_task_receives_live_events(self):
+        manager = AgentTaskManager(FakeAgent(tokens=3, delay=0.02), coalesce_window=0)
+        message = Message(role="user", parts=[TextPart(text="你好")])
+        for task_id in ("t4", "t4"):
+            # 第二次detach是同一个任务继续对话，上一次的事件总线已经关闭
+            request = SendTaskRequest(id=1, params=TaskSendParams(id=task_id, message=message, metadata={"detach": True}))
+            await manager.on_send_task(request)
+            stream = await manager.on_resubscribe_to_task(resubscribe_request(task_id))
+            results = [response.result async for response in stream]
+            texts = [r.artifact.parts[0].text for r in results if isinstance(r, TaskArtifactUpdateEvent)]
+            self.assertEqual(texts, ["token0 ", "token1 ", "token2 ", "done"])
+            self.assertIsInstance(results[-1], TaskStatusUpdateEvent)
+            self.assertTrue(results[-1].final)
+
+    async def test_resubscribe_unknown_task(self):
+        manager = AgentTaskManager(FakeAgent())
+        response = await manager.on_resubscribe_to_task(resubscribe_request("missing"))
+        self.assertEqual(response.error.code, -32001)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/18 15:40
+# @File  : test_task_store.py
+# @Desc  : TaskStore 的测试用例，Redis使用本地的协议兼容替身服务器
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from A2AServer.common.A2Atypes import (
+    GetTaskRequest,
+    TaskResubscriptionParams,
+    TaskResubscriptionRequest,
+    Message,
+    PushNotificationConfig,
+    TaskQueryParams,
+    TaskSendParams,
+    TaskState,
+    TaskStatus,
+    TextPart,
+    Artifact,
+)
+from A2AServer.common.server.task_manager import InMemoryTaskManager
+from A2AServer.common.server.task_archive import SQLiteTaskArchive
+from A2AServer.common.server.task_store import (
+    InMemoryTaskStore,
+    SQLiteTaskStore,
+    RedisTaskStore,
+    create_task_store,
+    MAX_CACHED_VIEWS_PER_TASK,
+)
+
+
+class FakeRedisServer:
+    """只实现TaskStore用到的命令的Redis协议替身服务器"""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _execute(self, args):
+        command = args[0].decode().upper()
+        self.commands.append(command)
+        if command in ("SELECT", "AUTH"):
+            return b"+OK\r\n"
+        if command == "GET":
+            value = self.data.get(args[1])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == "SET":
+            options = [a.decode().upper() for a in args[3:]]
+            if "NX" in options and args[1] in self.data:
+                return b"$-1\r\n"
+            self.data[args[1]] = args[2]
+            return b"+OK\r\n"
+        if command == "DEL":
+            return b":%d\r\n" % sum(1 for key in args[1:] if self.data.pop(key, None) is not None)
+        if command == "EVAL" and args[1].decode() == RedisTaskStore.RELEASE_SCRIPT:
+            # 释放锁的比较并删除脚本，在服务器端原子执行
+            key, token = args[3], args[4]
+            if self.data.get(key) == token:
+                del self.data[key]
+                return b":1\r\n"
+            return b":0\r\n"
+        return b"-ERR unknown command\r\n"
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                writer.write(self._execute(args))
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class DemoTaskManager(InMemoryTaskManager):
+    async def on_send_task(self, request):
+        pass
+
+    async def on_send_task_subscribe(self, request):
+        pass
+
+
+def make_params(task_id, text):
+    return TaskSendParams(id=task_id, sessionId="s1", message=Message(role="user", parts=[TextPart(text=text)]))
+
+
+class TaskStoreTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    三种TaskStore的行为一致，共享的store在不同的manager(模拟不同的worker)之间可见
+    """
+
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.redis = FakeRedisServer()
+        await self.redis.start()
+
+    async def asyncTearDown(self):
+        await self.redis.stop()
+        self.tmpdir.cleanup()
+
+    def make_stores(self):
+        return {
+            "memory": lambda: InMemoryTaskStore(),
+            "sqlite": lambda: SQLiteTaskStore(os.path.join(self.tmpdir.name, "tasks.db")),
+            "redis": lambda: RedisTaskStore("127.0.0.1", self.redis.port),
+        }
+
+    async def test_task_lifecycle(self):
+        for name, make_store in self.make_stores().items():
+            with self.subTest(store=name):
+                store = make_store()
+                await store.upsert_task(make_params(f"{name}-1", "你好"))
+                await store.upsert_task(make_params(f"{name}-1", "继续"))
+                artifact = Artifact(parts=[TextPart(text="结果")], index=0)
+                task = await store.update_task(f"{name}-1", TaskStatus(state=TaskState.COMPLETED), [artifact])
+                self.assertEqual(task.status.state, TaskState.COMPLETED)
+
+                stored = await store.get_task(f"{name}-1")
+                self.assertEqual(len(stored.history), 2)
+                self.assertEqual(stored.artifacts[0].parts[0].text, "结果")
+                self.assertIsNone(await store.get_task("missing"))
+                with self.assertRaises(ValueError):
+                    await store.update_task("missing", TaskStatus(state=TaskState.WORKING), None)
+
+                config = PushNotificationConfig(url="http://localhost/notify", token="t")
+                self.assertFalse(await store.has_push_notification_info(f"{name}-1"))
+                await store.set_push_notification_info(f"{name}-1", config)
+                self.assertEqual(await store.get_push_notification_info(f"{name}-1"), config)
+                await store.close()
+
+    async def test_task_views_are_shared_until_the_task_changes(self):
+        store = InMemoryTaskStore()
+        await store.upsert_task(make_params("view-1", "你好"))
+        await store.upsert_task(make_params("view-1", "继续"))
+        view = await store.get_task_view("view-1", 1)
+        self.assertEqual([m.parts[0].text for m in view.history], ["继续"])
+        self.assertIs(await store.get_task_view("view-1", 1), view)
+        self.assertEqual((await store.get_task_view("view-1", None)).history, [])
+        self.assertIs(await store.get_task_view("view-1", 0), await store.get_task_view("view-1", None))
+
+        await store.update_task("view-1", TaskStatus(state=TaskState.COMPLETED), None)
+        updated = await store.get_task_view("view-1", 1)
+        self.assertIsNot(updated, view)
+        self.assertEqual(view.status.state, TaskState.SUBMITTED)
+        self.assertEqual(updated.status.state, TaskState.COMPLETED)
+
+    async def test_cached_task_views_are_bounded(self):
+        store = InMemoryTaskStore()
+        await store.upsert_task(make_params("view-3", "你好"))
+        for i in range(20):
+            await store.upsert_task(make_params("view-3", f"消息{i}"))
+        # 客户端每次请求不同的historyLength，缓存的视图数量不超过上限
+        for history_length in range(1, 100):
+            view = await store.get_task_view("view-3", history_length)
+            self.assertEqual(len(view.history), min(history_length, 21))
+        self.assertLessEqual(len(store._views["view-3"][1]), MAX_CACHED_VIEWS_PER_TASK)
+        # 超过历史条数的historyLength共用全部历史的视图
+        self.assertIs(await store.get_task_view("view-3", 500), await store.get_task_view("view-3", 1000))
+
+    async def test_task_view_is_not_changed_by_later_updates(self):
+        store = InMemoryTaskStore()
+        await store.upsert_task(make_params("view-2", "你好"))
+        await store.update_task("view-2", TaskStatus(state=TaskState.WORKING),
+                                [Artifact(parts=[TextPart(text="第一段")], index=0)])
+        view = await store.get_task_view("view-2", 1)
+        # 之后的更新追加artifact，不能出现在之前返回的视图里
+        await store.update_task("view-2", TaskStatus(state=TaskState.COMPLETED),
+                                [Artifact(parts=[TextPart(text="第二段")], index=1)])
+        self.assertEqual([a.parts[0].text for a in view.artifacts], ["第一段"])
+        self.assertEqual(view.status.state, TaskState.WORKING)
+        updated = await store.get_task_view("view-2", 1)
+        self.assertEqual([a.parts[0].text for a in updated.artifacts], ["第一段", "第二段"])
+
+    async def test_retention_archives_finished_tasks(self):
+        archive = SQLiteTaskArchive(os.path.join(self.tmpdir.name, "archive.db"))
+        store = InMemoryTaskStore(max_tasks=2, terminal_ttl=60, archive=archive)
+        for i in range(3):
+            await store.upsert_task(make_params(f"done-{i}", "你好"))
+            await store.update_task(f"done-{i}", TaskStatus(state=TaskState.COMPLETED),
+                                    [Artifact(parts=[TextPart(text=f"结果{i}")], index=0)])
+        await store.upsert_task(make_params("running", "你好"))
+        await store.set_push_notification_info("done-0", PushNotificationConfig(url="http://localhost/notify"))
+
+        # 4个任务，最多保留2个：最早结束的两个被归档，运行中的任务不会被淘汰
+        self.assertEqual(await store.sweep(), 2)
+        self.assertEqual(sorted(store.tasks), ["done-2", "running"])
+        view = await store.get_task_view("done-0", 5)
+        self.assertEqual(view.artifacts[0].parts[0].text, "结果0")
+        self.assertEqual(view.history[0].parts[0].text, "你好")
+        self.assertEqual((await store.get_push_notification_info("done-0")).url, "http://localhost/notify")
+        self.assertNotIn("done-0", store.tasks)
+
+        # 继续对话时任务从归档恢复到内存
+        await store.upsert_task(make_params("done-1", "继续"))
+        self.assertEqual(len(store.tasks["done-1"].history), 2)
+        self.assertIsNone(await archive.get("done-1"))
+
+        metrics = store.metrics()
+        self.assertEqual(metrics["tasks"], 3)
+        self.assertEqual(metrics["evicted"], 2)
+        self.assertGreater(metrics["approx_bytes"], 0)
+        self.assertEqual(metrics["archive"]["archived"], 2)
+        connections = list(archive._connections)
+        self.assertTrue(connections)
+        await store.close()
+        # 归档在to_thread的工作线程中打开的连接也被关闭
+        for conn in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+    async def test_input_required_tasks_are_not_evicted(self):
+        store = InMemoryTaskStore(max_tasks=1, terminal_ttl=0)
+        await store.upsert_task(make_params("waiting", "你好"))
+        await store.update_task("waiting", TaskStatus(state=TaskState.INPUT_REQUIRED), None)
+        await store.upsert_task(make_params("done", "你好"))
+        await store.update_task("done", TaskStatus(state=TaskState.COMPLETED), None)
+
+        # 超过max_tasks并且ttl已经过期，等待用户输入的任务仍然保留
+        self.assertEqual(await store.sweep(), 1)
+        self.assertEqual(sorted(store.tasks), ["waiting"])
+
+        # 用户回复后任务结束，才会被淘汰
+        await store.update_task("waiting", TaskStatus(state=TaskState.COMPLETED), None)
+        self.assertEqual(await store.sweep(), 1)
+        self.assertEqual(store.tasks, {})
+        await store.close()
+
+    async def test_terminal_ttl_sweeper(self):
+        store = create_task_store("memory://?ttl=0.05&sweep_interval=0.02")
+        await store.start()
+        await store.upsert_task(make_params("short", "你好"))
+        await store.update_task("short", TaskStatus(state=TaskState.FAILED), None)
+        await store.upsert_task(make_params("long", "你好"))
+        await asyncio.sleep(0.2)
+        self.assertIsNone(await store.get_task("short"))
+        self.assertIsNotNone(await store.get_task("long"))
+        self.assertEqual(store.metrics()["expired"], 1)
+        await store.close()
+
+    async def test_manager_keeps_read_only_legacy_attributes(self):
+        manager = DemoTaskManager(InMemoryTaskStore())
+        await manager.upsert_task(make_params("legacy-1", "你好"))
+        self.assertIn("legacy-1", manager.tasks)
+        self.assertIsInstance(manager.lock, asyncio.Lock)
+        queue = await manager.setup_sse_consumer("legacy-1")
+        self.assertEqual(manager.task_sse_subscribers, {"legacy-1": [queue]})
+        with self.assertRaises(AttributeError):
+            manager.tasks = {}
+        # 共享的store没有进程内的任务字典
+        shared = DemoTaskManager(SQLiteTaskStore(os.path.join(self.tmpdir.name, "tasks.db")))
+        with self.assertRaises(AttributeError):
+            shared.tasks
+        await shared.on_shutdown()
+
+    async def test_shared_store_visible_from_other_worker(self):
+        for name in ("sqlite", "redis"):
+            with self.subTest(store=name):
+                make_store = self.make_stores()[name]
+                worker_a, worker_b = DemoTaskManager(make_store()), DemoTaskManager(make_store())
+                await worker_a.upsert_task(make_params(f"shared-{name}", "你好"))
+                await worker_a.update_store(f"shared-{name}", TaskStatus(state=TaskState.WORKING), None)
+
+                response = await worker_b.on_get_task(
+                    GetTaskRequest(id=1, params=TaskQueryParams(id=f"shared-{name}", historyLength=5))
+                )
+                self.assertIsNone(response.error)
+                self.assertEqual(response.result.status.state, TaskState.WORKING)
+                self.assertEqual(response.result.history[0].parts[0].text, "你好")
+                await worker_a.on_shutdown()
+                await worker_b.on_shutdown()
+
+    async def test_concurrent_updates_are_not_lost(self):
+        for name in ("sqlite", "redis"):
+            with self.subTest(store=name):
+                make_store = self.make_stores()[name]
+                stores = [make_store() for _ in range(4)]
+                await stores[0].upsert_task(make_params(f"concurrent-{name}", "开始"))
+                await asyncio.gather(*[
+                    store.update_task(f"concurrent-{name}", TaskStatus(state=TaskState.WORKING),
+                                      [Artifact(parts=[TextPart(text=str(i))], index=i)])
+                    for i, store in enumerate(stores * 5)
+                ])
+                task = await stores[0].get_task(f"concurrent-{name}")
+                self.assertEqual(len(task.artifacts), 20)
+                for store in stores:
+                    await store.close()
+
+    async def test_redis_lock_release_is_compare_and_delete(self):
+        store = RedisTaskStore("127.0.0.1", self.redis.port)
+        await store.upsert_task(make_params("lock-1", "你好"))
+        self.assertIn("EVAL", self.redis.commands)
+        self.assertNotIn("DEL", self.redis.commands)
+        self.assertNotIn(b"a2a:lock:lock-1", self.redis.data)
+
+        # 锁过期后被其他worker拿到，释放自己的旧token不能删除别人的锁
+        token = await store._acquire("lock-2")
+        self.redis.data[b"a2a:lock:lock-2"] = b"other-worker"
+        await store._release("lock-2", token)
+        self.assertEqual(self.redis.data[b"a2a:lock:lock-2"], b"other-worker")
+        await store.close()
+
+    async def test_redis_lock_retries_back_off(self):
+        store = RedisTaskStore("127.0.0.1", self.redis.port)
+        await store.upsert_task(make_params("lock-3", "你好"))
+        self.redis.data[b"a2a:lock:lock-3"] = b"other-worker"
+
+        async def release_later():
+            await asyncio.sleep(0.5)
+            del self.redis.data[b"a2a:lock:lock-3"]
+        release = asyncio.ensure_future(release_later())
+        self.redis.commands.clear()
+        await store.update_task("lock-3", TaskStatus(state=TaskState.WORKING), None)
+        await release
+        # 固定5ms重试会发送上百次SET，指数退避后只有十几次
+        self.assertLess(self.redis.commands.count("SET"), 20)
+        await store.close()
+
+    async def test_sqlite_close_closes_connections_of_all_threads(self):
+        store = SQLiteTaskStore(os.path.join(self.tmpdir.name, "tasks.db"))
+        await store.upsert_task(make_params("close-1", "你好"))
+        # 在不同的线程中各打开一个连接
+        threads = [threading.Thread(target=store._read, args=("tasks", "close-1")) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        connections = list(store._connections)
+        self.assertGreaterEqual(len(connections), 4)
+        await store.close()
+        self.assertEqual(store._connections, [])
+        for conn in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+    async def test_resubscribe_on_other_worker_relays_store_updates(self):
+        for name in ("sqlite", "redis"):
+            with self.subTest(store=name):
+                make_store = self.make_stores()[name]
+                task_id = f"relay-{name}"
+                owner = DemoTaskManager(make_store())
+                other = DemoTaskManager(make_store(), relay_poll_interval=0.02)
+                await owner.upsert_task(make_params(task_id, "你好"))
+                await owner.update_store(task_id, TaskStatus(state=TaskState.WORKING), None)
+
+                stream = await other.on_resubscribe_to_task(
+                    TaskResubscriptionRequest(id=1, params=TaskResubscriptionParams(id=task_id)))
+                first = await stream.__anext__()
+                self.assertEqual(first.result.status.state, TaskState.WORKING)
+                self.assertFalse(first.result.final)
+
+                await owner.update_store(task_id, TaskStatus(state=TaskState.COMPLETED),
+                                         [Artifact(parts=[TextPart(text="结果")], index=0)])
+                rest = [response.result async for response in stream]
+                self.assertEqual(rest[0].artifact.parts[0].text, "结果")
+                self.assertEqual(rest[-1].status.state, TaskState.COMPLETED)
+                self.assertTrue(rest[-1].final)
+                await owner.on_shutdown()
+                await other.on_shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
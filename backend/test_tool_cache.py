@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 15:50
+# @File  : test_tool_cache.py
+# @Desc  : 幂等MCP工具结果缓存的测试，包括参数顺序无关、过期、失败结果不缓存和跳过缓存
+
+import json
+import time
+import unittest
+
+from A2AServer.mcp_client.client import Tool, process_tool_call
+from A2AServer.mcp_client.tool_cache import ToolResultCache
+
+
+class FakeServer:
+    """模拟MCP客户端，记录每次真正调用的工具和参数"""
+
+    def __init__(self, tools):
+        self.tools = tools
+        self.calls = []
+        self.fail = False
+
+    async def call_tool(self, tool_name, arguments):
+        self.calls.append((tool_name, arguments))
+        if self.fail:
+            return {"error": "server busy"}
+        return {"content": [{"type": "text", "text": f"{tool_name}: {arguments['query']}"}]}
+
+
+def tool_call(name, arguments):
+    return {"id": "c1", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+class ToolResultCacheTestCase(unittest.TestCase):
+    def test_only_declared_tools_are_cacheable(self):
+        cache = ToolResultCache.from_servers_cfg({
+            "law": {"command": "x", "cache": ["search"]},
+            "news": {"command": "x", "cache": {"latest": {"ttl": 10}}},
+            "plain": {"command": "x"},
+        })
+        self.assertTrue(cache.is_cacheable("law", "search"))
+        self.assertTrue(cache.is_cacheable("news", "latest"))
+        self.assertFalse(cache.is_cacheable("plain", "search"))
+        self.assertIsNone(cache.get("plain", "search", {}))
+        self.assertEqual(cache.metrics()["misses"], 0)
+
+    def test_arguments_in_any_order_share_an_entry(self):
+        cache = ToolResultCache({("law", "search"): {}})
+        cache.set("law", "search", {"query": "劳动法", "limit": 5}, {"content": []})
+        self.assertEqual(cache.get("law", "search", {"limit": 5, "query": "劳动法"}), {"content": []})
+        self.assertIsNone(cache.get("law", "search", {"limit": 6, "query": "劳动法"}))
+        self.assertEqual(cache.metrics()["hits"], 1)
+        self.assertEqual(cache.metrics()["misses"], 1)
+
+    def test_entries_expire_after_ttl(self):
+        cache = ToolResultCache({("law", "search"): {"ttl": 0.05}})
+        cache.set("law", "search", {"query": "a"}, {"content": []})
+        self.assertIsNotNone(cache.get("law", "search", {"query": "a"}))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("law", "search", {"query": "a"}))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ToolResultCache({("law", "search"): {"maxSize": 2}})
+        for query in ("a", "b", "c"):
+            cache.set("law", "search", {"query": query}, {"content": [query]})
+        self.assertIsNone(cache.get("law", "search", {"query": "a"}))
+        self.assertEqual(cache.metrics()["entries"], {"law_search": 2})
+
+    def test_failed_results_are_not_cached(self):
+        cache = ToolResultCache({("law", "search"): {}})
+        cache.set("law", "search", {"query": "a"}, {"error": "timeout"})
+        cache.set("law", "search", {"query": "b"}, {"isError": True, "content": []})
+        cache.set("law", "search", {"query": "c"}, None)
+        self.assertEqual(cache.metrics()["entries"], {"law_search": 0})
+
+
+class ProcessToolCallCacheTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        schema = {"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]}
+        self.server = FakeServer([Tool("search", "搜索", schema), Tool("write", "写入", schema)])
+        self.servers = {"law": self.server}
+        self.cache = ToolResultCache.from_servers_cfg({"law": {"command": "x", "cache": ["search"]}})
+
+    async def call(self, name, arguments, use_cache=True):
+        return await process_tool_call(tool_call(name, arguments), self.servers, True, self.cache, use_cache)
+
+    async def test_repeated_call_is_served_from_cache(self):
+        first = await self.call("law_search", {"query": "劳动合同"})
+        second = await self.call("law_search", {"query": "劳动合同"})
+        self.assertEqual(first["content"], "search: 劳动合同")
+        self.assertEqual(second["content"], first["content"])
+        self.assertEqual(len(self.server.calls), 1)
+
+    async def test_tools_not_declared_are_always_called(self):
+        await self.call("law_write", {"query": "a"})
+        await self.call("law_write", {"query": "a"})
+        self.assertEqual(len(self.server.calls), 2)
+
+    async def test_use_cache_false_bypasses_cache(self):
+        await self.call("law_search", {"query": "a"})
+        await self.call("law_search", {"query": "a"}, use_cache=False)
+        self.assertEqual(len(self.server.calls), 2)
+        self.assertEqual(self.cache.metrics()["bypassed"], 1)
+
+    async def test_failed_call_is_retried(self):
+        self.server.fail = True
+        result = await self.call("law_search", {"query": "a"})
+        self.assertEqual(result["content"], "server busy")
+        self.server.fail = False
+        await self.call("law_search", {"query": "a"})
+        self.assertEqual(len(self.server.calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
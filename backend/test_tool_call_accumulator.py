@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 16:40
+# @File  : test_tool_call_accumulator.py
+# @Desc  : 流式工具调用参数增量拼接的测试，以及OpenAI兼容接口共用的流式生成
+
+import json
+import unittest
+from types import SimpleNamespace
+
+from A2AServer.mcp_client.providers.openai_compatible import stream_chat_completion
+from A2AServer.mcp_client.providers.tool_call_accumulator import (ToolCallAccumulator, _ArgumentScanner,
+                                                                   normalize_arguments)
+
+
+def openai_delta(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class ArgumentScannerTestCase(unittest.TestCase):
+    def feed_all(self, fragments):
+        scanner = _ArgumentScanner()
+        return scanner, [scanner.feed(fragment) for fragment in fragments]
+
+    def test_complete_only_when_top_level_value_closes(self):
+        _, states = self.feed_all(['{"a": {"b": [1', ', 2]}', ', "c": 3', '}'])
+        self.assertEqual(states, [False, False, False, True])
+
+    def test_brackets_and_quotes_inside_strings_are_ignored(self):
+        scanner, states = self.feed_all(['{"q": "a}', ']\\"', '{", "r": "\\\\"', '}'])
+        self.assertEqual(states, [False, False, False, True])
+        self.assertEqual(json.loads(scanner.text), {"q": 'a}]"{', "r": "\\"})
+
+    def test_fragment_split_inside_escape(self):
+        _, states = self.feed_all(['{"q": "a\\', '"}', '"}'])
+        self.assertEqual(states, [False, False, True])
+
+    def test_repaired_closes_truncated_arguments(self):
+        scanner, _ = self.feed_all(['{"q": "劳动', '法", "tags": [1, 2,'])
+        self.assertEqual(json.loads(scanner.repaired()), {"q": "劳动法", "tags": [1, 2]})
+
+
+class NormalizeArgumentsTestCase(unittest.TestCase):
+    def test_empty_arguments(self):
+        self.assertEqual(normalize_arguments(""), "{}")
+        self.assertEqual(normalize_arguments("  "), "{}")
+
+    def test_valid_arguments_are_canonical(self):
+        self.assertEqual(normalize_arguments('{"q":"劳动法"}'), '{"q": "劳动法"}')
+
+    def test_truncated_arguments_are_repaired(self):
+        scanner = _ArgumentScanner()
+        scanner.feed('{"q": "劳动法", "limit": 5, "sub": {"a": "b')
+        self.assertEqual(json.loads(normalize_arguments(scanner.text, scanner)),
+                         {"q": "劳动法", "limit": 5, "sub": {"a": "b"}})
+
+    def test_unrepairable_arguments_become_empty(self):
+        with self.assertLogs("A2AServer.mcp_client.providers.tool_call_accumulator", level="WARNING"):
+            self.assertEqual(normalize_arguments('{"q": '), "{}")
+
+
+class ToolCallAccumulatorTestCase(unittest.TestCase):
+    def test_split_deltas_complete_on_last_fragment(self):
+        accumulator = ToolCallAccumulator()
+        self.assertEqual(accumulator.add_openai_deltas([openai_delta(0, "call_1", "law_", '{"q"')]), [])
+        self.assertEqual(accumulator.add_openai_deltas([openai_delta(0, None, "search", ': "劳动')]), [])
+        completed = accumulator.add_openai_deltas([openai_delta(0, arguments='法"}')])
+        self.assertEqual(completed, [{"id": "call_1", "type": "function",
+                                      "function": {"name": "law_search", "arguments": '{"q": "劳动法"}'}}])
+        # 已经完整的调用不会再次产出
+        self.assertEqual(accumulator.add_openai_deltas([openai_delta(0, arguments=" ")]), [])
+        self.assertEqual(accumulator.finish(), completed)
+
+    def test_interleaved_indices(self):
+        accumulator = ToolCallAccumulator()
+        completed = []
+        for deltas in [
+            [openai_delta(0, "call_a", "a_search", '{"q": '), openai_delta(1, "call_b", "b_lookup", '{"id"')],
+            [openai_delta(1, arguments=': 7}')],
+            [openai_delta(0, arguments='"x"}')],
+        ]:
+            completed.extend(tc["id"] for tc in accumulator.add_openai_deltas(deltas))
+        self.assertEqual(completed, ["call_b", "call_a"])
+        final = accumulator.finish()
+        self.assertEqual([tc["id"] for tc in final], ["call_a", "call_b"])
+        self.assertEqual([json.loads(tc["function"]["arguments"]) for tc in final], [{"q": "x"}, {"id": 7}])
+
+    def test_truncated_arguments_are_repaired_on_finish(self):
+        accumulator = ToolCallAccumulator()
+        accumulator.add(0, "call_1", "law_search", '{"q": "劳动法", "limit": 5')
+        self.assertEqual(json.loads(accumulator.finish()[0]["function"]["arguments"]), {"q": "劳动法", "limit": 5})
+
+    def test_call_without_arguments_completes_on_close(self):
+        accumulator = ToolCallAccumulator()
+        self.assertIsNone(accumulator.add(1, "toolu_1", "law_list"))
+        tc = accumulator.close(1)
+        self.assertEqual(tc["function"]["arguments"], "{}")
+        self.assertIsNone(accumulator.close(1))
+        self.assertIsNone(accumulator.close(2))
+
+    def test_calls_without_id_or_name_are_dropped(self):
+        accumulator = ToolCallAccumulator()
+        self.assertIsNone(accumulator.add(0, arguments="{}"))
+        self.assertEqual(accumulator.finish(), [])
+
+
+class FakeCompletions:
+    def __init__(self, chunks=None, error=None):
+        self.chunks = chunks or []
+        self.error = error
+
+    async def create(self, **kwargs):
+        if self.error is not None:
+            raise self.error
+        self.kwargs = kwargs
+
+        async def response():
+            for chunk in self.chunks:
+                yield chunk
+        return response()
+
+
+def chunk(content=None, tool_calls=None, reasoning=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls,
+                            model_extra={"reasoning_content": reasoning} if reasoning else {})
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+def fake_client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+class StreamChatCompletionTestCase(unittest.IsolatedAsyncioTestCase):
+    async def collect(self, stream):
+        return [c async for c in stream]
+
+    async def test_tokens_tool_calls_and_final_chunk(self):
+        completions = FakeCompletions([
+            chunk(reasoning="想一想"),
+            chunk(content="你"),
+            chunk(content="好", tool_calls=[openai_delta(0, "call_1", "law_search", '{"q": ')]),
+            chunk(tool_calls=[openai_delta(0, arguments='"a"}')]),
+            chunk(finish_reason="tool_calls"),
+        ])
+        chunks = await self.collect(stream_chat_completion(fake_client(completions), "m", [], [{"name": "law_search"}],
+                                                           reasoning=True))
+        self.assertEqual(completions.kwargs["tools"], [{"type": "function", "function": {"name": "law_search"}}])
+        self.assertEqual(chunks[0], {"assistant_text": "想一想", "tool_calls": [], "is_chunk": True, "token": True,
+                                     "is_reasoning": True})
+        self.assertEqual([c["assistant_text"] for c in chunks if c.get("token") and not c.get("is_reasoning")], ["你", "好"])
+        complete = [c for c in chunks if c.get("tool_call_complete")]
+        self.assertEqual(len(complete), 1)
+        self.assertEqual(chunks[-1]["assistant_text"], "你好")
+        self.assertEqual(chunks[-1]["tool_calls"], complete[0]["tool_calls"])
+        self.assertFalse(chunks[-1]["is_chunk"])
+
+    async def test_reasoning_is_ignored_unless_enabled(self):
+        completions = FakeCompletions([chunk(reasoning="想一想", content="好", finish_reason="stop")])
+        chunks = await self.collect(stream_chat_completion(fake_client(completions), "m", [], []))
+        self.assertIsNone(completions.kwargs["tools"])
+        self.assertFalse(any(c.get("is_reasoning") for c in chunks))
+
+    async def test_error_uses_provider_label(self):
+        completions = FakeCompletions(error=RuntimeError("rate limited"))
+        chunks = await self.collect(stream_chat_completion(fake_client(completions), "m", [], [],
+                                                           error_label="DeepSeek error"))
+        self.assertEqual(chunks, [{"assistant_text": "DeepSeek error: rate limited", "tool_calls": [], "is_chunk": False}])
+
+
+if __name__ == "__main__":
+    unittest.main()
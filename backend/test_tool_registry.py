@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/19 16:10
+# @File  : test_tool_registry.py
+# @Desc  : ToolRegistry按完整函数名查找工具的测试，包括server名带下划线和函数名冲突的情况，以及工具参数的转换和校验
+
+import json
+import unittest
+from unittest.mock import patch
+
+from A2AServer.mcp_client import tool_registry
+from A2AServer.mcp_client.client import Tool, process_tool_call
+from A2AServer.mcp_client.tool_registry import ArgumentValidator, ToolRegistry
+
+SCHEMA = {"type": "object", "properties": {"query": {"type": "string"}}}
+
+
+class FakeServer:
+    def __init__(self, name, tools):
+        self.name = name
+        self.tools = tools
+        self.calls = []
+
+    async def call_tool(self, tool_name, arguments):
+        self.calls.append(tool_name)
+        return {"content": [{"type": "text", "text": f"{self.name}.{tool_name}"}]}
+
+
+class ToolRegistryTestCase(unittest.IsolatedAsyncioTestCase):
+    def test_register_returns_function_definitions(self):
+        registry = ToolRegistry()
+        functions = registry.register("law", [Tool("search", "搜索法律", SCHEMA)])
+        self.assertEqual(functions, [{"name": "law_search", "description": "搜索法律", "parameters": SCHEMA}])
+        entry = registry.get("law_search")
+        self.assertEqual((entry.server_name, entry.tool_name), ("law", "search"))
+        self.assertIsNone(registry.get("law_unknown"))
+
+    def test_underscores_in_server_and_tool_names(self):
+        servers = {
+            "labor_law": FakeServer("labor_law", [Tool("search_cases", "", SCHEMA)]),
+            "labor": FakeServer("labor", [Tool("law_search", "", SCHEMA)]),
+        }
+        registry = ToolRegistry.from_servers(servers)
+        self.assertEqual(registry.get("labor_law_search_cases")[1:3], ("labor_law", "search_cases"))
+        self.assertEqual(registry.get("labor_law_search")[1:3], ("labor", "law_search"))
+
+    def test_colliding_function_name_keeps_first_server(self):
+        registry = ToolRegistry()
+        registry.register("a_b", [Tool("c", "", SCHEMA)])
+        with self.assertLogs("A2AServer.mcp_client.tool_registry", level="WARNING"):
+            functions = registry.register("a", [Tool("b_c", "", SCHEMA), Tool("d", "", SCHEMA)])
+        self.assertEqual([f["name"] for f in functions], ["a_d"])
+        self.assertEqual(registry.get("a_b_c").server_name, "a_b")
+        self.assertEqual(len(registry), 2)
+
+    def test_reregistering_a_server_replaces_its_tools(self):
+        registry = ToolRegistry()
+        registry.register("law", [Tool("search", "旧", SCHEMA)])
+        functions = registry.register("law", [Tool("search", "新", SCHEMA)])
+        self.assertEqual(functions[0]["description"], "新")
+        registry.unregister("law")
+        self.assertNotIn("law_search", registry)
+
+    async def test_process_tool_call_resolves_ambiguous_names(self):
+        labor_law = FakeServer("labor_law", [Tool("search", "", SCHEMA)])
+        labor = FakeServer("labor", [Tool("law_lookup", "", SCHEMA)])
+        servers = {"labor_law": labor_law, "labor": labor}
+        registry = ToolRegistry.from_servers(servers)
+        for name, expected in [("labor_law_search", "labor_law.search"), ("labor_law_lookup", "labor.law_lookup")]:
+            tc = {"id": "c1", "type": "function", "function": {"name": name, "arguments": "{}"}}
+            result = await process_tool_call(tc, servers, True, registry=registry)
+            self.assertEqual(result["content"], expected)
+
+    async def test_unknown_tool_returns_error_to_model(self):
+        servers = {"law": FakeServer("law", [Tool("search", "", SCHEMA)])}
+        tc = {"id": "c1", "type": "function", "function": {"name": "law_delete", "arguments": "{}"}}
+        result = await process_tool_call(tc, servers, True, registry=ToolRegistry.from_servers(servers))
+        self.assertEqual(json.loads(result["content"]), {"error": "Unknown tool: law_delete"})
+        self.assertEqual(servers["law"].calls, [])
+
+
+SEARCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query": {"type": "string"},
+        "limit": {"type": "integer", "minimum": 1},
+        "score": {"type": "number"},
+        "exact": {"type": "boolean"},
+        "tags": {"type": "array", "items": {"type": "integer"}},
+        "filters": {"type": "object", "properties": {"year": {"type": "integer"}}},
+    },
+    "required": ["query"],
+}
+
+
+class ArgumentValidatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.validator = ArgumentValidator(SEARCH_SCHEMA)
+
+    def test_coerces_strings_to_declared_types(self):
+        arguments, errors = self.validator.validate({
+            "query": "劳动法", "limit": "5", "score": "0.5", "exact": "True",
+            "tags": "[1, \"2\"]", "filters": "{\"year\": \"2024\"}",
+        })
+        self.assertEqual(errors, [])
+        self.assertEqual(arguments, {"query": "劳动法", "limit": 5, "score": 0.5, "exact": True,
+                                     "tags": [1, 2], "filters": {"year": 2024}})
+
+    def test_coerces_numbers_and_drops_optional_nulls(self):
+        arguments, errors = self.validator.validate({"query": 2024, "limit": 3.0, "score": None})
+        self.assertEqual(errors, [])
+        self.assertEqual(arguments, {"query": "2024", "limit": 3})
+
+    def test_rejects_values_that_cannot_be_coerced(self):
+        arguments, errors = self.validator.validate({"query": "a", "limit": "five", "exact": "yes", "tags": "[1,"})
+        self.assertEqual(arguments["limit"], "five")
+        self.assertEqual([(e["path"], e["validator"]) for e in errors],
+                         [("exact", "type"), ("limit", "type"), ("tags", "type")])
+
+    def test_jsonschema_checks_constraints_and_required(self):
+        _, errors = self.validator.validate({"limit": 0})
+        self.assertEqual({e["validator"] for e in errors}, {"required", "minimum"})
+
+    def test_required_only_fallback_without_jsonschema(self):
+        with patch.object(tool_registry, "jsonschema", None):
+            validator = ArgumentValidator(SEARCH_SCHEMA)
+        self.assertIsNone(validator._validator)
+        _, errors = validator.validate({"limit": "five"})
+        self.assertEqual(errors, [{"path": "query", "message": "Missing required parameter: query", "validator": "required"}])
+        arguments, errors = validator.validate({"query": "a", "limit": "5"})
+        self.assertEqual(errors, [])
+        self.assertEqual(arguments["limit"], 5)
+
+    def test_invalid_schema_falls_back_to_required_only(self):
+        with self.assertLogs("A2AServer.mcp_client.tool_registry", level="WARNING"):
+            validator = ArgumentValidator({"type": "object", "properties": {"a": {"type": 5}}, "required": ["a"]})
+        self.assertEqual([e["path"] for e in validator.errors({})], ["a"])
+
+
+class ProcessToolCallValidationTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_invalid_arguments_are_not_sent_to_server(self):
+        server = FakeServer("law", [Tool("search", "", SEARCH_SCHEMA)])
+        servers = {"law": server}
+        registry = ToolRegistry.from_servers(servers)
+        tc = {"id": "c1", "type": "function", "function": {"name": "law_search", "arguments": json.dumps({"limit": "five"})}}
+        result = await process_tool_call(tc, servers, True, registry=registry)
+        content = json.loads(result["content"])
+        self.assertEqual(content["error"], "Invalid arguments for tool law_search")
+        self.assertEqual({d["path"] for d in content["details"]}, {"", "limit"})
+        self.assertEqual(server.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date  : 2026/10/20 15:10
+# @File  : testutils.py
+# @Desc  : 测试共用的工具函数
+
+import json
+import os
+import tempfile
+
+from A2AServer.agent import BasicAgent
+
+
+def make_agent(test_case, servers=None, **kwargs):
+    """
+    在临时目录中写入mcp_config.json和prompt文件后创建BasicAgent，临时目录在测试结束时删除
+    servers为None时不配置MCP server，工具视为已就绪，工具调用由测试替换
+    """
+    tmpdir = tempfile.TemporaryDirectory()
+    test_case.addCleanup(tmpdir.cleanup)
+    config_path = os.path.join(tmpdir.name, "mcp_config.json")
+    prompt_file = os.path.join(tmpdir.name, "prompt.txt")
+    with open(config_path, "w") as f:
+        json.dump({"mcpServers": servers or {}}, f)
+    with open(prompt_file, "w") as f:
+        f.write("你是一个助手")
+    agent = BasicAgent(config_path=config_path, prompt_file=prompt_file, quiet_mode=True, **kwargs)
+    if servers is None:
+        agent.tool_ready = True
+    return agent